@@ -0,0 +1,457 @@
+#!/usr/bin/env python3
+"""
+헤드리스 배치 패치 추출기
+웹앱 downloadZip과 같은 구조(with_voids/[type]/layer_XX, no_voids/..., merge/[type]/)로
+TIFF + 칩 좌표(CSV/Bonding Map/coordinates.json) + metadata.json + voids.json에서
+패치 PNG를 만든다. (레이어, 칩 묶음) 단위 작업을 프로세스 풀로 흘려보내고 결과를
+바로 디렉토리나 ZIP에 써서 메모리에 전체 패치를 들고 있지 않는다
+"""
+import argparse
+import io
+import json
+import math
+import os
+import re
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from enhance import enhance_settings
+from patch_extractor import extract_layer, resolve_layers
+
+# 웹앱 extractPatches와 같은 패치 캔버스 규격
+PATCH_SIZE = 300
+TITLE_HEIGHT = 40
+TITLE_FONT_SIZE = 20
+
+# js/constants.js VOID_COLORS
+VOID_COLORS = {
+    'void': 'cyan',
+    'crack': 'magenta',
+    'particle': 'lime',
+    'bbox': 'orange',
+    'default': 'yellow',
+}
+
+_font = None
+
+
+def pad_coord(coord):
+    """utils.js padCoord와 동일 (음수는 N 접두사)"""
+    coord = int(coord)
+    if coord < 0:
+        return f"N{abs(coord):02d}"
+    return f"{coord:02d}"
+
+
+def patch_label(x, y, layer, chip_type):
+    return f"X{pad_coord(x)}_Y{pad_coord(y)}_L{layer:02d}_LEG:{chip_type or 'NA'}"
+
+
+def file_name(label):
+    """라벨을 파일 이름으로 (타입에 들어간 경로 구분자만 치환)"""
+    return label.replace('/', '_').replace('\\', '_')
+
+
+def type_folder(chip_type):
+    return re.sub(r'[^a-zA-Z0-9_-]', '_', chip_type) if chip_type else 'NA'
+
+
+# ---------------------------------------------------------------------------
+# 입력 파싱 (js/utils.js parseCSV / parseBondingMap과 같은 규칙)
+# ---------------------------------------------------------------------------
+
+def parse_csv(text):
+    """x,y,type 헤더가 있는 CSV/TSV"""
+    lines = text.strip().splitlines()
+    header = [h.lower() for h in re.split(r'[\t,]+', lines[0])]
+    if 'x' not in header or 'y' not in header:
+        raise ValueError("CSV needs x and y columns")
+    xi, yi = header.index('x'), header.index('y')
+    ti = header.index('type') if 'type' in header else -1
+
+    rows = []
+    for line in lines[1:]:
+        if not line.strip():
+            continue
+        cells = re.split(r'[\t,]+', line)
+        try:
+            x, y = float(cells[xi]), float(cells[yi])
+        except (IndexError, ValueError):
+            continue
+        chip_type = cells[ti] if 0 <= ti < len(cells) and cells[ti] else ''
+        rows.append({'x': int(x) if x.is_integer() else x,
+                     'y': int(y) if y.is_integer() else y,
+                     'type': chip_type})
+    return rows
+
+
+def parse_bonding_map(text):
+    """첫 행이 X 헤더, 첫 열이 Y인 탭 구분 매트릭스 (빈 칸은 칩 없음)"""
+    lines = text.rstrip().splitlines()
+    if len(lines) < 2:
+        return []
+
+    x_headers = []
+    for header in lines[0].split('\t')[1:]:
+        try:
+            x_headers.append(int(header.strip()))
+        except ValueError:
+            x_headers.append(None)
+
+    rows = []
+    for line in lines[1:]:
+        cells = line.split('\t')
+        if len(cells) < 2:
+            continue
+        try:
+            y = int(cells[0].strip())
+        except ValueError:
+            continue
+        for c, x in enumerate(x_headers, start=1):
+            value = cells[c].strip() if c < len(cells) else ''
+            if value and x is not None:
+                rows.append({'x': x, 'y': y, 'type': value})
+    return rows
+
+
+def load_coordinates(path):
+    """coordinates.json(웹앱 내보내기), CSV, Bonding Map 중 하나를 읽어서 칩 목록 반환"""
+    with open(path, encoding='utf-8-sig') as f:
+        text = f.read()
+    if path.lower().endswith('.json'):
+        data = json.loads(text)
+        return data.get('coordinates', []) if isinstance(data, dict) else data
+
+    header = [h.strip().lower() for h in re.split(r'[\t,]+', text.strip().splitlines()[0])]
+    if 'x' in header and 'y' in header:
+        return parse_csv(text)
+    return parse_bonding_map(text)
+
+
+def load_voids(path):
+    """voids.json (exportVoids 배열 또는 downloadVoids의 {voidRecords}) 읽기"""
+    if not path:
+        return []
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get('voidRecords', [])
+    return data
+
+
+def group_voids(voids):
+    """칩 (x, y)별 보이드 목록"""
+    by_chip = {}
+    for record in voids:
+        by_chip.setdefault((record['x'], record['y']), []).append(record)
+    return by_chip
+
+
+# ---------------------------------------------------------------------------
+# 렌더링 (워커 프로세스에서 실행)
+# ---------------------------------------------------------------------------
+
+def get_font():
+    """타이틀 폰트 (20px sans-serif 대신 Pillow 기본 폰트)"""
+    global _font
+    if _font is None:
+        try:
+            _font = ImageFont.load_default(size=TITLE_FONT_SIZE)
+        except TypeError:  # Pillow < 10.1
+            _font = ImageFont.load_default()
+    return _font
+
+
+def draw_title(image, label):
+    """캔버스 상단 검은 타이틀 바 + 흰 라벨 (fillText(label, 6, titleH / 2))"""
+    draw = ImageDraw.Draw(image)
+    draw.rectangle([0, 0, PATCH_SIZE - 1, TITLE_HEIGHT - 1], fill='black')
+    draw.text((6, TITLE_HEIGHT / 2), label, fill='white', font=get_font(), anchor='lm')
+    return draw
+
+
+def draw_voids(draw, voids):
+    """VoidManagerV2.drawVoidMask와 같은 실선 보이드 (lineWidth 2, bbox는 좌상단+크기)"""
+    for record in voids:
+        color = VOID_COLORS.get(record.get('type'), VOID_COLORS['default'])
+        cx, cy = record['centerX'], record['centerY']
+        rx, ry = abs(record['radiusX']), abs(record['radiusY'])
+        if record.get('type') == 'bbox':
+            draw.rectangle([cx, cy, cx + rx, cy + ry], outline=color, width=2)
+        else:
+            draw.ellipse([cx - rx, cy - ry, cx + rx, cy + ry], outline=color, width=2)
+
+
+def encode_png(image):
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def render_layer_chunk(path, layer, metadata, rows, out_size, enhance, voids_by_chip,
+                       overlay_voids):
+    """레이어 하나 x 칩 묶음의 패치 PNG 생성 - [(ZIP 내부 경로, PNG 바이트)]"""
+    patches = extract_layer(path, layer - 1, metadata, rows, out_size, enhance)
+    canvas_height = TITLE_HEIGHT + out_size[1]
+
+    files = []
+    for row, patch in zip(rows, patches):
+        chip_voids = voids_by_chip.get((row['x'], row['y']), [])
+        layer_voids = [v for v in chip_voids if v.get('layer') == layer]
+        label = patch_label(row['x'], row['y'], layer, row.get('type'))
+
+        canvas = np.zeros((canvas_height, PATCH_SIZE), dtype=np.uint8)
+        canvas[TITLE_HEIGHT:, :patch.shape[1]] = patch
+        image = Image.fromarray(canvas)
+        if overlay_voids and layer_voids:
+            image = image.convert('RGB')
+        draw = draw_title(image, label)
+        if overlay_voids:
+            draw_voids(draw, layer_voids)
+
+        status = 'with_voids' if layer_voids else 'no_voids'
+        folder = f"{status}/{type_folder(row.get('type'))}/layer_{layer:02d}"
+        arcname = f"{folder}/{file_name(label)}.png"
+        files.append((arcname, encode_png(image)))
+    return files
+
+
+def render_merge_chunk(rows, canvas_height, voids_by_chip):
+    """칩별 merge 마스크 (투명 배경 + 타이틀 + 모든 레이어 보이드 실선)"""
+    files = []
+    for row in rows:
+        label = patch_label(row['x'], row['y'], 0, row.get('type'))
+        image = Image.new('RGBA', (PATCH_SIZE, canvas_height), (0, 0, 0, 0))
+        draw = draw_title(image, label)
+        draw_voids(draw, voids_by_chip.get((row['x'], row['y']), []))
+        arcname = f"merge/{type_folder(row.get('type'))}/{file_name(label)}_merge.png"
+        files.append((arcname, encode_png(image)))
+    return files
+
+
+# ---------------------------------------------------------------------------
+# 출력 (디렉토리 또는 ZIP)
+# ---------------------------------------------------------------------------
+
+class DirectoryOutput:
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def write(self, arcname, data):
+        if os.name == 'nt':  # Windows 파일 이름에는 ':'를 쓸 수 없음
+            arcname = arcname.replace(':', '_')
+        target = os.path.join(self.path, *arcname.split('/'))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as f:
+            f.write(data)
+
+    def close(self):
+        pass
+
+
+class ZipOutput:
+    """PNG는 이미 압축되어 있으므로 STORED, JSON/텍스트만 DEFLATED
+
+    target은 경로 또는 쓰기 가능한 파일 객체 (seek 불가 스트림이면 zipfile이
+    로컬 헤더 뒤에 data descriptor를 붙여서 순차 기록)
+    """
+
+    def __init__(self, target):
+        self.zip = zipfile.ZipFile(target, 'w', allowZip64=True)
+
+    def write(self, arcname, data):
+        compress = zipfile.ZIP_STORED if arcname.endswith('.png') else zipfile.ZIP_DEFLATED
+        self.zip.writestr(arcname, data, compress_type=compress)
+
+    def close(self):
+        self.zip.close()
+
+
+def open_output(path):
+    if path.lower().endswith('.zip'):
+        return ZipOutput(path)
+    return DirectoryOutput(path)
+
+
+def readme_text(metadata, tiff_path, page_count, rows):
+    """downloadZip README.txt와 같은 내용"""
+    grid = metadata.get('gridSettings', {})
+    origin = metadata.get('origin', {})
+    ref = metadata.get('referenceGrid', {})
+    enhance = metadata.get('enhanceSettings', {})
+    return f"""# Wafer Patch Extraction Data
+
+TIFF File: {metadata.get('tiffFileName') or os.path.basename(tiff_path)}
+Extraction Date: {datetime.now().isoformat()}
+Version: {metadata.get('version', 'batch')}
+
+## Grid Settings
+- Columns: {grid.get('cols')}
+- Rows: {grid.get('rows')}
+- Cell Width: {grid.get('cellW')}px
+- Cell Height: {grid.get('cellH')}px
+
+## Alignment
+- Origin: ({origin.get('x')}, {origin.get('y')})
+- Reference Grid: ({ref.get('x')}, {ref.get('y')})
+
+## Enhancement Settings
+- Alpha (Contrast): {enhance.get('alpha')}
+- Beta (Brightness): {enhance.get('beta')}
+- Target Mean: {enhance.get('targetMean')}
+- Target Std: {enhance.get('targetStd')}
+- Padding: {enhance.get('padPx')}px
+
+## Extraction Info
+- Total Pages: {page_count}
+- Total Coordinates: {len(rows)}
+- Total Patches: {page_count * len(rows)}
+- Patch Size: {PATCH_SIZE}px
+
+## Structure
+- with_voids/[type]/layer_[XX]/[patch_name].png (patches containing voids)
+- no_voids/[type]/layer_[XX]/[patch_name].png (patches without voids)
+- merge/[type]/[patch_name]_merge.png (merged mask layers)
+- metadata.json: Grid and extraction settings
+- coordinates.json: Chip coordinate data
+- voids.json: Void detection data
+"""
+
+
+def build_tasks(tiff_path, rows, metadata, voids, chunk_size=32, layers=None, enhance=True,
+                overlay_voids=False):
+    """워커에 보낼 (함수, 인자...) 작업 목록 - 칩 묶음마다 merge 1개 + 레이어별 1개"""
+    grid = metadata.get('gridSettings', {})
+    cell_w = float(grid.get('cellW', 100))
+    cell_h = float(grid.get('cellH', 100))
+    # canvas.height = patchSize * cellH / cellW + titleH (정수로 잘림)
+    out_size = (PATCH_SIZE, math.floor(PATCH_SIZE * cell_h / cell_w))
+    settings = None
+    if enhance:
+        settings = enhance_settings(metadata.get('enhanceSettings'))
+        settings['title_height'] = TITLE_HEIGHT
+
+    # 잘못된 레이어 번호는 작업을 만들기 전에 ValueError (서버는 응답 시작 전에 400)
+    layers = resolve_layers(tiff_path, layers)
+    voids_by_chip = group_voids(voids)
+
+    tasks = []
+    for i in range(0, len(rows), chunk_size):
+        chunk = rows[i:i + chunk_size]
+        # 워커로 보내는 보이드는 해당 묶음의 칩 것만
+        subset = {(r['x'], r['y']): voids_by_chip[(r['x'], r['y'])]
+                  for r in chunk if (r['x'], r['y']) in voids_by_chip}
+        tasks.append((render_merge_chunk, chunk, TITLE_HEIGHT + out_size[1], subset))
+        for layer in layers:
+            tasks.append((render_layer_chunk, tiff_path, layer, metadata, chunk, out_size,
+                          settings, subset, overlay_voids))
+    return tasks, layers
+
+
+def iter_task_files(executor, tasks, max_pending, progress=None):
+    """작업을 executor로 흘려보내면서 끝나는 순서대로 (경로, 바이트) 반환
+
+    진행 중인 작업 수를 max_pending으로 제한해서 결과가 메모리에 쌓이지 않게 한다
+    """
+    pending = set()
+    done_tasks = 0
+    task_iter = iter(tasks)
+    while True:
+        for task in task_iter:
+            pending.add(executor.submit(*task))
+            if len(pending) >= max_pending:
+                break
+        if not pending:
+            break
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            yield from future.result()
+            done_tasks += 1
+        if progress:
+            progress(done_tasks, len(tasks))
+
+
+def write_export(output, executor, tasks, layers, tiff_path, rows, metadata, voids, max_pending,
+                 progress=None):
+    """downloadZip 구조 전체(메타데이터 파일 + 패치 + merge)를 output에 기록, 종류별 개수 반환
+
+    tasks, layers는 build_tasks 결과
+    """
+    output.write('metadata.json', json.dumps(metadata, indent=2).encode('utf-8'))
+    output.write('coordinates.json', json.dumps({
+        'coordinates': rows,
+        'chipPoints': [{'x': r['x'], 'y': r['y']} for r in rows],
+    }, indent=2).encode('utf-8'))
+    output.write('voids.json', json.dumps(voids, indent=2).encode('utf-8'))
+    output.write('README.txt', readme_text(metadata, tiff_path, len(layers), rows).encode('utf-8'))
+
+    written = {'with_voids': 0, 'no_voids': 0, 'merge': 0}
+    for arcname, data in iter_task_files(executor, tasks, max_pending, progress):
+        output.write(arcname, data)
+        written[arcname.split('/', 1)[0]] += 1
+    return written
+
+
+def batch_extract(tiff_path, rows, metadata, voids, output_path, workers=None, chunk_size=32,
+                  layers=None, enhance=True, overlay_voids=False):
+    """칩 x 레이어 패치와 merge 마스크를 output_path(디렉토리 또는 .zip)에 기록"""
+    started = time.time()
+    workers = workers or os.cpu_count()
+
+    def progress(done, total):
+        print(f"\r  {done}/{total} tasks", end='', flush=True)
+
+    tasks, layers = build_tasks(tiff_path, rows, metadata, voids, chunk_size, layers, enhance,
+                                overlay_voids)
+    output = open_output(output_path)
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            written = write_export(output, pool, tasks, layers, tiff_path, rows, metadata, voids,
+                                   workers * 2, progress)
+        print()
+    finally:
+        output.close()
+
+    print(f"Wrote {written['with_voids']} with_voids, {written['no_voids']} no_voids, "
+          f"{written['merge']} merge images to {output_path} in {time.time() - started:.1f}s")
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Extract chip patches into the with_voids/no_voids/merge layout')
+    parser.add_argument('tiff', help='Source TIFF file')
+    parser.add_argument('coordinates', help='Chip coordinates: CSV (x,y,type), bonding map, '
+                                            'or coordinates.json exported by the web app')
+    parser.add_argument('metadata', help='metadata.json exported by the web app')
+    parser.add_argument('--voids', help='voids.json exported by the web app')
+    parser.add_argument('--output', '-o', default='patches.zip',
+                        help='Output directory, or a .zip file')
+    parser.add_argument('--workers', '-w', type=int, default=None, help='Worker processes')
+    parser.add_argument('--chunk-size', type=int, default=32, help='Chips per worker task')
+    parser.add_argument('--layers', help='Comma separated layer numbers (default: all)')
+    parser.add_argument('--page-size',
+                        help='Page canvas size the grid was set on, WIDTHxHEIGHT '
+                             '(for metadata exported without pageSize)')
+    parser.add_argument('--no-enhance', action='store_true',
+                        help='Skip target mean/std normalization')
+    parser.add_argument('--overlay-voids', action='store_true',
+                        help='Draw each layer\'s voids on its patch like the patch viewer')
+    args = parser.parse_args()
+
+    with open(args.metadata, encoding='utf-8') as f:
+        grid_metadata = json.load(f)
+    if args.page_size:
+        page_w, page_h = (int(v) for v in args.page_size.lower().split('x'))
+        grid_metadata['pageSize'] = {'width': page_w, 'height': page_h}
+
+    layer_numbers = [int(v) for v in args.layers.split(',')] if args.layers else None
+    batch_extract(args.tiff, load_coordinates(args.coordinates), grid_metadata,
+                  load_voids(args.voids), args.output, args.workers, args.chunk_size,
+                  layer_numbers, not args.no_enhance, args.overlay_voids)
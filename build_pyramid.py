@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+대용량 웨이퍼 TIFF 피라미드(오버뷰) 생성기
+각 레이어를 2배씩 영역 평균으로 다운샘플링해서 원본 옆에 타일 TIFF 사이드카
+(<stem>.ovr2.tif, <stem>.ovr4.tif, ...)로 저장한다. 모든 사이드카는 원본과
+같은 페이지 순서를 가지므로 Range 서버가 URL을 바꾸지 않고 레벨을 교체할 수 있다
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+from tifffile import TiffFile, TiffWriter
+
+from pyramid import overview_path
+
+COMPRESSION_CHOICES = {
+    'none': None,
+    'deflate': 'zlib',
+    'lzw': 'lzw',
+    'zstd': 'zstd',
+}
+
+
+def downsample2x(image):
+    """2x2 영역 평균 다운샘플링 (홀수 크기는 가장자리 복제)"""
+    h, w = image.shape[:2]
+    if h % 2 or w % 2:
+        pad = ((0, h % 2), (0, w % 2)) + ((0, 0),) * (image.ndim - 2)
+        image = np.pad(image, pad, mode='edge')
+
+    blocks = image.reshape(image.shape[0] // 2, 2, image.shape[1] // 2, 2, *image.shape[2:])
+    if np.issubdtype(image.dtype, np.integer) and image.dtype.itemsize <= 2:
+        # uint8/uint16은 정수 합으로 계산 (float 임시 배열보다 메모리 절반)
+        total = blocks.sum(axis=(1, 3), dtype=np.uint32 if image.dtype.kind == 'u' else np.int32)
+        return ((total + 2) // 4).astype(image.dtype)
+    return blocks.mean(axis=(1, 3)).astype(image.dtype)
+
+
+def pyramid_factors(width, height, min_size):
+    """최대 변이 min_size 이상인 동안 2, 4, 8, ... 배율 목록"""
+    factors = []
+    factor = 2
+    while max(-(-width // factor), -(-height // factor)) >= min_size:
+        factors.append(factor)
+        factor *= 2
+    return factors
+
+
+def build_pyramid(path, tile_size=512, compression='deflate', min_size=512, force=False):
+    """TIFF 파일 하나의 오버뷰 사이드카 생성, 생성한 파일 경로 목록 반환"""
+    started = time.time()
+    with TiffFile(path) as tif:
+        pages = list(tif.pages)
+        first = pages[0]
+        factors = pyramid_factors(first.imagewidth, first.imagelength, min_size)
+        if not factors:
+            print(f"{path}: {first.imagewidth}x{first.imagelength} is already below "
+                  f"{min_size}px, no overviews needed")
+            return []
+
+        outputs = [overview_path(path, factor) for factor in factors]
+        if not force and all(os.path.exists(p) and os.path.getmtime(p) >= os.path.getmtime(path)
+                             for p in outputs):
+            print(f"{path}: overviews are up to date (use --force to rebuild)")
+            return outputs
+
+        print(f"{path}: {len(pages)} pages, {first.imagewidth}x{first.imagelength}, "
+              f"levels {', '.join(f'1/{f}' for f in factors)}")
+
+        codec = COMPRESSION_CHOICES[compression]
+        write_options = {
+            'tile': (tile_size, tile_size),
+            'compression': codec,
+            'predictor': codec is not None,
+        }
+
+        # 임시 파일에 쓰고 끝나면 교체 - 서버가 쓰는 중인 사이드카를 읽지 않고,
+        # 디렉터리 mtime이 바뀌어 서버의 오버뷰 목록 캐시도 다시 찾게 된다
+        temps = [p + '.tmp' for p in outputs]
+        writers = [TiffWriter(p, bigtiff=False) for p in temps]
+        done = False
+        try:
+            for page_idx, page in enumerate(pages):
+                image = page.asarray()
+                photometric = 'rgb' if image.ndim == 3 else 'minisblack'
+                for writer in writers:
+                    # 이전 레벨에서 다시 절반으로 줄여서 누적 오차 없이 연속 생성
+                    image = downsample2x(image)
+                    writer.write(image, photometric=photometric, metadata=None, **write_options)
+                del image
+                print(f"  Page {page_idx + 1}/{len(pages)} done")
+            done = True
+        finally:
+            for writer in writers:
+                writer.close()
+            if not done:
+                for temp in temps:
+                    if os.path.exists(temp):
+                        os.remove(temp)
+
+    for temp, output in zip(temps, outputs):
+        os.replace(temp, output)
+
+    for output in outputs:
+        print(f"  {output}: {os.path.getsize(output) / (1024 ** 2):.1f} MB")
+    print(f"  Finished in {time.time() - started:.1f}s")
+    return outputs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Build overview pyramid sidecars for wafer TIFFs')
+    parser.add_argument('paths', nargs='+', help='Source TIFF files')
+    parser.add_argument('--tile-size', type=int, default=512, help='Overview tile size')
+    parser.add_argument('--compression', choices=sorted(COMPRESSION_CHOICES), default='deflate',
+                        help='Overview compression (lzw/zstd need imagecodecs)')
+    parser.add_argument('--min-size', type=int, default=512,
+                        help='Smallest overview edge length in pixels')
+    parser.add_argument('--force', action='store_true', help='Rebuild existing overviews')
+
+    args = parser.parse_args()
+
+    for source in args.paths:
+        build_pyramid(source, args.tile_size, args.compression, args.min_size, args.force)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+텍스트 응답(HTML/JS/CSS/JSON/CSV) gzip/brotli 압축 + 파일 버전별 압축 결과 캐시
+brotli 패키지가 없으면 gzip만 사용한다
+"""
+import gzip
+import threading
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = {
+    'text/html', 'text/css', 'text/csv', 'text/plain',
+    'application/javascript', 'application/json',
+}
+# 이보다 작은 본문은 압축 이득보다 헤더/CPU 비용이 큼
+MIN_COMPRESS_BYTES = 1024
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+
+# 선호 순서 (앞쪽 우선)
+ENCODINGS = ('br', 'gzip') if brotli else ('gzip',)
+
+
+def choose_encoding(accept_encoding):
+    """Accept-Encoding 헤더에서 쓸 인코딩 선택 (q=0은 제외, 없으면 None)"""
+    accepted = {}
+    for item in (accept_encoding or '').split(','):
+        name, _, params = item.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                continue
+        accepted[name.strip().lower()] = quality
+
+    best = None
+    for encoding in ENCODINGS:
+        quality = accepted.get(encoding, accepted.get('*', 0))
+        if quality > 0 and (best is None or quality > best[1]):
+            best = (encoding, quality)
+    return best[0] if best else None
+
+
+def compress(data, encoding, fast=False):
+    """data를 encoding으로 압축 (fast면 매번 압축하는 동적 응답용 낮은 레벨)"""
+    if encoding == 'br':
+        return brotli.compress(bytes(data), quality=5 if fast else 11)
+    return gzip.compress(data, compresslevel=6 if fast else 9, mtime=0)
+
+
+class CompressedCache:
+    """(경로, 버전, 인코딩) -> 압축된 bytes LRU (바이트 예산, 스레드 안전)"""
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, mapped, encoding):
+        """매핑된 파일의 압축 결과 (없으면 압축해서 저장)"""
+        key = (mapped.path, mapped.fingerprint, encoding)
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return body
+            self.misses += 1
+
+        # 압축은 잠금 밖에서 (동시 미스면 중복 압축될 수 있지만 결과는 같음)
+        with mapped.slice(0, mapped.size) as view:
+            body = compress(view, encoding)
+        if len(body) > self.max_bytes:
+            return body
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= len(old)
+            self._entries[key] = body
+            self.bytes += len(body)
+            while self.bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes -= len(evicted)
+        return body
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.bytes,
+                'maxBytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
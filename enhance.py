@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+타겟 평균/표준편차 정규화 (ImageProcessor.enhanceToTarget) NumPy 배치 구현
+패치 스택 전체의 통계를 한 번에 계산하고, uint8 입력이므로 패치마다 256칸 LUT를 만들어
+적용한다. 웹앱과 같은 결과를 내도록 JS의 연산 순서, 패딩 영역 통계, 클램프와
+Uint8ClampedArray 반올림(짝수 반올림)을 그대로 따른다
+"""
+import numpy as np
+
+# 한 번에 처리할 패치 수 (제곱합 임시 배열 크기 제한)
+CHUNK_PATCHES = 256
+
+
+def _region_stats(patches, pad, canvas_height):
+    """패딩 안쪽 샘플 영역의 (평균, 표준편차) - 0~1 그레이 기준
+
+    canvas_height는 JS에서 통계를 내는 캔버스 높이. 웹앱은 패치 아래로 titleH만큼
+    빈(0) 행이 붙은 캔버스에서 통계를 내므로 그 행들도 샘플 개수에 포함된다
+    """
+    n, h, w = patches.shape
+    rows = slice(pad, min(h, canvas_height - pad))
+    region = patches[:, rows, pad:w - pad]
+    count = (canvas_height - 2 * pad) * (w - 2 * pad)
+
+    # uint8 합/제곱합은 정수로 정확하게 계산
+    total = region.sum(axis=(1, 2), dtype=np.int64)
+    square = region.astype(np.uint32)
+    np.square(square, out=square)
+    total_sq = square.sum(axis=(1, 2), dtype=np.int64)
+
+    # 분산은 정수식(count * 제곱합 - 합^2)으로 계산해서 상수 패치는 정확히 0이 되게 함
+    mean = total / 255.0 / count
+    variance = count * total_sq - total * total
+    std = np.sqrt(variance) / (255.0 * count)
+    return mean, std
+
+
+def _build_luts(mean, std, target_mean, target_std):
+    """패치별 0~255 -> 0~255 변환표 (n, 256)"""
+    gray = np.arange(256, dtype=np.float64) / 255
+    with np.errstate(divide='ignore', invalid='ignore'):
+        normalized = ((gray - mean[:, None]) / std[:, None]) * target_std + target_mean
+    values = np.clip(normalized * 255, 0, 255)
+    # Uint8ClampedArray는 NaN을 0으로, 나머지는 짝수 반올림으로 저장
+    luts = np.rint(np.nan_to_num(values, nan=0.0)).astype(np.uint8)
+    # 표준편차가 0이면 JS처럼 원본 유지
+    luts[std == 0] = np.arange(256, dtype=np.uint8)
+    return luts
+
+
+def enhance_to_target(patches, target_mean=0.5, target_std=0.2, pad=10, title_height=0,
+                      out=None):
+    """uint8 그레이스케일 패치 스택을 타겟 평균/표준편차로 정규화
+
+    patches: (..., h, w) uint8 배열 (마지막 두 축이 패치 하나)
+    title_height: 웹앱 extractPatches처럼 패치 아래에 붙는 빈 행 수 (통계에만 영향)
+    out: 결과를 쓸 배열 (patches와 같으면 제자리 변환)
+    """
+    patches = np.asarray(patches)
+    if patches.dtype != np.uint8:
+        raise ValueError(f"Expected uint8 patches, got {patches.dtype}")
+    if out is None:
+        out = np.empty_like(patches)
+    if patches.size == 0:
+        return out
+
+    h, w = patches.shape[-2:]
+    canvas_height = h + title_height
+    flat = patches.reshape(-1, h, w)
+    flat_out = out.reshape(-1, h, w)
+
+    # JS getImageData는 0 이하 크기를 허용하지 않음 - 샘플 영역이 없으면 그대로 복사
+    if canvas_height - 2 * pad <= 0 or w - 2 * pad <= 0:
+        flat_out[...] = flat
+        return out
+
+    for start in range(0, len(flat), CHUNK_PATCHES):
+        chunk = flat[start:start + CHUNK_PATCHES]
+        mean, std = _region_stats(chunk, pad, canvas_height)
+        luts = _build_luts(mean, std, target_mean, target_std)
+        # 패치별 LUT 조회: luts[i][chunk[i]]
+        index = np.arange(len(chunk))[:, None, None]
+        flat_out[start:start + len(chunk)] = luts[index, chunk]
+    return out
+
+
+def enhance_settings(settings):
+    """웹앱 enhanceSettings/요청 payload에서 enhance_to_target 인자 구성"""
+    settings = settings or {}
+    return {
+        'target_mean': float(settings.get('targetMean', 0.5)),
+        'target_std': float(settings.get('targetStd', 0.2)),
+        'pad': int(settings.get('padPx', settings.get('pad', 10))),
+        'title_height': int(settings.get('titleHeight', 0)),
+    }
@@ -0,0 +1,102 @@
+// 칩 좌표 공간 인덱스 (칩 좌표 / 웨이퍼 픽셀 -> 패치 인덱스 O(1) 조회)
+
+// 이보다 넓은 좌표 범위는 2차원 배열 대신 정수 키 Map 사용 (희소한 좌표 대비)
+const MAX_DENSE_CELLS = 1 << 22;
+
+/**
+ * 웨이퍼 캔버스 픽셀 좌표 -> 칩 좌표
+ * origin/cellW/cellH는 스케일 적용 전 값, scale은 현재 캔버스 배율,
+ * offset은 타일 뷰어 이동량 (화면 px)
+ */
+export function pixelToChip(
+  px,
+  py,
+  { origin, refGrid, cellW, cellH, scale = 1, offset = { x: 0, y: 0 } }
+) {
+  return {
+    x:
+      Math.floor((px - offset.x - origin.x * scale) / (cellW * scale)) +
+      refGrid.x,
+    y:
+      Math.floor((py - offset.y - origin.y * scale) / (cellH * scale)) +
+      refGrid.y,
+  };
+}
+
+/**
+ * 추출된 패치 순서대로 만든 칩 좌표 인덱스
+ * 격자 최소값 기준으로 오프셋한 2차원 배열(Int32Array)에 패치 인덱스를 저장
+ * 같은 좌표가 여러 번 나오면 첫 번째 패치를 가리킴 (기존 findIndex와 동일)
+ */
+export class ChipIndex {
+  constructor(coords) {
+    const count = coords.length;
+    this.xs = new Int32Array(count);
+    this.ys = new Int32Array(count);
+
+    let minX = Infinity, minY = Infinity, maxX = -Infinity, maxY = -Infinity;
+    coords.forEach(({ x, y }, i) => {
+      this.xs[i] = x;
+      this.ys[i] = y;
+      if (!Number.isInteger(x) || !Number.isInteger(y)) return;
+      if (x < minX) minX = x;
+      if (x > maxX) maxX = x;
+      if (y < minY) minY = y;
+      if (y > maxY) maxY = y;
+    });
+
+    this.minX = minX;
+    this.minY = minY;
+    this.width = count ? maxX - minX + 1 : 0;
+    this.height = count ? maxY - minY + 1 : 0;
+
+    const area = this.width * this.height;
+    this.cells = area > 0 && area <= MAX_DENSE_CELLS ? new Int32Array(area).fill(-1) : null;
+    this.sparse = this.cells ? null : new Map();
+
+    // 뒤에서부터 채워서 중복 좌표는 첫 번째 패치가 남도록
+    for (let i = count - 1; i >= 0; i--) {
+      const { x, y } = coords[i];
+      if (!Number.isInteger(x) || !Number.isInteger(y)) continue;
+      const cell = (y - minY) * this.width + (x - minX);
+      if (this.cells) this.cells[cell] = i;
+      else this.sparse.set(cell, i);
+    }
+  }
+
+  get size() {
+    return this.xs.length;
+  }
+
+  /**
+   * 칩 좌표의 패치 인덱스 (없으면 -1)
+   */
+  indexOf(x, y) {
+    const dx = x - this.minX;
+    const dy = y - this.minY;
+    if (!(dx >= 0 && dx < this.width && dy >= 0 && dy < this.height)) return -1;
+    if (!Number.isInteger(dx) || !Number.isInteger(dy)) return -1;
+    const cell = dy * this.width + dx;
+    if (this.cells) return this.cells[cell];
+    return this.sparse.get(cell) ?? -1;
+  }
+
+  has(x, y) {
+    return this.indexOf(x, y) !== -1;
+  }
+
+  /**
+   * 웨이퍼 캔버스 픽셀 위치의 패치 인덱스 (없으면 -1)
+   */
+  indexAtPixel(px, py, grid) {
+    const { x, y } = pixelToChip(px, py, grid);
+    return this.indexOf(x, y);
+  }
+
+  /**
+   * 패치 인덱스의 칩 좌표
+   */
+  coordOf(index) {
+    return { x: this.xs[index], y: this.ys[index] };
+  }
+}
@@ -21,6 +21,13 @@ export const CONFIG = {
   SYNC_THROTTLE_MS: 100,
   DISTANCE_THRESHOLD: 30,
   TOLERANCE: 8,
+  MAX_DECODE_WORKERS: 8,   // TIFF 페이지 디코딩 워커 최대 수
+  TILE_CACHE_MB: 256,      // 타일 뷰어 디코딩 타일 캐시 (전체 레이어 합계)
+  LAYER_CACHE_MB: 1024,    // 레이어 이미지 캐시 기본 예산
+  PATCH_CACHE_MB: 256,     // 칩 패치 캐시 예산 (그레이스케일 uint8)
+  PATCH_PREFETCH_PAGES: 2, // 패치 뷰어에서 미리 만들어 둘 다음 칩 수
+  PATCH_RENDER_BATCH: 16,  // 한 번에 생성할 칩 수 (레이어 디코딩 한 번을 여러 칩이 나눠 씀)
+  PATCH_ARENA_CHUNK_MB: 16, // 그레이 패치 버퍼 풀 청크 크기
   // 압축 설정
   COMPRESSION: {
     SMALL_FILE_MAX: 2048,    // 작은 파일용 최대 크기
@@ -1,5 +1,6 @@
 // 독립적인 이미지 처리 클래스 (GeoTIFF만 사용)
 import { CONFIG } from "./constants.js";
+import { TiffDecodePool } from "./tiffDecodePool.js";
 
 export class ImageProcessor {
   /**
@@ -103,6 +104,147 @@ export class ImageProcessor {
     ctx.putImageData(imageData, 0, 0);
   }
 
+  /**
+   * 그레이스케일 uint8 버퍼를 캔버스에 그리기 (R=G=B, A=255)
+   */
+  static putGrayImage(ctx, gray, width, height, dx = 0, dy = 0) {
+    const imageData = ctx.createImageData(width, height);
+    this.convertRasterToImageData(gray, imageData.data, width, height);
+    ctx.putImageData(imageData, dx, dy);
+  }
+
+  /**
+   * RGBA 픽셀에서 R 채널만 그레이스케일 버퍼로 복사 (R=G=B 이미지)
+   */
+  static imageDataToGray(rgba, gray) {
+    for (let i = 0, p = 0; i < gray.length; i++, p += 4) {
+      gray[i] = rgba[p];
+    }
+  }
+
+  /**
+   * 그레이스케일 uint8 버퍼를 타겟 평균/표준편차로 정규화 (제자리 변환)
+   * enhanceToTarget과 같은 결과 - titleHeight는 패치 아래에 붙는 빈(0) 행 수 (통계에만 영향)
+   */
+  static enhanceGrayToTarget(
+    gray,
+    width,
+    height,
+    targetMean = 0.5,
+    targetStd = 0.2,
+    pad = 10,
+    titleHeight = 0
+  ) {
+    const canvasHeight = height + titleHeight;
+    if (canvasHeight - 2 * pad <= 0 || width - 2 * pad <= 0) return;
+
+    // 패딩 안쪽 샘플 영역 합/제곱합 (빈 행은 0이므로 개수에만 포함)
+    const count = (canvasHeight - 2 * pad) * (width - 2 * pad);
+    const rowEnd = Math.min(height, canvasHeight - pad);
+    let sum = 0,
+      sumSq = 0;
+    for (let y = pad; y < rowEnd; y++) {
+      const end = y * width + width - pad;
+      for (let i = y * width + pad; i < end; i++) {
+        const v = gray[i];
+        sum += v;
+        sumSq += v * v;
+      }
+    }
+
+    // 정수식으로 분산 계산 (상수 패치는 정확히 0 -> 원본 유지)
+    const variance = count * sumSq - sum * sum;
+    if (variance <= 0) return;
+    const mean = sum / 255 / count;
+    const std = Math.sqrt(variance) / (255 * count);
+
+    // uint8 입력이므로 256칸 변환표 (Uint8ClampedArray가 클램프/반올림 처리)
+    const lut = new Uint8ClampedArray(256);
+    for (let v = 0; v < 256; v++) {
+      lut[v] = (((v / 255 - mean) / std) * targetStd + targetMean) * 255;
+    }
+    for (let i = 0; i < gray.length; i++) {
+      gray[i] = lut[gray[i]];
+    }
+  }
+
+  /**
+   * TIFF URL에 대한 Range 서버 API URL (예: /patches/<file>, /export/<file>)
+   */
+  static getServerApiUrl(tiffUrl, prefix) {
+    const url = new URL(tiffUrl, window.location.href);
+    url.pathname = `${prefix}${url.pathname}`;
+    url.search = "";
+    return url.toString();
+  }
+
+  /**
+   * Range 서버 스트리밍 ZIP 내보내기 (POST /export/<file>)
+   * 폼 전송으로 요청해서 브라우저가 응답을 바로 파일로 저장 (메모리에 ZIP을 만들지 않음)
+   */
+  static submitServerExport(tiffUrl, payload) {
+    const form = document.createElement("form");
+    form.method = "POST";
+    form.action = this.getServerApiUrl(tiffUrl, "/export");
+    form.style.display = "none";
+
+    const input = document.createElement("input");
+    input.type = "hidden";
+    input.name = "payload";
+    input.value = JSON.stringify(payload);
+    form.appendChild(input);
+
+    document.body.appendChild(form);
+    form.submit();
+    form.remove();
+  }
+
+  /**
+   * Range 서버 패치 추출 API로 원본 해상도 칩 패치 요청
+   * (POST /patches/<file>, 응답은 [좌표][레이어] 순서의 uint8 그레이스케일)
+   */
+  static async fetchServerPatches(tiffUrl, payload) {
+    const url = this.getServerApiUrl(tiffUrl, "/patches");
+
+    const response = await fetch(url, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify(payload),
+    });
+    if (!response.ok) {
+      throw new Error(
+        `Patch server returned ${response.status}: ${response.statusText}`
+      );
+    }
+
+    const width = parseInt(response.headers.get("X-Patch-Width"), 10);
+    const height = parseInt(response.headers.get("X-Patch-Height"), 10);
+    const count = parseInt(response.headers.get("X-Patch-Count"), 10);
+    const layers = (response.headers.get("X-Layers") || "")
+      .split(",")
+      .filter(Boolean)
+      .map(Number);
+    const enhanced = response.headers.get("X-Patch-Enhanced") === "1";
+    const data = new Uint8Array(await response.arrayBuffer());
+    const patchBytes = width * height;
+
+    return {
+      width,
+      height,
+      count,
+      layers,
+      enhanced,
+      data,
+      // 좌표 인덱스와 레이어 번호(1부터)로 패치 버퍼 조회
+      get(coordIndex, layer) {
+        const layerIndex = layers.indexOf(layer);
+        if (layerIndex === -1 || coordIndex >= count) return null;
+        const offset = (coordIndex * layers.length + layerIndex) * patchBytes;
+        return data.subarray(offset, offset + patchBytes);
+      },
+    };
+  }
+
   /**
    * 선택된 압축 설정 크기 가져오기
    */
@@ -117,8 +259,25 @@ export class ImageProcessor {
 
   /**
    * Range 서버에서 GeoTIFF fromUrl로 TIFF 파일 로드 (간단화)
+   * 전체 페이지를 한 번에 디코딩 - 레이어 단위 로드는 openTiffSource + LayerCache 사용
    */
   static async loadTiffFromServer(filePath, progressCallback = null) {
+    const source = await this.openTiffSource(filePath);
+    try {
+      return await this.decodeAllPages(source, progressCallback);
+    } catch (error) {
+      throw this.wrapLoadError(error);
+    } finally {
+      source.close();
+    }
+  }
+
+  /**
+   * Range 서버 TIFF 열기 - 페이지를 필요할 때 하나씩 디코딩하는 소스 반환
+   * { filePath, pageCount, sizes, parallel, decode(index), close() }
+   * sizes는 서버 인덱스가 있을 때 압축 후 페이지 크기 배열 (없으면 null)
+   */
+  static async openTiffSource(filePath) {
     console.log("Loading TIFF from Range server with GeoTIFF:", filePath);
 
     try {
@@ -127,19 +286,36 @@ export class ImageProcessor {
         throw new Error("GeoTIFF library not loaded");
       }
 
-      // Range 서버 연결 테스트
-      console.log("Testing Range server connection:", filePath);
-      try {
-        const testResponse = await fetch(filePath, { method: "HEAD" });
-        if (!testResponse.ok) {
-          throw new Error(
-            `Range server returned ${testResponse.status}: ${testResponse.statusText}`
-          );
+      // compression setting에서 선택된 값 사용
+      const maxSize = this.getSelectedCompressionSize();
+      console.log(`Using compression setting: ${maxSize}px max size`);
+
+      // 서버가 압축 설정에 맞는 피라미드 레벨을 고를 수 있도록 maxSize 전달
+      filePath = this.withMaxSize(filePath, maxSize);
+
+      // 서버 TIFF 인덱스 조회 (성공하면 연결 테스트와 IFD 체인 탐색 생략)
+      const meta = await this.fetchTiffMeta(filePath);
+      if (meta && meta.pyramidFactor > 1) {
+        console.log(
+          `Server pyramid level 1/${meta.pyramidFactor} selected (${meta.pages[0]?.width}x${meta.pages[0]?.height})`
+        );
+      }
+
+      if (!meta) {
+        // Range 서버 연결 테스트
+        console.log("Testing Range server connection:", filePath);
+        try {
+          const testResponse = await fetch(filePath, { method: "HEAD" });
+          if (!testResponse.ok) {
+            throw new Error(
+              `Range server returned ${testResponse.status}: ${testResponse.statusText}`
+            );
+          }
+          console.log("Range server connection OK");
+        } catch (testError) {
+          console.error("Range server connection failed:", testError);
+          throw new Error(`Range 서버 연결 실패: ${testError.message}`);
         }
-        console.log("Range server connection OK");
-      } catch (testError) {
-        console.error("Range server connection failed:", testError);
-        throw new Error(`Range 서버 연결 실패: ${testError.message}`);
       }
 
       // GeoTIFF로 Range 서버에서 파일 로드
@@ -147,66 +323,197 @@ export class ImageProcessor {
       const tiff = await window.GeoTIFF.fromUrl(filePath);
       console.log("GeoTIFF loaded successfully from Range server");
 
-      // 이미지 개수 확인
-      const imageCount = await tiff.getImageCount();
+      // 이미지 개수 확인 (인덱스가 있으면 IFD를 순차로 따라갈 필요 없음)
+      if (meta) {
+        this.primeIfdRequests(tiff, meta);
+      }
+      const imageCount = meta ? meta.pageCount : await tiff.getImageCount();
       console.log("Image count:", imageCount);
 
-      const pages = [];
-      // compression setting에서 선택된 값 사용
-      const maxSize = this.getSelectedCompressionSize();
-      console.log(`Using compression setting: ${maxSize}px max size`);
+      // 워커 풀에서 페이지별 병렬 디코딩 (미지원/실패 시 메인 스레드)
+      const pool = TiffDecodePool.isSupported()
+        ? new TiffDecodePool(Math.min(TiffDecodePool.defaultSize(), imageCount))
+        : null;
+      const ifdOffsets = meta ? meta.pages.map((page) => page.ifdOffset) : null;
+      let closed = false;
 
-      // 순차 처리로 메모리 사용량 최소화
-      for (let i = 0; i < imageCount; i++) {
-        console.log(`Processing page ${i + 1}/${imageCount}...`);
-
-        // 프로그레스 콜백 호출
-        if (progressCallback) {
-          progressCallback(
-            i + 1,
-            imageCount,
-            `Processing page ${i + 1}: Loading and compressing...`
-          );
-        }
+      return {
+        filePath,
+        pageCount: imageCount,
+        sizes: meta
+          ? meta.pages.map((page) =>
+              this.getCompressedSize(page.width, page.height, maxSize)
+            )
+          : null,
+        get parallel() {
+          return !!pool && pool.size > 0;
+        },
+        decode: async (pageIndex) => {
+          if (closed) throw new Error("TIFF source closed");
+          if (pool && pool.size > 0) {
+            try {
+              const result = await pool.decodePage(
+                filePath,
+                pageIndex,
+                maxSize,
+                ifdOffsets
+              );
+              return result.bitmap;
+            } catch (error) {
+              if (closed) throw error;
+              console.warn(
+                `Worker decoding failed for page ${pageIndex + 1}, using main thread:`,
+                error
+              );
+            }
+          }
+          return this.loadAndCompressPage(tiff, pageIndex, maxSize, null, 1);
+        },
+        close: () => {
+          closed = true;
+          if (pool) pool.terminate();
+        },
+      };
+    } catch (error) {
+      throw this.wrapLoadError(error);
+    }
+  }
 
-        const canvas = await this.loadAndCompressPage(
-          tiff,
-          i,
-          maxSize,
-          progressCallback,
-          imageCount
+  /**
+   * 소스의 전체 페이지 디코딩 (페이지 순서대로 배열 반환)
+   * 워커가 있으면 병렬, 없으면 메모리 사용량을 줄이기 위해 순차 처리
+   */
+  static async decodeAllPages(source, progressCallback = null) {
+    const total = source.pageCount;
+    let completed = 0;
+    const decodeOne = async (i) => {
+      const page = await source.decode(i);
+      completed++;
+      if (progressCallback) {
+        progressCallback(
+          completed,
+          total,
+          `Page ${i + 1} decoded (${page.width}x${page.height})`
         );
-        pages.push(canvas);
-
-        // 각 페이지 처리 후 메모리 정리
-        if (window.gc) {
-          window.gc();
-        }
       }
-
-      console.log(`Successfully processed ${pages.length} pages`);
-      return pages;
-    } catch (error) {
-      console.error("GeoTIFF Range server loading failed:", error);
-
-      // AggregateError인 경우 상세 오류 정보 출력
-      if (error.name === "AggregateError" && error.errors) {
-        console.error("Detailed errors:");
-        error.errors.forEach((err, index) => {
-          console.error(`  Error ${index + 1}:`, err);
-        });
+      return page;
+    };
+
+    let pages;
+    if (source.parallel) {
+      console.log(`Decoding ${total} pages in workers`);
+      pages = await Promise.all(
+        Array.from({ length: total }, (_, i) => decodeOne(i))
+      );
+    } else {
+      pages = [];
+      for (let i = 0; i < total; i++) {
+        pages.push(await decodeOne(i));
       }
+    }
+    console.log(`Successfully processed ${pages.length} pages`);
+    return pages;
+  }
 
-      // 네트워크 관련 오류 체크
-      if (error.message && error.message.includes("fetch")) {
-        console.error(
-          "Network fetch failed. Check if Range server is running on port 8083"
-        );
+  /**
+   * 로드 오류 로그 출력 후 사용자용 메시지로 감싸기
+   */
+  static wrapLoadError(error) {
+    console.error("GeoTIFF Range server loading failed:", error);
+
+    // AggregateError인 경우 상세 오류 정보 출력
+    if (error.name === "AggregateError" && error.errors) {
+      console.error("Detailed errors:");
+      error.errors.forEach((err, index) => {
+        console.error(`  Error ${index + 1}:`, err);
+      });
+    }
+
+    // 네트워크 관련 오류 체크
+    if (error.message && error.message.includes("fetch")) {
+      console.error(
+        "Network fetch failed. Check if Range server is running on port 8083"
+      );
+    }
+
+    return new Error(`Range 서버 TIFF 파일 로드 실패: ${error.message}`);
+  }
+
+  /**
+   * maxSize 안에 들어오도록 축소한 크기 (loadAndCompressPage/워커와 같은 계산)
+   */
+  static getCompressedSize(width, height, maxSize) {
+    const scale = Math.min(1, maxSize / Math.max(width, height));
+    return {
+      width: Math.round(width * scale),
+      height: Math.round(height * scale),
+    };
+  }
+
+  /**
+   * TIFF URL에 압축 크기(maxSize) 쿼리 추가 - 서버 피라미드 레벨 선택용
+   */
+  static withMaxSize(filePath, maxSize) {
+    const url = new URL(filePath, window.location.href);
+    url.searchParams.set("maxSize", String(maxSize));
+    return url.toString();
+  }
+
+  /**
+   * TIFF URL에 대응하는 서버 인덱스 URL (/meta/<file>.json)
+   */
+  static getTiffMetaUrl(filePath, includeOffsets = false) {
+    const url = new URL(filePath, window.location.href);
+    url.pathname = `/meta${url.pathname}.json`;
+    if (!includeOffsets) {
+      url.searchParams.set("offsets", "0");
+    }
+    return url.toString();
+  }
+
+  /**
+   * Range 서버에서 TIFF IFD 인덱스 조회 (지원하지 않는 서버면 null)
+   */
+  static async fetchTiffMeta(filePath, includeOffsets = false) {
+    try {
+      const response = await fetch(
+        this.getTiffMetaUrl(filePath, includeOffsets)
+      );
+      if (!response.ok) {
+        console.warn(`TIFF index not available (${response.status})`);
+        return null;
       }
+      const meta = await response.json();
+      console.log(
+        `TIFF index loaded: ${meta.pageCount} pages, first page ${meta.pages[0]?.width}x${meta.pages[0]?.height}`
+      );
+      return meta;
+    } catch (error) {
+      console.warn("TIFF index request failed:", error);
+      return null;
+    }
+  }
 
-      throw new Error(`Range 서버 TIFF 파일 로드 실패: ${error.message}`);
+  /**
+   * 인덱스의 IFD 오프셋으로 GeoTIFF IFD 요청을 미리 등록
+   * (IFD 체인을 순서대로 따라가지 않고 페이지별 IFD를 병렬로 읽음)
+   */
+  static primeIfdRequests(tiff, meta) {
+    if (
+      typeof tiff.parseFileDirectoryAt !== "function" ||
+      !Array.isArray(tiff.ifdRequests)
+    ) {
+      return false;
     }
+
+    meta.pages.forEach((page, index) => {
+      if (!tiff.ifdRequests[index]) {
+        tiff.ifdRequests[index] = tiff.parseFileDirectoryAt(page.ifdOffset);
+      }
+    });
+    return true;
   }
+
   /**
    * 페이지 로드 및 압축 (메모리 즉시 해제) - 최적화 버전
    */
@@ -414,32 +721,6 @@ export class ImageProcessor {
     return canvas;
   }
 
-  /**
-   * 메모리 정리 - 사용하지 않는 레이어 언로드
-   */
-  static unloadUnusedLayers(allPages, currentLayerIndex, keepRadius = 2) {
-    allPages.forEach((page, index) => {
-      if (page._virtualMeta && page._virtualMeta.isLoaded) {
-        const distance = Math.abs(index - currentLayerIndex);
-        if (distance > keepRadius) {
-          console.log(`Unloading layer ${index} to save memory`);
-
-          // 캔버스 초기화
-          const ctx = page.getContext("2d");
-          ctx.clearRect(0, 0, page.width, page.height);
-
-          // 메타데이터 리셋
-          page._virtualMeta.isLoaded = false;
-
-          // 강제 가비지 컬렉션
-          if (window.gc) {
-            window.gc();
-          }
-        }
-      }
-    });
-  }
-
   /**
    * 메모리 사용량 모니터링
    */
@@ -0,0 +1,302 @@
+// 레이어 이미지 캐시 (MB 예산 + LRU + 인접 레이어 미리 로드)
+import { CONFIG } from "./constants.js";
+
+/**
+ * 이미지(ImageBitmap/canvas)의 RGBA 바이트 수
+ */
+function imageBytes(image) {
+  return image.width * image.height * 4;
+}
+
+/**
+ * 이미지 메모리 해제 (ImageBitmap은 close, canvas는 크기 0)
+ */
+function releaseImage(image) {
+  if (typeof image.close === "function") {
+    image.close();
+  } else if ("width" in image) {
+    image.width = 0;
+    image.height = 0;
+  }
+}
+
+/**
+ * TIFF 소스(ImageProcessor.openTiffSource)의 레이어를 예산 안에서만 메모리에 유지
+ * 예산을 넘으면 가장 오래 안 쓴 레이어부터 해제하고, 필요해지면 다시 디코딩한다
+ * 현재 레이어와 방금 로드한 레이어, acquire로 사용 중인 레이어는 해제하지 않음
+ */
+export class LayerCache {
+  constructor(
+    source,
+    {
+      maxBytes = CONFIG.LAYER_CACHE_MB * 1024 * 1024,
+      prefetchRadius = 1,
+      onChange = null,
+    } = {}
+  ) {
+    this.source = source;
+    this.maxBytes = maxBytes;
+    this.prefetchRadius = prefetchRadius;
+    this.onChange = onChange;
+
+    this.entries = new Map(); // index -> { image, bytes } (최근 사용 순)
+    this.loading = new Map(); // index -> Promise<image>
+    this.sizes = source.sizes ? [...source.sizes] : [];
+    this.bytes = 0;
+    this.current = 0;
+    this.closed = false;
+    this.pinned = new Map(); // index -> acquire 횟수 (release 전까지 해제하지 않음)
+
+    this.hits = 0;
+    this.misses = 0;
+    this.evictions = 0;
+    this.prefetches = 0;
+  }
+
+  get count() {
+    return this.source.pageCount;
+  }
+
+  /**
+   * 레이어 크기 (디코딩 전이면 인덱스/다른 레이어 크기로 추정)
+   */
+  layerSize(index) {
+    return (
+      this.sizes[index] ||
+      this.sizes.find(Boolean) || { width: 0, height: 0 }
+    );
+  }
+
+  /**
+   * 전체 레이어 크기 목록 ({ width, height } 배열)
+   */
+  layerSizes() {
+    return Array.from({ length: this.count }, (_, i) => this.layerSize(i));
+  }
+
+  /**
+   * 메모리에 있으면 바로 반환 (없으면 null, 로드하지 않음)
+   */
+  peek(index) {
+    const entry = this.entries.get(index);
+    return entry ? entry.image : null;
+  }
+
+  /**
+   * 레이어 이미지 (없으면 디코딩) - 현재 레이어로 표시하고 인접 레이어 미리 로드
+   */
+  async get(index) {
+    this.current = index;
+    let image;
+    const entry = this.entries.get(index);
+    if (entry) {
+      this.hits++;
+      this.entries.delete(index);
+      this.entries.set(index, entry);
+      image = entry.image;
+      this.notify();
+    } else {
+      this.misses++;
+      image = await this.load(index);
+    }
+    this.prefetchAround(index);
+    return image;
+  }
+
+  /**
+   * 현재 레이어를 바꾸지 않고 레이어 이미지 사용 (패치 생성 등, 인접 레이어 미리 로드 없음)
+   * 다른 레이어 로드에 밀려 close되지 않도록 release(index) 할 때까지 고정
+   */
+  async acquire(index) {
+    // 디코딩을 기다리는 동안에도 해제되지 않게 먼저 고정
+    this.pinned.set(index, (this.pinned.get(index) || 0) + 1);
+    const entry = this.entries.get(index);
+    if (entry) {
+      this.hits++;
+      return entry.image;
+    }
+    this.misses++;
+    try {
+      return await this.load(index);
+    } catch (error) {
+      this.release(index);
+      throw error;
+    }
+  }
+
+  /**
+   * acquire 고정 해제 (고정 중 예산을 넘었으면 이때 정리)
+   */
+  release(index) {
+    const count = (this.pinned.get(index) || 0) - 1;
+    if (count > 0) {
+      this.pinned.set(index, count);
+      return;
+    }
+    this.pinned.delete(index);
+    this.evict();
+  }
+
+  load(index) {
+    let promise = this.loading.get(index);
+    if (promise) return promise;
+
+    promise = this.source
+      .decode(index)
+      .then((image) => {
+        // 닫힌 뒤 도착한 디코딩 결과는 바로 해제
+        if (this.closed) {
+          releaseImage(image);
+          throw new Error("Layer cache closed");
+        }
+        this.sizes[index] = { width: image.width, height: image.height };
+        const old = this.entries.get(index);
+        if (old) this.drop(index, old);
+        const bytes = imageBytes(image);
+        this.entries.set(index, { image, bytes });
+        this.bytes += bytes;
+        this.evict(index);
+        this.notify();
+        return image;
+      })
+      .finally(() => this.loading.delete(index));
+    this.loading.set(index, promise);
+    return promise;
+  }
+
+  /**
+   * 현재 레이어 주변(prefetchRadius 이내) 여부
+   */
+  isNearCurrent(index) {
+    return Math.abs(index - this.current) <= this.prefetchRadius;
+  }
+
+  /**
+   * 인접 레이어 미리 로드 (주변 밖 레이어를 밀어내서 예산 안에 들어올 때만)
+   */
+  prefetchAround(index) {
+    let nearBytes = 0;
+    for (const [i, entry] of this.entries) {
+      if (this.isNearCurrent(i)) nearBytes += entry.bytes;
+    }
+    for (let d = 1; d <= this.prefetchRadius; d++) {
+      for (const neighbor of [index + d, index - d]) {
+        if (neighbor < 0 || neighbor >= this.count) continue;
+        if (this.entries.has(neighbor) || this.loading.has(neighbor)) continue;
+        const { width, height } = this.layerSize(neighbor);
+        if (nearBytes + width * height * 4 > this.maxBytes) continue;
+        nearBytes += width * height * 4;
+        this.prefetches++;
+        this.load(neighbor).catch((error) =>
+          console.warn(`Prefetch of layer ${neighbor + 1} failed:`, error)
+        );
+      }
+    }
+  }
+
+  /**
+   * 예산 안에 들어오는 만큼 앞쪽 레이어를 미리 디코딩 (TIFF 로드 직후)
+   */
+  async warm(progressCallback = null) {
+    if (this.count === 0) return;
+
+    // 첫 레이어로 실제 크기 확인 후 예산에 들어가는 레이어 수 결정
+    await this.load(0);
+    const perLayer = Math.max(1, imageBytes(this.layerSize(0)));
+    const target = Math.min(
+      this.count,
+      Math.max(1, Math.floor(this.maxBytes / perLayer))
+    );
+
+    let completed = 1;
+    const report = (index) => {
+      if (progressCallback) {
+        const { width, height } = this.layerSize(index);
+        progressCallback(
+          completed,
+          target,
+          `Layer ${index + 1} decoded (${width}x${height})`
+        );
+      }
+    };
+    report(0);
+
+    const rest = Array.from({ length: target - 1 }, (_, i) => i + 1);
+    const loadOne = async (index) => {
+      await this.load(index);
+      completed++;
+      report(index);
+    };
+    if (this.source.parallel) {
+      await Promise.all(rest.map(loadOne));
+    } else {
+      for (const index of rest) await loadOne(index);
+    }
+    console.log(
+      `Layer cache warmed: ${target}/${this.count} layers resident (${Math.round(
+        this.bytes / 1024 / 1024
+      )} MB)`
+    );
+  }
+
+  /**
+   * 예산 초과분 해제 (LRU 순, 현재 레이어/보호 레이어/사용 중인 레이어 제외)
+   * 현재 레이어 주변 레이어는 다른 레이어를 모두 해제한 뒤에만 해제
+   */
+  evict(protectIndex = null) {
+    for (const keepNear of [true, false]) {
+      for (const [index, entry] of this.entries) {
+        if (this.bytes <= this.maxBytes) return;
+        if (index === this.current || index === protectIndex) continue;
+        if (this.pinned.has(index)) continue;
+        if (keepNear && this.isNearCurrent(index)) continue;
+        this.drop(index, entry);
+        this.evictions++;
+      }
+    }
+  }
+
+  drop(index, entry) {
+    this.entries.delete(index);
+    this.bytes -= entry.bytes;
+    releaseImage(entry.image);
+  }
+
+  /**
+   * 예산 변경 (줄이면 즉시 해제)
+   */
+  setBudget(maxBytes) {
+    this.maxBytes = maxBytes;
+    this.evict();
+    this.notify();
+  }
+
+  notify() {
+    if (this.onChange) this.onChange(this.stats());
+  }
+
+  stats() {
+    return {
+      count: this.count,
+      resident: this.entries.size,
+      loading: this.loading.size,
+      bytes: this.bytes,
+      maxBytes: this.maxBytes,
+      hits: this.hits,
+      misses: this.misses,
+      evictions: this.evictions,
+      prefetches: this.prefetches,
+    };
+  }
+
+  /**
+   * 전체 해제 후 소스(워커 풀) 닫기
+   */
+  close() {
+    this.closed = true;
+    for (const [index, entry] of this.entries) {
+      this.drop(index, entry);
+    }
+    this.source.close();
+  }
+}
@@ -0,0 +1,57 @@
+// 그레이스케일 패치 버퍼 풀 (큰 ArrayBuffer를 같은 크기 칸으로 나눠 재사용)
+import { CONFIG } from "./constants.js";
+
+/**
+ * 같은 크기의 uint8 그레이 패치를 큰 ArrayBuffer 청크에 이어서 저장
+ * 패치마다 버퍼를 만들지 않고, 해제된 칸은 다음 패치가 재사용한다
+ */
+export class PatchArena {
+  constructor(
+    patchBytes,
+    { chunkBytes = CONFIG.PATCH_ARENA_CHUNK_MB * 1024 * 1024 } = {}
+  ) {
+    this.patchBytes = patchBytes;
+    this.slotsPerChunk = Math.max(1, Math.floor(chunkBytes / patchBytes));
+    this.chunks = []; // ArrayBuffer 목록
+    this.free = []; // 빈 칸 번호 (스택)
+    this.used = 0;
+  }
+
+  /**
+   * 빈 칸 하나 할당 - 반환: { slot, data } (data는 청크 위의 Uint8Array 뷰)
+   */
+  alloc() {
+    if (!this.free.length) this.grow();
+    const slot = this.free.pop();
+    this.used++;
+    return { slot, data: this.view(slot) };
+  }
+
+  release(slot) {
+    this.free.push(slot);
+    this.used--;
+  }
+
+  view(slot) {
+    const chunk = this.chunks[Math.floor(slot / this.slotsPerChunk)];
+    const offset = (slot % this.slotsPerChunk) * this.patchBytes;
+    return new Uint8Array(chunk, offset, this.patchBytes);
+  }
+
+  grow() {
+    const base = this.chunks.length * this.slotsPerChunk;
+    this.chunks.push(new ArrayBuffer(this.slotsPerChunk * this.patchBytes));
+    // 낮은 번호부터 나가도록 역순으로 쌓음
+    for (let i = this.slotsPerChunk - 1; i >= 0; i--) {
+      this.free.push(base + i);
+    }
+  }
+
+  stats() {
+    return {
+      used: this.used,
+      slots: this.chunks.length * this.slotsPerChunk,
+      bytes: this.chunks.length * this.slotsPerChunk * this.patchBytes,
+    };
+  }
+}
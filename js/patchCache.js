@@ -0,0 +1,220 @@
+// 칩 패치 캐시 (필요할 때 생성 + MB 예산 LRU + 다음 칩 미리 생성)
+import { CONFIG } from "./constants.js";
+
+// 브라우저가 한가할 때 실행 (미지원이면 다음 태스크)
+const whenIdle =
+  typeof requestIdleCallback === "function"
+    ? (fn) => requestIdleCallback(fn)
+    : (fn) => setTimeout(fn, 0);
+
+/**
+ * 칩 하나(전체 레이어)의 메모리 - 레이어별 그레이스케일 버퍼
+ */
+function layersBytes(layers) {
+  return layers.reduce((sum, l) => sum + l.gray.byteLength, 0);
+}
+
+/**
+ * allPatchPages 인덱스별 레이어 패치를 필요할 때만 만들고 예산 안에서만 유지
+ * render(indices)는 인덱스 순서대로 레이어 배열 목록을 반환 (여러 칩을 한 번에 생성)
+ * 없는 칩은 뒤이은 칩까지 renderBatch개씩 묶어서 생성 (레이어 소스를 묶음 단위로 재사용)
+ * release(layers)는 캐시에서 빠진 칩의 버퍼 반환 (PatchArena)
+ * 현재 칩과 방금 요청한 칩은 해제하지 않음
+ */
+export class PatchCache {
+  constructor(
+    render,
+    total,
+    {
+      maxBytes = CONFIG.PATCH_CACHE_MB * 1024 * 1024,
+      prefetchAhead = CONFIG.PATCH_PREFETCH_PAGES,
+      renderBatch = CONFIG.PATCH_RENDER_BATCH,
+      release = null,
+      onChange = null,
+    } = {}
+  ) {
+    this.render = render;
+    this.total = total; // 칩 수 (allPatchPages.length)
+    this.maxBytes = maxBytes;
+    this.prefetchAhead = prefetchAhead;
+    this.renderBatch = Math.max(1, renderBatch);
+    this.release = release;
+    this.onChange = onChange;
+
+    this.entries = new Map(); // index -> { layers, bytes } (최근 사용 순)
+    this.loading = new Map(); // index -> Promise<layers>
+    this.bytes = 0;
+    this.current = 0;
+    this.closed = false;
+    this.prefetchScheduled = false;
+    this.pinned = new Set(); // getMany로 사용 중인 칩
+
+    this.hits = 0;
+    this.misses = 0;
+    this.evictions = 0;
+    this.prefetches = 0;
+  }
+
+  /**
+   * 만들어져 있으면 바로 반환 (없으면 null, 생성하지 않음)
+   */
+  peek(index) {
+    const entry = this.entries.get(index);
+    return entry ? entry.layers : null;
+  }
+
+  /**
+   * 칩 레이어 패치 (없으면 생성) - 현재 칩으로 표시하고 다음 칩 미리 생성
+   */
+  async get(index) {
+    this.current = index;
+    let layers;
+    const entry = this.entries.get(index);
+    if (entry) {
+      this.hits++;
+      this.entries.delete(index);
+      this.entries.set(index, entry);
+      layers = entry.layers;
+      this.notify();
+    } else {
+      this.misses++;
+      const run = this.runFrom(index);
+      [layers] = await this.load(run.length ? run : [index]);
+    }
+    this.schedulePrefetch();
+    return layers;
+  }
+
+  /**
+   * 여러 칩을 한 번에 (내보내기 등) - 다음 getMany/unpin 전까지 해제하지 않음
+   */
+  async getMany(indices) {
+    const missing = indices.filter((i) => !this.entries.has(i));
+    this.hits += indices.length - missing.length;
+    this.misses += missing.length;
+    this.pinned = new Set(indices);
+    return this.load(indices);
+  }
+
+  unpin() {
+    this.pinned = new Set();
+    this.evict();
+  }
+
+  /**
+   * index부터 연속으로 없는 칩 묶음 (이미 있거나 생성 중인 칩 전까지, 최대 renderBatch개)
+   */
+  runFrom(index) {
+    const run = [];
+    for (let i = index; i < this.total && run.length < this.renderBatch; i++) {
+      if (this.entries.has(i) || this.loading.has(i)) break;
+      run.push(i);
+    }
+    return run;
+  }
+
+  load(indices) {
+    // 이미 있거나 생성 중인 칩은 다시 만들지 않음
+    const fresh = indices.filter(
+      (i) => !this.entries.has(i) && !this.loading.has(i)
+    );
+    if (fresh.length) {
+      const batch = this.render(fresh).then((results) => {
+        if (this.closed) {
+          if (this.release) results.forEach((layers) => this.release(layers));
+          throw new Error("Patch cache closed");
+        }
+        fresh.forEach((index, k) => {
+          const old = this.entries.get(index);
+          if (old) this.drop(index, old);
+          const layers = results[k];
+          const bytes = layersBytes(layers);
+          this.entries.set(index, { layers, bytes });
+          this.bytes += bytes;
+        });
+        this.evict(new Set(indices));
+        this.notify();
+        return results;
+      });
+      fresh.forEach((index, k) => {
+        const promise = batch
+          .then((results) => results[k])
+          .finally(() => this.loading.delete(index));
+        // 미리 생성 실패는 get 할 때 다시 시도
+        promise.catch(() => {});
+        this.loading.set(index, promise);
+      });
+    }
+    return Promise.all(indices.map((i) => this.loading.get(i) || this.peek(i)));
+  }
+
+  /**
+   * 현재 칩 다음 prefetchAhead개 안에 없는 칩이 있으면 한가할 때 그 칩부터 묶음 생성
+   */
+  schedulePrefetch() {
+    if (this.prefetchAhead <= 0 || this.prefetchScheduled) return;
+    this.prefetchScheduled = true;
+    whenIdle(() => {
+      this.prefetchScheduled = false;
+      if (this.closed) return;
+      // 예약 후 칩이 바뀌었으면 마지막 칩 기준
+      const index = this.current;
+      let ahead = [];
+      for (let d = 1; d <= this.prefetchAhead && !ahead.length; d++) {
+        ahead = this.runFrom(index + d);
+      }
+      if (!ahead.length) return;
+      this.prefetches += ahead.length;
+      this.load(ahead).catch((error) =>
+        console.warn("Patch prefetch failed:", error)
+      );
+    });
+  }
+
+  /**
+   * 예산 초과분 해제 (LRU 순, 현재 칩/보호 칩/사용 중인 칩 제외)
+   */
+  evict(protect = new Set()) {
+    for (const [index, entry] of this.entries) {
+      if (this.bytes <= this.maxBytes) break;
+      if (index === this.current || protect.has(index)) continue;
+      if (this.pinned.has(index)) continue;
+      this.drop(index, entry);
+      this.evictions++;
+    }
+  }
+
+  drop(index, entry) {
+    this.entries.delete(index);
+    this.bytes -= entry.bytes;
+    if (this.release) this.release(entry.layers);
+  }
+
+  notify() {
+    if (this.onChange) this.onChange(this.stats());
+  }
+
+  stats() {
+    return {
+      count: this.total,
+      resident: this.entries.size,
+      loading: this.loading.size,
+      bytes: this.bytes,
+      maxBytes: this.maxBytes,
+      hits: this.hits,
+      misses: this.misses,
+      evictions: this.evictions,
+      prefetches: this.prefetches,
+    };
+  }
+
+  /**
+   * 전체 해제 (새로 추출할 때) - 생성 중인 결과는 버림
+   */
+  close() {
+    this.closed = true;
+    for (const [index, entry] of this.entries) {
+      this.drop(index, entry);
+    }
+  }
+}
@@ -0,0 +1,115 @@
+// TIFF 페이지 디코딩 워커 풀 (페이지별 병렬 디코딩 -> ImageBitmap 전달)
+import { CONFIG } from "./constants.js";
+
+export class TiffDecodePool {
+  /**
+   * 워커/OffscreenCanvas 사용 가능 여부
+   */
+  static isSupported() {
+    return (
+      typeof Worker !== "undefined" &&
+      typeof OffscreenCanvas !== "undefined" &&
+      typeof ImageBitmap !== "undefined"
+    );
+  }
+
+  /**
+   * 기본 워커 수 (코어 수, 최대 CONFIG.MAX_DECODE_WORKERS)
+   */
+  static defaultSize() {
+    const cores = navigator.hardwareConcurrency || 4;
+    return Math.max(1, Math.min(cores, CONFIG.MAX_DECODE_WORKERS));
+  }
+
+  constructor(size = TiffDecodePool.defaultSize()) {
+    this.workers = [];
+    this.idle = [];
+    this.queue = []; // 대기 중인 작업 { message, resolve, reject }
+    this.pending = new Map(); // id -> { worker, resolve, reject }
+    this.nextId = 0;
+
+    for (let i = 0; i < size; i++) {
+      const worker = new Worker(
+        new URL("./tiffDecodeWorker.js", import.meta.url),
+        { type: "module" }
+      );
+      worker.onmessage = (e) => this.handleMessage(worker, e.data);
+      // 모듈 로드 실패 등 워커 자체 오류 -> 해당 워커 작업 실패 처리
+      worker.onerror = (e) => {
+        e.preventDefault();
+        this.failWorker(worker, new Error(e.message || "Decode worker failed"));
+      };
+      this.workers.push(worker);
+      this.idle.push(worker);
+    }
+  }
+
+  get size() {
+    return this.workers.length;
+  }
+
+  /**
+   * 페이지 하나 디코딩 요청
+   * 반환: { bitmap, width, height, originalWidth, originalHeight }
+   */
+  decodePage(url, pageIndex, maxSize, ifdOffsets = null) {
+    return new Promise((resolve, reject) => {
+      this.queue.push({
+        message: { url, pageIndex, maxSize, ifdOffsets },
+        resolve,
+        reject,
+      });
+      this.dispatch();
+    });
+  }
+
+  dispatch() {
+    while (this.idle.length && this.queue.length) {
+      const worker = this.idle.pop();
+      const job = this.queue.shift();
+      const id = this.nextId++;
+      this.pending.set(id, { worker, resolve: job.resolve, reject: job.reject });
+      worker.postMessage({ id, ...job.message });
+    }
+  }
+
+  handleMessage(worker, data) {
+    const job = this.pending.get(data.id);
+    if (!job) return;
+    this.pending.delete(data.id);
+    this.idle.push(worker);
+
+    if (data.error) {
+      job.reject(new Error(data.error));
+    } else {
+      job.resolve(data);
+    }
+    this.dispatch();
+  }
+
+  failWorker(worker, error) {
+    for (const [id, job] of this.pending) {
+      if (job.worker === worker) {
+        this.pending.delete(id);
+        job.reject(error);
+      }
+    }
+    worker.terminate();
+    this.workers = this.workers.filter((w) => w !== worker);
+    this.idle = this.idle.filter((w) => w !== worker);
+    // 워커가 모두 죽으면 대기 작업도 실패
+    if (this.workers.length === 0) {
+      this.queue.splice(0).forEach((job) => job.reject(error));
+    }
+  }
+
+  terminate() {
+    const error = new Error("Decode pool terminated");
+    this.queue.splice(0).forEach((job) => job.reject(error));
+    this.pending.forEach((job) => job.reject(error));
+    this.pending.clear();
+    this.workers.forEach((worker) => worker.terminate());
+    this.workers = [];
+    this.idle = [];
+  }
+}
@@ -0,0 +1,72 @@
+// TIFF 페이지 디코딩/축소 워커 (module worker, TiffDecodePool에서 사용)
+import * as GeoTIFF from "https://cdn.jsdelivr.net/npm/geotiff@2.1.3/+esm";
+import { ImageProcessor } from "./imageProcessor.js";
+
+// url -> GeoTIFF (같은 파일의 여러 페이지를 한 워커가 맡을 때 헤더/IFD 재사용)
+const tiffs = new Map();
+
+function openTiff(url, ifdOffsets) {
+  let tiff = tiffs.get(url);
+  if (!tiff) {
+    tiff = GeoTIFF.fromUrl(url).then((opened) => {
+      if (ifdOffsets) {
+        ImageProcessor.primeIfdRequests(opened, {
+          pages: ifdOffsets.map((ifdOffset) => ({ ifdOffset })),
+        });
+      }
+      return opened;
+    });
+    tiffs.set(url, tiff);
+  }
+  return tiff;
+}
+
+/**
+ * 한 페이지를 maxSize 이내로 읽어서 ImageBitmap으로 변환
+ */
+async function decodePage({ url, ifdOffsets, pageIndex, maxSize }) {
+  const tiff = await openTiff(url, ifdOffsets);
+  const image = await tiff.getImage(pageIndex);
+  const originalWidth = image.getWidth();
+  const originalHeight = image.getHeight();
+
+  const scale = Math.min(1, maxSize / Math.max(originalWidth, originalHeight));
+  const width = Math.round(originalWidth * scale);
+  const height = Math.round(originalHeight * scale);
+
+  const rasters = await image.readRasters({
+    width,
+    height,
+    resampleMethod: "nearest",
+    samples: [0], // 첫 번째 밴드만 사용
+  });
+
+  const canvas = new OffscreenCanvas(width, height);
+  const ctx = canvas.getContext("2d");
+  const imageData = ctx.createImageData(width, height);
+  ImageProcessor.convertRasterToImageData(
+    rasters[0],
+    imageData.data,
+    width,
+    height
+  );
+  ctx.putImageData(imageData, 0, 0);
+
+  return {
+    bitmap: canvas.transferToImageBitmap(),
+    width,
+    height,
+    originalWidth,
+    originalHeight,
+  };
+}
+
+self.onmessage = async (e) => {
+  const { id } = e.data;
+  try {
+    const result = await decodePage(e.data);
+    self.postMessage({ id, ...result }, [result.bitmap]);
+  } catch (error) {
+    self.postMessage({ id, error: error.message || String(error) });
+  }
+};
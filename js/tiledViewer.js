@@ -0,0 +1,440 @@
+// 타일 기반 웨이퍼 뷰어 (Range 서버 /tile API, 보이는 타일/피라미드 레벨만 요청)
+import { CONFIG } from "./constants.js";
+import { ImageProcessor } from "./imageProcessor.js";
+
+// 스트립 TIFF의 가상 타일 크기 (서버 tile_cache.VIRTUAL_TILE_SIZE와 같아야 함)
+const VIRTUAL_TILE_SIZE = 512;
+const MIN_ZOOM = 1 / 256;
+const MAX_ZOOM = 8;
+
+/**
+ * 레이어별 타일 LRU (레이어 안에서는 타일 LRU, 전체 예산 초과 시 오래 안 본 레이어부터 제거)
+ */
+export class LayerTileCache {
+  constructor(maxBytes = CONFIG.TILE_CACHE_MB * 1024 * 1024) {
+    this.maxBytes = maxBytes;
+    this.bytes = 0;
+    this.layers = new Map(); // layer -> Map<tileKey, { bitmap, bytes }> (둘 다 최근 사용 순)
+    this.hits = 0;
+    this.misses = 0;
+    this.evictions = 0;
+  }
+
+  get(layer, key) {
+    const tiles = this.layers.get(layer);
+    const entry = tiles && tiles.get(key);
+    if (!entry) {
+      this.misses++;
+      return null;
+    }
+    this.hits++;
+    this.touch(layer, tiles);
+    tiles.delete(key);
+    tiles.set(key, entry);
+    return entry.bitmap;
+  }
+
+  /**
+   * 통계/LRU 순서를 건드리지 않는 조회 (상위 레벨 대체 타일 탐색용)
+   */
+  peek(layer, key) {
+    const tiles = this.layers.get(layer);
+    const entry = tiles && tiles.get(key);
+    return entry ? entry.bitmap : null;
+  }
+
+  put(layer, key, bitmap) {
+    let tiles = this.layers.get(layer);
+    if (!tiles) {
+      tiles = new Map();
+      this.layers.set(layer, tiles);
+    }
+    this.touch(layer, tiles);
+
+    const old = tiles.get(key);
+    if (old) this.drop(tiles, key, old);
+
+    const bytes = bitmap.width * bitmap.height * 4;
+    tiles.set(key, { bitmap, bytes });
+    this.bytes += bytes;
+    this.evict(layer);
+  }
+
+  touch(layer, tiles) {
+    this.layers.delete(layer);
+    this.layers.set(layer, tiles);
+  }
+
+  drop(tiles, key, entry) {
+    tiles.delete(key);
+    this.bytes -= entry.bytes;
+    entry.bitmap.close && entry.bitmap.close();
+  }
+
+  evict(currentLayer) {
+    // 다른 레이어(오래 안 본 순)부터 비우고, 그래도 넘치면 현재 레이어의 오래된 타일
+    for (const [layer, tiles] of this.layers) {
+      if (this.bytes <= this.maxBytes) return;
+      if (layer === currentLayer) continue;
+      this.evictFrom(layer, tiles, 0);
+    }
+    const tiles = this.layers.get(currentLayer);
+    // 방금 넣은 타일은 남김
+    if (tiles) this.evictFrom(currentLayer, tiles, 1);
+  }
+
+  evictFrom(layer, tiles, keep) {
+    for (const [key, entry] of tiles) {
+      if (this.bytes <= this.maxBytes || tiles.size <= keep) break;
+      this.drop(tiles, key, entry);
+      this.evictions++;
+    }
+    if (tiles.size === 0) this.layers.delete(layer);
+  }
+
+  clear() {
+    for (const tiles of this.layers.values()) {
+      for (const entry of tiles.values()) {
+        entry.bitmap.close && entry.bitmap.close();
+      }
+    }
+    this.layers.clear();
+    this.bytes = 0;
+  }
+
+  stats() {
+    let tiles = 0;
+    for (const layerTiles of this.layers.values()) tiles += layerTiles.size;
+    return {
+      tiles,
+      layers: this.layers.size,
+      bytes: this.bytes,
+      maxBytes: this.maxBytes,
+      hits: this.hits,
+      misses: this.misses,
+      evictions: this.evictions,
+    };
+  }
+}
+
+/**
+ * 원본 해상도 좌표 기준 뷰포트(view.x/y = 캔버스 좌상단, view.zoom = 화면 px / 원본 px)
+ * render()는 줌에 맞는 피라미드 레벨의 보이는 타일만 그리고, 없는 타일은 요청 후
+ * 도착하면 onTileLoaded를 호출한다 (그 사이에는 캐시된 상위 레벨 타일로 대신 그림)
+ */
+export class TiledWaferViewer {
+  constructor(canvas, { onTileLoaded = null, cache = null } = {}) {
+    this.canvas = canvas;
+    this.ctx = canvas.getContext("2d");
+    this.onTileLoaded = onTileLoaded;
+    this.cache = cache || new LayerTileCache();
+
+    this.tiffUrl = null;
+    this.levels = []; // [{ level, factor, pages: [{ width, height, tileWidth, tileHeight }] }]
+    this.view = { x: 0, y: 0, zoom: 1 };
+    this.inflight = new Map(); // requestKey -> AbortController
+    this.failed = new Set(); // 실패한 requestKey (렌더링마다 재요청하지 않음)
+    this.renderedLevel = 0;
+  }
+
+  get isOpen() {
+    return this.levels.length > 0;
+  }
+
+  /**
+   * TIFF 인덱스/오버뷰 목록 조회 후 전체가 보이도록 뷰 초기화
+   */
+  async open(tiffUrl) {
+    this.close();
+
+    const meta = await ImageProcessor.fetchTiffMeta(tiffUrl);
+    if (!meta) {
+      throw new Error("TIFF index not available from Range server");
+    }
+
+    const levels = [{ level: 0, factor: 1, pages: meta.pages.map(tileGrid) }];
+    for (const overview of meta.overviews || []) {
+      const level = Math.log2(overview.factor);
+      // /tile API는 1/2^n 오버뷰만 레벨로 지원
+      if (!Number.isInteger(level) || level < 1) continue;
+      const overviewMeta = await ImageProcessor.fetchTiffMeta(
+        new URL(overview.file, tiffUrl).toString()
+      );
+      if (!overviewMeta) continue;
+      levels.push({
+        level,
+        factor: overview.factor,
+        pages: overviewMeta.pages.map(tileGrid),
+      });
+    }
+
+    this.tiffUrl = tiffUrl;
+    this.levels = levels;
+    this.fitCanvas();
+    this.fit();
+    console.log(
+      `Tiled viewer: ${meta.pages[0]?.width}x${meta.pages[0]?.height}, levels ${levels
+        .map((l) => `1/${l.factor}`)
+        .join(", ")}`
+    );
+  }
+
+  close() {
+    this.inflight.forEach((controller) => controller.abort());
+    this.inflight.clear();
+    this.failed.clear();
+    this.cache.clear();
+    this.levels = [];
+    this.tiffUrl = null;
+  }
+
+  /**
+   * 원본 해상도 크기 (레벨 0)
+   */
+  fullSize(layer = 0) {
+    const page = this.levels[0].pages[layer] || this.levels[0].pages[0];
+    return { width: page.width, height: page.height };
+  }
+
+  /**
+   * 캔버스 크기를 원본 비율에 맞춤 (ImageProcessor.drawPage와 같은 최대 크기)
+   */
+  fitCanvas(maxSize = CONFIG.MAX_DISPLAY_SIZE) {
+    const { width, height } = this.fullSize();
+    const scale = Math.min(maxSize / width, maxSize / height, 1);
+    this.canvas.width = Math.max(1, Math.floor(width * scale));
+    this.canvas.height = Math.max(1, Math.floor(height * scale));
+  }
+
+  /**
+   * 전체 이미지가 캔버스에 들어오도록 뷰 설정
+   */
+  fit() {
+    const { width, height } = this.fullSize();
+    this.view = {
+      x: 0,
+      y: 0,
+      zoom: Math.min(this.canvas.width / width, this.canvas.height / height),
+    };
+  }
+
+  /**
+   * 화면 px 단위 이동
+   */
+  panBy(dx, dy) {
+    this.view.x -= dx / this.view.zoom;
+    this.view.y -= dy / this.view.zoom;
+  }
+
+  /**
+   * 화면 좌표 (sx, sy)를 고정점으로 확대/축소
+   */
+  zoomAt(sx, sy, factor) {
+    const zoom = Math.min(MAX_ZOOM, Math.max(MIN_ZOOM, this.view.zoom * factor));
+    const fx = this.view.x + sx / this.view.zoom;
+    const fy = this.view.y + sy / this.view.zoom;
+    this.view = { x: fx - sx / zoom, y: fy - sy / zoom, zoom };
+  }
+
+  /**
+   * 줌에 맞는 피라미드 레벨 (화면 1px에 레벨 1px 이상 대응하는 가장 작은 레벨)
+   */
+  chooseLevel(layer) {
+    let best = this.levels[0];
+    for (const level of this.levels) {
+      if (!level.pages[layer]) continue;
+      if (level.factor <= 1 / this.view.zoom && level.factor > best.factor) {
+        best = level;
+      }
+    }
+    return best;
+  }
+
+  /**
+   * 현재 뷰 그리기 - 반환값은 그리드 오버레이용 변환 { zoom, offsetX, offsetY }
+   */
+  render(layer) {
+    const { ctx, canvas, view } = this;
+    ctx.setTransform(1, 0, 0, 1, 0, 0);
+    ctx.fillStyle = "#000";
+    ctx.fillRect(0, 0, canvas.width, canvas.height);
+
+    const level = this.chooseLevel(layer);
+    const page = level.pages[layer];
+    this.renderedLevel = level.level;
+
+    // 보이는 영역 (레벨 좌표)
+    const f = level.factor;
+    const x0 = Math.max(0, view.x / f);
+    const y0 = Math.max(0, view.y / f);
+    const x1 = Math.min(page.width, (view.x + canvas.width / view.zoom) / f);
+    const y1 = Math.min(page.height, (view.y + canvas.height / view.zoom) / f);
+
+    const wanted = new Set();
+    if (x1 > x0 && y1 > y0) {
+      const tx0 = Math.floor(x0 / page.tileWidth);
+      const ty0 = Math.floor(y0 / page.tileHeight);
+      const tx1 = Math.ceil(x1 / page.tileWidth);
+      const ty1 = Math.ceil(y1 / page.tileHeight);
+      const scale = f * view.zoom;
+
+      for (let ty = ty0; ty < ty1; ty++) {
+        for (let tx = tx0; tx < tx1; tx++) {
+          const dx = (tx * page.tileWidth * f - view.x) * view.zoom;
+          const dy = (ty * page.tileHeight * f - view.y) * view.zoom;
+          const key = tileKey(level.level, tx, ty);
+          const bitmap = this.cache.get(layer, key);
+          if (bitmap) {
+            ctx.drawImage(
+              bitmap,
+              dx,
+              dy,
+              bitmap.width * scale,
+              bitmap.height * scale
+            );
+            continue;
+          }
+          this.drawFallback(layer, level, page, tx, ty);
+          wanted.add(`${layer}/${key}`);
+          this.requestTile(layer, level.level, tx, ty);
+        }
+      }
+    }
+
+    // 더 이상 보이지 않는 타일 요청 취소
+    for (const [requestKey, controller] of this.inflight) {
+      if (!wanted.has(requestKey)) {
+        controller.abort();
+        this.inflight.delete(requestKey);
+      }
+    }
+
+    return {
+      zoom: view.zoom,
+      offsetX: -view.x * view.zoom,
+      offsetY: -view.y * view.zoom,
+    };
+  }
+
+  /**
+   * 아직 없는 타일 자리에 캐시된 상위(저해상도) 레벨 타일의 해당 부분을 확대해서 그림
+   */
+  drawFallback(layer, level, page, tx, ty) {
+    const { view } = this;
+    const rx = tx * page.tileWidth * level.factor;
+    const ry = ty * page.tileHeight * level.factor;
+    const rw = page.tileWidth * level.factor;
+    const rh = page.tileHeight * level.factor;
+
+    for (const coarse of this.levels) {
+      const coarsePage = coarse.pages[layer];
+      if (coarse.factor <= level.factor || !coarsePage) continue;
+      const f = coarse.factor;
+      const ctx0 = Math.floor(rx / f / coarsePage.tileWidth);
+      const cty0 = Math.floor(ry / f / coarsePage.tileHeight);
+      const bitmap = this.cache.peek(layer, tileKey(coarse.level, ctx0, cty0));
+      if (!bitmap) continue;
+
+      // 상위 레벨 타일 안에서 이 타일 영역 (원본 좌표 -> 상위 타일 px)
+      const ox = ctx0 * coarsePage.tileWidth * f;
+      const oy = cty0 * coarsePage.tileHeight * f;
+      const sx = (rx - ox) / f;
+      const sy = (ry - oy) / f;
+      const sw = Math.min(rw / f, bitmap.width - sx);
+      const sh = Math.min(rh / f, bitmap.height - sy);
+      if (sw <= 0 || sh <= 0) continue;
+
+      this.ctx.drawImage(
+        bitmap,
+        sx,
+        sy,
+        sw,
+        sh,
+        (rx - view.x) * view.zoom,
+        (ry - view.y) * view.zoom,
+        sw * f * view.zoom,
+        sh * f * view.zoom
+      );
+      return;
+    }
+  }
+
+  /**
+   * 타일 요청 (/tile/<file>/<page>/<level>/<tx>/<ty>, uint8 그레이스케일)
+   */
+  requestTile(layer, level, tx, ty) {
+    const key = tileKey(level, tx, ty);
+    const requestKey = `${layer}/${key}`;
+    if (this.inflight.has(requestKey) || this.failed.has(requestKey)) return;
+
+    const controller = new AbortController();
+    this.inflight.set(requestKey, controller);
+    const url = `${ImageProcessor.getServerApiUrl(
+      this.tiffUrl,
+      "/tile"
+    )}/${layer}/${level}/${tx}/${ty}`;
+
+    fetch(url, { signal: controller.signal })
+      .then(async (response) => {
+        if (!response.ok) {
+          throw new Error(`Tile server returned ${response.status}`);
+        }
+        const width = parseInt(response.headers.get("X-Tile-Width"), 10);
+        const height = parseInt(response.headers.get("X-Tile-Height"), 10);
+        const gray = new Uint8Array(await response.arrayBuffer());
+
+        const imageData = new ImageData(width, height);
+        ImageProcessor.convertRasterToImageData(
+          gray,
+          imageData.data,
+          width,
+          height
+        );
+        return createImageBitmap(imageData);
+      })
+      .then((bitmap) => {
+        // 닫히거나 다른 TIFF로 바뀐 뒤 도착한 타일은 버림
+        if (this.inflight.get(requestKey) !== controller) {
+          bitmap.close();
+          return;
+        }
+        this.inflight.delete(requestKey);
+        this.cache.put(layer, key, bitmap);
+        if (this.onTileLoaded) this.onTileLoaded(layer, level, tx, ty);
+      })
+      .catch((error) => {
+        if (this.inflight.get(requestKey) === controller) {
+          this.inflight.delete(requestKey);
+        }
+        if (error.name !== "AbortError") {
+          this.failed.add(requestKey);
+          console.warn(`Tile ${requestKey} failed:`, error);
+        }
+      });
+  }
+
+  stats() {
+    return {
+      ...this.cache.stats(),
+      inflight: this.inflight.size,
+      level: this.renderedLevel,
+      zoom: this.view.zoom,
+    };
+  }
+}
+
+function tileKey(level, tx, ty) {
+  return `${level}/${tx}/${ty}`;
+}
+
+/**
+ * 인덱스 페이지 정보 -> 타일 그리드 (스트립 TIFF는 서버 가상 타일 크기)
+ */
+function tileGrid(page) {
+  return {
+    width: page.width,
+    height: page.height,
+    tileWidth: page.tiled ? page.tileWidth : VIRTUAL_TILE_SIZE,
+    tileHeight: page.tiled ? page.tileHeight : VIRTUAL_TILE_SIZE,
+  };
+}
@@ -2,6 +2,8 @@
 import { VOID_COLORS, CONFIG } from "./constants.js";
 import { parsePatchLabel } from "./utils.js";
 
+const EMPTY_MAP = new Map();
+
 export class VoidManagerV2 {
   constructor() {
     // 보이드 데이터 구조: Map<voidKey, voidData>
@@ -13,6 +15,10 @@ export class VoidManagerV2 {
     // locationKey: "x,y,layer" -> nextIndex
     this.voidIndexCounters = new Map();
 
+    // 보조 인덱스: chipKey "x,y" -> Map<layer, Map<voidKey, voidData>>
+    // voids를 직접 수정하지 말고 setVoid/removeVoid/clearVoids를 거쳐야 함
+    this.voidsByChip = new Map();
+
     this.syncMode = true;
 
     // bbox 관련 설정
@@ -42,6 +48,118 @@ export class VoidManagerV2 {
     return `${x},${y}`;
   }
 
+  /**
+   * 보이드 저장 (보조 인덱스 함께 갱신)
+   */
+  setVoid(voidKey, voidData) {
+    const old = this.voids.get(voidKey);
+    if (old) this.unindexVoid(voidKey, old);
+
+    this.voids.set(voidKey, voidData);
+    const chipKey = this.createChipKey(voidData.x, voidData.y);
+    let layers = this.voidsByChip.get(chipKey);
+    if (!layers) {
+      layers = new Map();
+      this.voidsByChip.set(chipKey, layers);
+    }
+    let layerVoids = layers.get(voidData.layer);
+    if (!layerVoids) {
+      layerVoids = new Map();
+      layers.set(voidData.layer, layerVoids);
+    }
+    layerVoids.set(voidKey, voidData);
+  }
+
+  /**
+   * 보이드 제거 (보조 인덱스 함께 갱신)
+   */
+  removeVoid(voidKey) {
+    const voidData = this.voids.get(voidKey);
+    if (!voidData) return false;
+    this.voids.delete(voidKey);
+    this.unindexVoid(voidKey, voidData);
+    return true;
+  }
+
+  unindexVoid(voidKey, voidData) {
+    const chipKey = this.createChipKey(voidData.x, voidData.y);
+    const layers = this.voidsByChip.get(chipKey);
+    const layerVoids = layers && layers.get(voidData.layer);
+    if (!layerVoids) return;
+    layerVoids.delete(voidKey);
+    if (layerVoids.size === 0) layers.delete(voidData.layer);
+    if (layers.size === 0) this.voidsByChip.delete(chipKey);
+  }
+
+  /**
+   * 전체 보이드/인덱스 카운터 초기화
+   */
+  clearVoids() {
+    this.voids.clear();
+    this.voidIndexCounters.clear();
+    this.voidsByChip.clear();
+  }
+
+  /**
+   * exportVoids 형식의 보이드 목록 불러오기 (기존 데이터 교체)
+   */
+  importVoids(records) {
+    this.clearVoids();
+    records.forEach(({ key, ...voidData }) => {
+      const voidKey =
+        key ||
+        this.createVoidKey(
+          voidData.x,
+          voidData.y,
+          voidData.layer,
+          voidData.voidIndex
+        );
+      this.setVoid(voidKey, voidData);
+
+      // 인덱스 카운터도 업데이트
+      const locationKey = this.createLocationKey(
+        voidData.x,
+        voidData.y,
+        voidData.layer
+      );
+      const currentMax = this.voidIndexCounters.get(locationKey) || 0;
+      this.voidIndexCounters.set(
+        locationKey,
+        Math.max(currentMax, voidData.voidIndex + 1)
+      );
+    });
+  }
+
+  /**
+   * 특정 위치(x,y,layer)의 보이드 Map (없으면 빈 Map)
+   */
+  getLayerVoidMap(x, y, layer) {
+    const layers = this.voidsByChip.get(this.createChipKey(x, y));
+    return (layers && layers.get(layer)) || EMPTY_MAP;
+  }
+
+  /**
+   * 특정 칩(x,y)의 모든 레이어 보이드들
+   */
+  getChipVoids(x, y) {
+    const layers = this.voidsByChip.get(this.createChipKey(x, y));
+    if (!layers) return [];
+    const result = [];
+    for (const layerVoids of layers.values()) {
+      for (const voidData of layerVoids.values()) result.push(voidData);
+    }
+    return result;
+  }
+
+  /**
+   * 칩(x,y)에 보이드가 있는지 (layer를 주면 해당 레이어만)
+   */
+  hasVoids(x, y, layer) {
+    const layers = this.voidsByChip.get(this.createChipKey(x, y));
+    if (!layers) return false;
+    return layer === undefined || layers.has(layer);
+  }
+
   /**
    * 다음 보이드 인덱스 가져오기
    */
@@ -82,7 +200,7 @@ export class VoidManagerV2 {
       patchLabel, // 참조용
     };
 
-    this.voids.set(voidKey, voidData);
+    this.setVoid(voidKey, voidData);
     console.log(`Created void: ${voidKey}`, voidData);
 
     return voidData;
@@ -100,30 +218,26 @@ export class VoidManagerV2 {
     const voidsToDelete = [];
 
     // 해당 위치(x,y,layer)의 모든 보이드 검사
-    for (const [voidKey, voidData] of this.voids.entries()) {
+    for (const [voidKey, voidData] of this.getLayerVoidMap(x, y, layer)) {
       console.log(`Checking void: ${voidKey}`, voidData);
 
-      if (voidData.x === x && voidData.y === y && voidData.layer === layer) {
-        console.log(`Found matching void at same location: ${voidKey}`);
-
-        // 클릭한 위치가 보이드 내부인지 확인
-        const dx = (centerX - voidData.centerX) / voidData.radiusX;
-        const dy = (centerY - voidData.centerY) / voidData.radiusY;
-        const inside = dx * dx + dy * dy <= 1;
+      // 클릭한 위치가 보이드 내부인지 확인
+      const dx = (centerX - voidData.centerX) / voidData.radiusX;
+      const dy = (centerY - voidData.centerY) / voidData.radiusY;
+      const inside = dx * dx + dy * dy <= 1;
 
-        console.log(`Distance check: dx=${dx}, dy=${dy}, inside=${inside}`);
+      console.log(`Distance check: dx=${dx}, dy=${dy}, inside=${inside}`);
 
-        if (inside) {
-          voidsToDelete.push(voidKey);
-          console.log(`Marked for deletion: ${voidKey}`);
-        }
+      if (inside) {
+        voidsToDelete.push(voidKey);
+        console.log(`Marked for deletion: ${voidKey}`);
       }
     }
 
     // 삭제 실행
     voidsToDelete.forEach((voidKey) => {
       console.log(`Deleting void: ${voidKey}`);
-      this.voids.delete(voidKey);
+      this.removeVoid(voidKey);
     });
 
     console.log(`Deleted ${voidsToDelete.length} voids`);
@@ -144,21 +258,20 @@ export class VoidManagerV2 {
     newRadiusX,
     newRadiusY
   ) {
-    for (const [voidKey, voidData] of this.voids.entries()) {
-      if (voidData.x === x && voidData.y === y && voidData.layer === layer) {
-        // 기존 위치와 일치하는 보이드 찾기
-        const dx = (oldCenterX - voidData.centerX) / voidData.radiusX;
-        const dy = (oldCenterY - voidData.centerY) / voidData.radiusY;
-        const inside = dx * dx + dy * dy <= 1;
-
-        if (inside) {
-          voidData.centerX = newCenterX;
-          voidData.centerY = newCenterY;
-          voidData.radiusX = newRadiusX;
-          voidData.radiusY = newRadiusY;
-          console.log(`Updated void: ${voidKey}`, voidData);
-          return voidData;
-        }
+    // 위치(x,y,layer)는 바뀌지 않으므로 인덱스 갱신 불필요
+    for (const [voidKey, voidData] of this.getLayerVoidMap(x, y, layer)) {
+      // 기존 위치와 일치하는 보이드 찾기
+      const dx = (oldCenterX - voidData.centerX) / voidData.radiusX;
+      const dy = (oldCenterY - voidData.centerY) / voidData.radiusY;
+      const inside = dx * dx + dy * dy <= 1;
+
+      if (inside) {
+        voidData.centerX = newCenterX;
+        voidData.centerY = newCenterY;
+        voidData.radiusX = newRadiusX;
+        voidData.radiusY = newRadiusY;
+        console.log(`Updated void: ${voidKey}`, voidData);
+        return voidData;
       }
     }
     return null;
@@ -168,13 +281,7 @@ export class VoidManagerV2 {
    * 특정 패치(x,y,layer)의 보이드들 가져오기 (실선용)
    */
   getSolidVoids(x, y, layer) {
-    const result = [];
-    for (const [voidKey, voidData] of this.voids.entries()) {
-      if (voidData.x === x && voidData.y === y && voidData.layer === layer) {
-        result.push(voidData);
-      }
-    }
-    return result;
+    return Array.from(this.getLayerVoidMap(x, y, layer).values());
   }
 
   /**
@@ -183,15 +290,13 @@ export class VoidManagerV2 {
   getDottedVoids(x, y, currentLayer) {
     if (!this.syncMode) return [];
 
+    const layers = this.voidsByChip.get(this.createChipKey(x, y));
+    if (!layers) return [];
+
     const result = [];
-    for (const [voidKey, voidData] of this.voids.entries()) {
-      if (
-        voidData.x === x &&
-        voidData.y === y &&
-        voidData.layer !== currentLayer
-      ) {
-        result.push(voidData);
-      }
+    for (const [layer, layerVoids] of layers) {
+      if (layer === currentLayer) continue;
+      for (const voidData of layerVoids.values()) result.push(voidData);
     }
     return result;
   }
@@ -200,24 +305,22 @@ export class VoidManagerV2 {
    * 특정 좌표와 클릭 위치로 편집 가능한 보이드 찾기
    */
   findEditableVoid(x, y, layer, clickX, clickY) {
-    for (const [voidKey, voidData] of this.voids.entries()) {
-      if (voidData.x === x && voidData.y === y && voidData.layer === layer) {
-        // 클릭한 위치가 보이드 경계 근처인지 확인
-        const dx = clickX - voidData.centerX;
-        const dy = clickY - voidData.centerY;
-        const angle = Math.atan2(dy, dx);
-        const rB =
-          (voidData.radiusX * voidData.radiusY) /
-          Math.sqrt(
-            (voidData.radiusY * Math.cos(angle)) ** 2 +
-              (voidData.radiusX * Math.sin(angle)) ** 2
-          );
-        const dist = Math.hypot(dx, dy);
+    for (const voidData of this.getLayerVoidMap(x, y, layer).values()) {
+      // 클릭한 위치가 보이드 경계 근처인지 확인
+      const dx = clickX - voidData.centerX;
+      const dy = clickY - voidData.centerY;
+      const angle = Math.atan2(dy, dx);
+      const rB =
+        (voidData.radiusX * voidData.radiusY) /
+        Math.sqrt(
+          (voidData.radiusY * Math.cos(angle)) ** 2 +
+            (voidData.radiusX * Math.sin(angle)) ** 2
+        );
+      const dist = Math.hypot(dx, dy);
 
-        // 보이드 내부 또는 경계 근처
-        if (dist <= rB + CONFIG.TOLERANCE) {
-          return voidData;
-        }
+      // 보이드 내부 또는 경계 근처
+      if (dist <= rB + CONFIG.TOLERANCE) {
+        return voidData;
       }
     }
     return null;
@@ -340,12 +443,7 @@ export class VoidManagerV2 {
     ctx.setLineDash([]);
 
     // 해당 칩의 모든 레이어 보이드들을 실선으로 그리기
-    const allVoids = [];
-    for (const [voidKey, voidData] of this.voids.entries()) {
-      if (voidData.x === x && voidData.y === y) {
-        allVoids.push(voidData);
-      }
-    }
+    const allVoids = this.getChipVoids(x, y);
 
     allVoids.forEach((voidData) => {
       ctx.beginPath();
@@ -401,12 +499,22 @@ export class VoidManagerV2 {
 
   /**
    * 이미지 데이터에서 edge 검출하여 bbox 후보 생성
+   * imageData: { width, height, data } - data는 RGBA 또는 그레이스케일(1채널)
    */
   detectBboxFromImage(imageData) {
     const width = imageData.width;
     const height = imageData.height;
     const data = imageData.data;
 
+    // 그레이 평면 (1채널이면 그대로 사용)
+    let gray = data;
+    if (data.length !== width * height) {
+      gray = new Uint8Array(width * height);
+      for (let i = 0, p = 0; i < gray.length; i++, p += 4) {
+        gray[i] = (data[p] + data[p + 1] + data[p + 2]) / 3;
+      }
+    }
+
     // 간단한 Sobel edge detection
     const sobelX = [-1, 0, 1, -2, 0, 2, -1, 0, 1];
     const sobelY = [-1, -2, -1, 0, 0, 0, 1, 2, 1];
@@ -421,12 +529,11 @@ export class VoidManagerV2 {
 
         for (let ky = -1; ky <= 1; ky++) {
           for (let kx = -1; kx <= 1; kx++) {
-            const idx = ((y + ky) * width + (x + kx)) * 4;
-            const gray = (data[idx] + data[idx + 1] + data[idx + 2]) / 3;
+            const value = gray[(y + ky) * width + (x + kx)];
             const kernelIdx = (ky + 1) * 3 + (kx + 1);
 
-            gx += gray * sobelX[kernelIdx];
-            gy += gray * sobelY[kernelIdx];
+            gx += value * sobelX[kernelIdx];
+            gy += value * sobelY[kernelIdx];
           }
         }
 
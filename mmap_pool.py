@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Range 서버용 파일 mmap 풀
+파일마다 열린 파일 객체 + mmap을 하나씩 유지하고 (개수 제한, LRU 제거),
+stat은 TTL 동안 캐시해서 요청마다 open/seek/stat을 하지 않는다.
+사용 중인(refcount > 0) 매핑은 제거하거나 파일이 바뀌어도 반환될 때까지 닫지 않는다
+"""
+import mmap
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from email.utils import formatdate
+
+DEFAULT_MAX_FILES = 64
+# 파일 변경 확인(stat) 주기 (초)
+DEFAULT_STAT_TTL = 1.0
+
+
+class MappedFile:
+    """열린 파일 하나 (mmap + sendfile용 파일 객체)"""
+
+    def __init__(self, path, stat):
+        self.path = path
+        self.size = stat.st_size
+        self.fingerprint = (stat.st_mtime_ns, stat.st_size)
+        self.mtime = stat.st_mtime
+        # HTTP 캐시 검증자 (inode/mtime/size가 같으면 같은 내용으로 간주)
+        self.etag = f'"{stat.st_ino:x}-{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        self.last_modified = formatdate(stat.st_mtime, usegmt=True)
+        self.file = open(path, 'rb')
+        self.mmap = None
+        if self.size:  # 빈 파일은 mmap할 수 없음
+            self.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.checked = time.monotonic()
+        self.refs = 0
+        self.retired = False
+
+    def slice(self, start, end):
+        """[start, end) 구간 memoryview (복사 없음, 사용 후 release 필요)"""
+        if self.mmap is None:
+            return memoryview(b'')
+        return memoryview(self.mmap)[start:end]
+
+    def close(self):
+        if self.mmap is not None:
+            self.mmap.close()
+        self.file.close()
+
+
+class MmapPool:
+    """경로별 MappedFile LRU 풀 (스레드 안전)"""
+
+    def __init__(self, max_files=DEFAULT_MAX_FILES, stat_ttl=DEFAULT_STAT_TTL):
+        self.max_files = max_files
+        self.stat_ttl = stat_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def acquire(self, path):
+        """매핑 가져오기 (없거나 파일이 바뀌었으면 새로 염) - 반드시 release로 반환
+
+        파일이 없으면 OSError (FileNotFoundError, IsADirectoryError 등)
+        """
+        key = os.path.abspath(path)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry.checked < self.stat_ttl:
+                return self._use(key, entry, hit=True)
+
+        # TTL이 지났거나 처음 여는 파일이면 stat으로 변경 여부 확인
+        stat = os.stat(key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.fingerprint == (stat.st_mtime_ns, stat.st_size):
+                entry.checked = now
+                return self._use(key, entry, hit=True)
+
+            new_entry = MappedFile(key, stat)
+            if entry is not None:
+                self._retire(entry)
+            self._entries[key] = new_entry
+            self._evict()
+            return self._use(key, new_entry, hit=False)
+
+    def release(self, entry):
+        with self._lock:
+            entry.refs -= 1
+            if entry.retired and entry.refs == 0:
+                entry.close()
+
+    @contextmanager
+    def open(self, path):
+        entry = self.acquire(path)
+        try:
+            yield entry
+        finally:
+            self.release(entry)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'openFiles': len(self._entries),
+                'maxFiles': self.max_files,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+    def close(self):
+        """모든 매핑 닫기 (사용 중인 것은 반환될 때 닫힘)"""
+        with self._lock:
+            for entry in self._entries.values():
+                self._retire(entry)
+            self._entries.clear()
+
+    def _use(self, key, entry, hit):
+        entry.refs += 1
+        self._entries.move_to_end(key)
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return entry
+
+    def _retire(self, entry):
+        entry.retired = True
+        if entry.refs == 0:
+            entry.close()
+
+    def _evict(self):
+        """개수 제한을 넘으면 오래된 것부터 제거 (사용 중인 매핑은 반환 시 닫힘)"""
+        while len(self._entries) > self.max_files:
+            _, entry = self._entries.popitem(last=False)
+            self._retire(entry)
+            self.evictions += 1
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+전체 해상도 칩 패치 추출기
+웹앱 그리드 메타데이터(origin, referenceGrid, cellW/cellH)와 칩 좌표로 각 레이어의
+원본 해상도 영역을 잘라낸다. 칩이 걸치는 TIFF 타일/스트립만 읽어서 디코딩하고,
+레이어 단위로 프로세스 풀에서 병렬 처리한다. 필요하면 타겟 정규화(enhance.py)까지
+워커에서 함께 수행한다
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image
+from tifffile import TiffFile
+
+from enhance import enhance_settings, enhance_to_target
+
+
+def get_source_size(metadata, page_width, page_height):
+    """그리드가 설정된 (압축된) 페이지 캔버스 크기 - 없으면 원본 크기로 간주"""
+    size = metadata.get('pageSize') or {}
+    width = size.get('width') or page_width
+    height = size.get('height') or page_height
+    return width, height
+
+
+def grid_boxes(metadata, coords, page_width, page_height):
+    """칩 좌표별 원본 해상도 crop 박스 [(x0, y0, w, h)] 계산 (모든 박스는 같은 크기)"""
+    origin = metadata.get('origin') or {'x': 0, 'y': 0}
+    ref = metadata.get('referenceGrid') or {'x': 0, 'y': 0}
+    grid = metadata.get('gridSettings') or {}
+    cell_w = float(grid.get('cellW', 100))
+    cell_h = float(grid.get('cellH', 100))
+
+    source_w, source_h = get_source_size(metadata, page_width, page_height)
+    scale_x = page_width / source_w
+    scale_y = page_height / source_h
+
+    box_w = max(1, round(cell_w * scale_x))
+    box_h = max(1, round(cell_h * scale_y))
+    boxes = []
+    for coord in coords:
+        # 웹앱 extractPatches와 같은 그리드 계산을 원본 해상도로 스케일
+        gx = origin['x'] + (coord['x'] - ref['x']) * cell_w
+        gy = origin['y'] + (coord['y'] - ref['y']) * cell_h
+        boxes.append((round(gx * scale_x), round(gy * scale_y), box_w, box_h))
+    return boxes
+
+
+def _to_uint8(data):
+    """래스터 값을 0~255로 클램프 (convertRasterToImageData와 동일)"""
+    if data.dtype == np.uint8:
+        return data
+    return np.clip(data, 0, 255).astype(np.uint8)
+
+
+def _is_plain_contiguous(page):
+    """압축 없는 연속 스트립이면 memmap으로 필요한 행만 읽을 수 있음"""
+    if page.is_tiled or page.compression != 1 or page.predictor != 1:
+        return False
+    offsets, counts = page.dataoffsets, page.databytecounts
+    return all(offsets[i] + counts[i] == offsets[i + 1] for i in range(len(offsets) - 1))
+
+
+def read_region(tif, page, x0, y0, width, height, source=None):
+    """페이지의 (x0, y0, width, height) 영역 읽기 - 이미지 밖은 0으로 채움
+
+    source가 있으면 (mmap_pool.MappedFile) 파일 핸들 대신 매핑에서 세그먼트를 읽는다
+    (여러 스레드가 같은 TiffFile을 공유해도 seek 충돌이 없음)
+    """
+    out = np.zeros((height, width), dtype=np.uint8)
+    img_h, img_w = page.imagelength, page.imagewidth
+
+    # 이미지와 겹치는 영역
+    sx0, sy0 = max(0, x0), max(0, y0)
+    sx1, sy1 = min(img_w, x0 + width), min(img_h, y0 + height)
+    if sx0 >= sx1 or sy0 >= sy1:
+        return out
+
+    if _is_plain_contiguous(page):
+        dtype = np.dtype(page.dtype).newbyteorder(tif.byteorder)
+        shape = (img_h, img_w, page.samplesperpixel)
+        if source is not None:
+            data = np.frombuffer(source.mmap, dtype=dtype, count=int(np.prod(shape)),
+                                 offset=page.dataoffsets[0]).reshape(shape)
+        else:
+            data = np.memmap(tif.filehandle.path, dtype=dtype, mode='r',
+                             offset=page.dataoffsets[0], shape=shape)
+        region = data[sy0:sy1, sx0:sx1, 0]
+        out[sy0 - y0:sy1 - y0, sx0 - x0:sx1 - x0] = _to_uint8(np.asarray(region))
+        return out
+
+    if page.is_tiled:
+        seg_w, seg_h = page.tilewidth, page.tilelength
+    else:
+        seg_w, seg_h = img_w, page.rowsperstrip or img_h
+    across = -(-img_w // seg_w)
+
+    fh = tif.filehandle
+    for row in range(sy0 // seg_h, (sy1 - 1) // seg_h + 1):
+        for col in range(sx0 // seg_w, (sx1 - 1) // seg_w + 1):
+            index = row * across + col
+            offset, count = page.dataoffsets[index], page.databytecounts[index]
+            if source is not None:
+                raw = source.mmap[offset:offset + count]
+            else:
+                fh.seek(offset)
+                raw = fh.read(count)
+            segment, _, _ = page.decode(raw, index, jpegtables=page.jpegtables)
+            if segment is None:
+                continue
+            # segment shape: (depth, length, width, samples)
+            segment = segment[0, :, :, 0]
+
+            top, left = row * seg_h, col * seg_w
+            ty0, ty1 = max(sy0, top), min(sy1, top + segment.shape[0])
+            tx0, tx1 = max(sx0, left), min(sx1, left + segment.shape[1])
+            if ty0 >= ty1 or tx0 >= tx1:
+                continue
+            out[ty0 - y0:ty1 - y0, tx0 - x0:tx1 - x0] = _to_uint8(
+                segment[ty0 - top:ty1 - top, tx0 - left:tx1 - left]
+            )
+    return out
+
+
+def resize_patch(patch, out_size):
+    """패치를 (width, height)로 영역 평균 리사이즈"""
+    if out_size is None or (patch.shape[1], patch.shape[0]) == tuple(out_size):
+        return patch
+    return np.asarray(Image.fromarray(patch).resize(tuple(out_size), Image.BOX))
+
+
+def extract_layer(path, page_index, metadata, coords, out_size=None, enhance=None):
+    """레이어(페이지) 하나에서 모든 칩 영역을 잘라서 (n, h, w) 배열로 반환
+
+    enhance가 있으면 enhance_to_target 인자 dict로 보고 패치 스택을 정규화한다
+    """
+    with TiffFile(path) as tif:
+        page = tif.pages[page_index]
+        boxes = grid_boxes(metadata, coords, page.imagewidth, page.imagelength)
+        patches = [resize_patch(read_region(tif, page, *box), out_size) for box in boxes]
+    patches = np.stack(patches)
+    if enhance is not None:
+        enhance_to_target(patches, out=patches, **enhance)
+    return patches
+
+
+def get_page_count(path):
+    with TiffFile(path) as tif:
+        return len(tif.pages)
+
+
+def resolve_layers(path, layers=None):
+    """1부터 시작하는 레이어 번호 목록 검증 (None이면 전체) - 범위 밖이면 ValueError
+
+    layer - 1을 페이지 인덱스로 쓰므로 0이나 음수를 그대로 두면 뒤쪽 페이지를 읽는다
+    """
+    count = get_page_count(path)
+    if layers is None:
+        return list(range(1, count + 1))
+    if not isinstance(layers, list):
+        raise ValueError("layers must be a list of layer numbers")
+    for layer in layers:
+        if isinstance(layer, bool) or not isinstance(layer, int) or not 1 <= layer <= count:
+            raise ValueError(f"layer {layer!r} is out of range 1..{count}")
+    return layers
+
+
+def extract_patches(path, metadata, coords, layers=None, out_size=None, executor=None,
+                    chunk_size=64, enhance=None):
+    """모든 칩 x 레이어 패치 추출
+
+    layers는 1부터 시작하는 레이어 번호 목록 (None이면 전체).
+    enhance는 enhance_to_target 인자 dict (None이면 정규화하지 않음).
+    작업은 (레이어, 좌표 묶음) 단위로 나눠서 executor에서 병렬 처리한다.
+    반환값: (uint8 배열 (칩 수, 레이어 수, h, w), 레이어 번호 목록)
+    """
+    layers = resolve_layers(path, layers)
+    if not coords or not layers:
+        return np.zeros((len(coords), len(layers), 0, 0), dtype=np.uint8), layers
+
+    chunks = [coords[i:i + chunk_size] for i in range(0, len(coords), chunk_size)]
+    tasks = [(layer, chunk) for layer in layers for chunk in chunks]
+    if executor is None:
+        results = [extract_layer(path, layer - 1, metadata, chunk, out_size, enhance)
+                   for layer, chunk in tasks]
+    else:
+        futures = [executor.submit(extract_layer, path, layer - 1, metadata, chunk, out_size,
+                                   enhance)
+                   for layer, chunk in tasks]
+        results = [future.result() for future in futures]
+
+    # (레이어, 칩, h, w) -> (칩, 레이어, h, w)
+    per_layer = [np.concatenate(results[i:i + len(chunks)])
+                 for i in range(0, len(results), len(chunks))]
+    return np.ascontiguousarray(np.stack(per_layer).transpose(1, 0, 2, 3)), layers
+
+
+def create_executor(workers=None):
+    """레이어 병렬 처리용 프로세스 풀
+
+    fork로 만들면 워커가 서버의 리슨 소켓/클라이언트 소켓까지 물려받아서, 서버가
+    종료돼도 고아 워커가 포트를 계속 점유한다. 빈 상태에서 시작하는 forkserver
+    (미지원 플랫폼은 spawn)로 워커를 만든다
+    """
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+    return ProcessPoolExecutor(max_workers=workers or os.cpu_count(), mp_context=context)
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description='Extract full-resolution chip patches')
+    parser.add_argument('tiff', help='Source TIFF file')
+    parser.add_argument('metadata', help='metadata.json exported by the web app')
+    parser.add_argument('coordinates', help='coordinates.json exported by the web app')
+    parser.add_argument('--output', '-o', default='patches.npy', help='Output .npy file')
+    parser.add_argument('--workers', '-w', type=int, default=None, help='Worker processes')
+    parser.add_argument('--enhance', action='store_true',
+                        help='Apply target normalization using metadata enhanceSettings')
+    args = parser.parse_args()
+
+    with open(args.metadata, encoding='utf-8') as f:
+        grid_metadata = json.load(f)
+    with open(args.coordinates, encoding='utf-8') as f:
+        coordinate_data = json.load(f)
+    rows = coordinate_data.get('coordinates', coordinate_data) \
+        if isinstance(coordinate_data, dict) else coordinate_data
+
+    with create_executor(args.workers) as pool:
+        settings = enhance_settings(grid_metadata.get('enhanceSettings')) if args.enhance else None
+        stack, layer_numbers = extract_patches(args.tiff, grid_metadata, rows, executor=pool,
+                                               enhance=settings)
+    np.save(args.output, stack)
+    print(f"Saved {stack.shape} patches for layers {layer_numbers} to {args.output}")
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+웨이퍼 TIFF 피라미드(오버뷰) 사이드카 규칙 및 레벨 선택
+build_pyramid.py가 <stem>.ovr<factor>.tif 파일을 원본 옆에 만들고,
+Range 서버는 클라이언트 압축 설정(maxSize)에 맞는 레벨을 골라서 서빙한다
+"""
+import glob
+import os
+import re
+import threading
+from collections import OrderedDict
+
+OVERVIEW_PATTERN = re.compile(r'\.ovr(\d+)\.tiff?$', re.IGNORECASE)
+
+
+def overview_path(path, factor):
+    """원본 TIFF 경로에 대한 오버뷰 사이드카 경로"""
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.ovr{factor}{ext or '.tif'}"
+
+
+def is_overview_path(path):
+    return OVERVIEW_PATTERN.search(path) is not None
+
+
+def find_overviews(path, index_cache):
+    """원본보다 최신인 오버뷰 사이드카 목록 [(factor, path, width, height)] (factor 오름차순)"""
+    if is_overview_path(path):
+        return []
+
+    stem, ext = os.path.splitext(path)
+    source_mtime = os.stat(path).st_mtime
+    levels = []
+    for candidate in glob.glob(glob.escape(stem) + '.ovr*' + ext):
+        match = OVERVIEW_PATTERN.search(candidate)
+        if not match:
+            continue
+        try:
+            # 원본이 다시 생성된 뒤의 오래된 사이드카는 무시
+            if os.stat(candidate).st_mtime < source_mtime:
+                continue
+            first_page = index_cache.get(candidate, include_offsets=False)['pages'][0]
+        except (OSError, ValueError, IndexError):
+            continue
+        levels.append((int(match.group(1)), candidate,
+                       first_page['width'], first_page['height']))
+    levels.sort()
+    return levels
+
+
+class OverviewCache:
+    """원본 경로별 오버뷰 목록 캐시 (요청마다 glob/사이드카 stat 하지 않도록)
+
+    원본의 (mtime_ns, size)와 디렉터리 mtime_ns가 그대로면 재사용한다.
+    build_pyramid는 사이드카를 임시 파일에 쓴 뒤 os.replace로 바꾸므로, 사이드카를
+    새로 만들거나 다시 만들면 디렉터리 mtime이 바뀌어 자동으로 다시 찾는다
+    """
+
+    def __init__(self, index_cache, max_entries=256):
+        self.index_cache = index_cache
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        """find_overviews와 같은 목록 (캐시된 리스트이므로 수정하지 말 것)"""
+        if is_overview_path(path):
+            return []
+
+        key = os.path.abspath(path)
+        try:
+            stat = os.stat(key)
+            dir_stat = os.stat(os.path.dirname(key))
+        except OSError:
+            # 없는 원본은 오버뷰 없음 - 404는 호출한 쪽에서 처리
+            return []
+        fingerprint = (stat.st_mtime_ns, stat.st_size, dir_stat.st_mtime_ns)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == fingerprint:
+                self._entries.move_to_end(key)
+                return entry[1]
+
+        levels = find_overviews(path, self.index_cache)
+
+        with self._lock:
+            self._entries[key] = (fingerprint, levels)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return levels
+
+    def invalidate(self, path=None):
+        """원본 하나(또는 전체)의 캐시 삭제 - 같은 프로세스에서 사이드카를 다시 만든 경우"""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(os.path.abspath(path), None)
+
+
+def select_source(path, max_size, overview_cache):
+    """maxSize 이상을 유지하는 가장 작은 레벨 선택 - (경로, factor) 반환"""
+    if not max_size or max_size <= 0:
+        return path, 1
+
+    best = (path, 1)
+    for factor, candidate, width, height in overview_cache.get(path):
+        if max(width, height) >= max_size:
+            best = (candidate, factor)
+        else:
+            break
+    return best
@@ -7,57 +7,372 @@ import socketserver
 import os
 import sys
 import re
-from urllib.parse import unquote
+import json
+import signal
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from urllib.parse import unquote, parse_qs, quote
+
+from tiff_index import TiffIndexCache, TiffIndexError
+from pyramid import OverviewCache, select_source
+from mmap_pool import MmapPool, DEFAULT_MAX_FILES, DEFAULT_STAT_TTL
+import compress_cache
+from request_stats import RequestStats, PageLocator, AccessLog, CountingWriter, DEFAULT_WINDOW
+from server_logging import (logger, access_logger, setup_logging, LOG_LEVELS,
+                            DEFAULT_LOG_LEVEL, DEFAULT_LOG_SAMPLE)
+
+try:
+    import patch_extractor
+    import batch_extract
+    import tile_cache
+    from patch_extractor import enhance_settings
+except ImportError:  # numpy/tifffile/Pillow가 없으면 패치 추출/내보내기/타일 API만 비활성화
+    patch_extractor = None
+    tile_cache = None
+
+DEFAULT_WORKERS = 16
+DEFAULT_KEEP_ALIVE_TIMEOUT = 15
+# 이보다 작은 Range는 sendfile 시스템 호출 대신 mmap 슬라이스로 바로 전송
+SENDFILE_MIN_BYTES = 64 * 1024
+# --legacy-copy 비교 기준: 요청마다 파일을 열어 읽고 쓰는 예전 청크 크기
+COPY_CHUNK_SIZE = 8192
+# 다중 Range에서 이 간격(바이트) 이하로 떨어진 구간은 하나로 합쳐서 전송
+DEFAULT_RANGE_GAP = 8 * 1024
+MULTIPART_BOUNDARY = "RANGE_BOUNDARY"
+# 파일 응답 Cache-Control max-age (0이면 매번 ETag/Last-Modified로 재검증)
+DEFAULT_CACHE_MAX_AGE = 0
+# TIFF 인덱스 JSON 엔드포인트 (/meta/<file>.json)
+META_PREFIX = '/meta/'
+
+# 전체 해상도 패치 추출 API (POST /patches/<file>)
+PATCHES_PREFIX = '/patches/'
+MAX_JSON_BODY = 32 * 1024 * 1024
+
+# 스트리밍 ZIP 내보내기 API (POST /export/<file>)
+EXPORT_PREFIX = '/export/'
+# chunked 응답에서 작은 zip 헤더 쓰기를 모아 보내는 크기
+EXPORT_CHUNK_SIZE = 256 * 1024
+
+# 디코딩된 타일 API (GET /tile/<file>/<page>/<level>/<tx>/<ty>, 통계는 /tile-stats)
+TILE_PREFIX = '/tile/'
+TILE_STATS_PATH = '/tile-stats'
+DEFAULT_TILE_CACHE_MB = 512
+# 요청 지연/처리량/파일별 통계 JSON
+STATS_PATH = '/stats'
+
+TIFF_INDEX_CACHE = TiffIndexCache()
+# 원본별 피라미드 오버뷰 목록 (원본/디렉터리 stat이 같으면 재사용)
+OVERVIEW_CACHE = OverviewCache(TIFF_INDEX_CACHE)
+# 파일별 mmap 풀 (run_server에서 크기/stat TTL 설정)
+MMAP_POOL = MmapPool()
+# 텍스트 파일 gzip/brotli 압축 결과 캐시 (파일 버전별)
+COMPRESSED_CACHE = compress_cache.CompressedCache()
+DEFAULT_COMPRESS_CACHE_MB = 64
+# 요청 계측 (run_server에서 창 크기/접근 로그 설정)
+REQUEST_STATS = RequestStats()
+PAGE_LOCATOR = PageLocator(TIFF_INDEX_CACHE)
+ACCESS_LOG = None
+
+_patch_executor = None
+_patch_executor_lock = threading.Lock()
+PATCH_WORKERS = None
+
+# 디코딩된 타일 LRU와 열린 TiffFile (create_server에서 바이트 예산 설정)
+TILE_CACHE = tile_cache.TileCache() if tile_cache else None
+TILE_PAGES = tile_cache.TiffPages() if tile_cache else None
+
+
+def raise_keyboard_interrupt(signum, frame):
+    """SIGTERM 핸들러 - serve_forever를 KeyboardInterrupt로 빠져나오게 함"""
+    raise KeyboardInterrupt
+
+
+def get_patch_executor():
+    """패치 추출용 프로세스 풀 (첫 요청 때 생성해서 재사용)"""
+    global _patch_executor
+    with _patch_executor_lock:
+        if _patch_executor is None:
+            _patch_executor = patch_extractor.create_executor(PATCH_WORKERS)
+        return _patch_executor
+
+
+def coalesce_ranges(ranges, gap=DEFAULT_RANGE_GAP):
+    """겹치거나 gap 바이트 이내로 인접한 (start, end) 구간을 합쳐서 오프셋 순으로 반환"""
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1 + gap:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+
+def request_file(url_path):
+    """요청 경로에서 대상 파일 경로 (API 접두사/타일 좌표/.json 제거)"""
+    path = unquote(url_path)
+    if path.startswith(TILE_PREFIX):
+        return '/' + path[len(TILE_PREFIX):].rsplit('/', 4)[0]
+    if path.startswith(META_PREFIX):
+        path = path[len(META_PREFIX):]
+        return '/' + (path[:-len('.json')] if path.endswith('.json') else path)
+    for prefix in (PATCHES_PREFIX, EXPORT_PREFIX):
+        if path.startswith(prefix):
+            return '/' + path[len(prefix):]
+    if path in (STATS_PATH, TILE_STATS_PATH):
+        return None
+    return path
+
+
+def request_kind(url_path, range_count, status):
+    """통계 분류 (API 종류, 파일 요청은 range/multipart/full/not_modified)"""
+    for prefix, kind in ((TILE_PREFIX, 'tile'), (META_PREFIX, 'meta'),
+                         (PATCHES_PREFIX, 'patches'), (EXPORT_PREFIX, 'export')):
+        if url_path.startswith(prefix):
+            return kind
+    if url_path in (STATS_PATH, TILE_STATS_PATH):
+        return 'stats'
+    if status == 304:
+        return 'not_modified'
+    if range_count:
+        return 'multipart' if range_count > 1 else 'range'
+    return 'full'
+
+
+class StreamWriter:
+    """길이를 모르는 응답 본문 writer (작은 쓰기는 모아서 한 번에 전송)
+
+    HTTP/1.0 응답용 - 본문 끝은 연결 종료로 알린다
+    """
+
+    def __init__(self, wfile, buffer_size=EXPORT_CHUNK_SIZE):
+        self.wfile = wfile
+        self.buffer_size = buffer_size
+        self.buffer = bytearray()
+
+    def write(self, data):
+        self.buffer += data
+        if len(self.buffer) >= self.buffer_size:
+            self._send_chunk()
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def _send_chunk(self):
+        if self.buffer:
+            self.wfile.write(self.buffer)
+            self.buffer = bytearray()
+
+    def close(self):
+        """남은 데이터 전송"""
+        self._send_chunk()
+        self.wfile.flush()
+
+
+class ChunkedWriter(StreamWriter):
+    """Transfer-Encoding: chunked 응답 본문 writer (HTTP/1.1)"""
+
+    def _send_chunk(self):
+        if self.buffer:
+            self.wfile.write(b'%x\r\n' % len(self.buffer) + self.buffer + b'\r\n')
+            self.buffer = bytearray()
+
+    def close(self):
+        """남은 데이터와 마지막 0 크기 청크 전송"""
+        self._send_chunk()
+        self.wfile.write(b'0\r\n\r\n')
+        self.wfile.flush()
+
 
 class CustomRangeHTTPRequestHandler(http.server.BaseHTTPRequestHandler):
     """완전한 Range 요청을 지원하는 HTTP 핸들러"""
-    
+
+    # 헤더와 본문을 따로 쓰므로 Nagle + delayed ACK로 응답마다 ~40ms 지연되지 않게 TCP_NODELAY
+    disable_nagle_algorithm = True
+    # HTTP/1.1 keep-alive (run_server에서 모드에 따라 설정)
+    protocol_version = "HTTP/1.1"
+    # 유휴 keep-alive 연결이 워커를 계속 점유하지 않도록 소켓 타임아웃
+    timeout = DEFAULT_KEEP_ALIVE_TIMEOUT
+    # 커널 sendfile 제로카피 전송 사용 여부 (미지원 플랫폼에서는 청크 복사로 대체)
+    use_sendfile = hasattr(os, 'sendfile')
+    # mmap 대신 예전 8 KB 읽기/복사 루프로 전송 (벤치마크 비교용)
+    legacy_copy = False
+    # 다중 Range 병합 간격 (0이면 겹치거나 맞닿은 구간만 병합)
+    range_gap = DEFAULT_RANGE_GAP
+    cache_max_age = DEFAULT_CACHE_MAX_AGE
+    # 텍스트 응답 압축 사용 여부 / 현재 응답의 Content-Encoding
+    compression = True
+    content_encoding = None
+    # 요청 계측 값 (parse_request에서 요청마다 초기화)
+    request_started = None
+    response_status = None
+    request_ranges = 0
+    request_pages = None
+    # 현재 응답에 사용 중인 피라미드 레벨 배율 (1 = 원본)
+    pyramid_factor = 1
+
+    def setup(self):
+        super().setup()
+        self.wfile = CountingWriter(self.wfile)
+
+    def parse_request(self):
+        """요청 줄을 읽은 직후 계측 시작 (keep-alive 대기 시간은 지연에서 제외)"""
+        self.request_started = time.perf_counter()
+        self.request_bytes_start = self.wfile.count
+        self.response_status = None
+        self.request_ranges = 0
+        self.request_pages = None
+        self.pyramid_factor = 1
+        return super().parse_request()
+
+    def handle_one_request(self):
+        self.request_started = None
+        try:
+            super().handle_one_request()
+        finally:
+            # 요청 줄 없이 끝난 keep-alive 연결 종료는 기록하지 않음
+            if self.request_started is not None and self.response_status is not None:
+                self.record_request()
+
+    def send_response(self, code, message=None):
+        self.response_status = code
+        super().send_response(code, message)
+
+    def log_request(self, code='-', size='-'):
+        """접근 로그 (성공 요청은 샘플링, 4xx/5xx는 항상 WARNING)"""
+        code = getattr(code, 'value', code)
+        level = logging.WARNING if isinstance(code, int) and code >= 400 else logging.INFO
+        access_logger.log(level, '%s "%s" %s %s', self.address_string(), self.requestline,
+                          code, size)
+
+    def log_error(self, format, *args):
+        # send_error 사유와 keep-alive 타임아웃 - 상태 코드는 log_request에 남음
+        logger.debug(format, *args)
+
+    def log_message(self, format, *args):
+        logger.info(format, *args)
+
+    def record_request(self):
+        """요청 하나를 통계와 접근 로그에 기록"""
+        url_path = getattr(self, 'path', '').partition('?')[0]
+        entry = {
+            'ts': round(time.time(), 3),
+            'method': self.command,
+            'path': url_path,
+            'file': request_file(url_path),
+            'kind': request_kind(url_path, self.request_ranges, self.response_status),
+            'status': self.response_status,
+            'bytes': self.wfile.count - self.request_bytes_start,
+            'ms': round((time.perf_counter() - self.request_started) * 1000, 3),
+            'ranges': self.request_ranges,
+        }
+        if self.request_pages:
+            entry['pages'] = self.request_pages
+        if self.pyramid_factor > 1:
+            entry['pyramidFactor'] = self.pyramid_factor
+        REQUEST_STATS.record(entry)
+        if ACCESS_LOG is not None:
+            ACCESS_LOG.write(entry)
+
     def do_GET(self):
         """GET 요청 처리 (Range 지원 포함)"""
-        path = self.translate_path(self.path)
-        
-        if not os.path.exists(path):
-            self.send_error(404, "File not found")
+        if self.path.startswith(META_PREFIX):
+            self.handle_meta_request()
             return
-        
-        if os.path.isdir(path):
-            self.send_directory_listing(path)
+        if self.path.startswith(TILE_PREFIX):
+            self.handle_tile_request()
             return
-        
+        if self.path.partition('?')[0] == TILE_STATS_PATH:
+            self.handle_tile_stats_request()
+            return
+        if self.path.partition('?')[0] == STATS_PATH:
+            self.handle_stats_request()
+            return
+
+        path = self.resolve_pyramid_source(self.translate_path(self.path))
+
         try:
-            with open(path, 'rb') as f:
-                file_size = os.path.getsize(path)
-                range_header = self.headers.get('Range')
-                
-                if range_header:
-                    # Range 요청 처리
-                    print(f"Range request: {range_header} for {self.path} (file_size: {file_size})")
-                    self.handle_range_request(f, file_size, range_header)
-                else:
-                    # 일반 요청 처리
-                    print(f"Normal request for {self.path}")
-                    self.handle_normal_request(f, file_size)
-                    
-        except IOError:
-            self.send_error(404, "File not found")
+            mapped = MMAP_POOL.acquire(path)
+        except OSError:
+            if os.path.isdir(path):
+                self.send_directory_listing(path)
+            else:
+                self.send_error(404, "File not found")
+            return
+
+        try:
+            range_header = self.headers.get('Range')
+            # Range 응답은 압축하지 않음 (바이트 오프셋이 원본 기준)
+            self.content_encoding = None if range_header else self.negotiate_encoding(mapped)
+            etag = self.representation_etag(mapped)
+            if self.is_not_modified(mapped, etag):
+                self.send_not_modified(mapped, etag)
+                return
+
+            if range_header and not self.if_range_matches(mapped):
+                # If-Range 검증자가 다르면 (파일이 바뀜) Range를 무시하고 전체 전송
+                range_header = None
+            if range_header:
+                # Range 요청 처리
+                logger.debug("Range request: %s for %s (file_size: %d)",
+                             range_header, self.path, mapped.size)
+                self.handle_range_request(mapped, range_header)
+            elif self.content_encoding:
+                logger.debug("Compressed (%s) request for %s", self.content_encoding, self.path)
+                self.handle_compressed_request(mapped, etag)
+            else:
+                # 일반 요청 처리
+                logger.debug("Normal request for %s", self.path)
+                self.handle_normal_request(mapped)
+        finally:
+            MMAP_POOL.release(mapped)
     
     def do_HEAD(self):
         """HEAD 요청 처리"""
         path = self.translate_path(self.path)
         
-        if not os.path.exists(path):
-            self.send_error(404, "File not found")
-            return
-        
         if os.path.isdir(path):
             self.send_response(200)
             self.send_header('Content-Type', 'text/html')
+            self.send_header('Content-Length', '0')
             self.add_cors_headers()
             self.end_headers()
             return
-        
-        file_size = os.path.getsize(path)
+
+        path = self.resolve_pyramid_source(path)
+        try:
+            # 풀에 있으면 stat 없이 크기/검증자 확인
+            with MMAP_POOL.open(path) as mapped:
+                self.send_head_response(path, mapped)
+        except OSError:
+            self.send_error(404, "File not found")
+
+    def send_head_response(self, path, mapped):
+        """HEAD 응답 헤더 (GET과 같은 조건부/Range/압축 처리, 본문 없음)"""
+        file_size = mapped.size
         range_header = self.headers.get('Range')
+        self.content_encoding = None if range_header else self.negotiate_encoding(mapped)
+        etag = self.representation_etag(mapped)
+        if self.is_not_modified(mapped, etag):
+            self.send_not_modified(mapped, etag)
+            return
+
+        if self.content_encoding:
+            body = COMPRESSED_CACHE.get(mapped, self.content_encoding)
+            self.send_response(200)
+            self.send_header('Content-Type', self.guess_type(path))
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('Content-Encoding', self.content_encoding)
+            self.add_validator_headers(mapped, etag)
+            self.add_cors_headers()
+            self.end_headers()
+            return
+
+        if range_header and not self.if_range_matches(mapped):
+            range_header = None
         
         if range_header:
             # Range HEAD 요청
@@ -71,6 +386,8 @@ class CustomRangeHTTPRequestHandler(http.server.BaseHTTPRequestHandler):
                 self.send_header('Content-Length', str(content_length))
                 self.send_header('Content-Range', f'bytes {start}-{end}/{file_size}')
                 self.send_header('Accept-Ranges', 'bytes')
+                self.add_validator_headers(mapped)
+                self.add_pyramid_header()
                 self.add_cors_headers()
                 self.end_headers()
             else:
@@ -81,24 +398,45 @@ class CustomRangeHTTPRequestHandler(http.server.BaseHTTPRequestHandler):
             self.send_header('Content-Type', self.guess_type(path))
             self.send_header('Content-Length', str(file_size))
             self.send_header('Accept-Ranges', 'bytes')
+            self.add_validator_headers(mapped)
+            self.add_pyramid_header()
             self.add_cors_headers()
             self.end_headers()
     
+    def do_POST(self):
+        """POST 요청 처리 (패치 추출 API)"""
+        if self.path.startswith(PATCHES_PREFIX):
+            self.handle_patches_request()
+            return
+        if self.path.startswith(EXPORT_PREFIX):
+            self.handle_export_request()
+            return
+        self.send_error(404, "Not found")
+
     def do_OPTIONS(self):
         """OPTIONS 요청 처리 (CORS)"""
         self.send_response(200)
         self.add_cors_headers()
         self.send_header('Access-Control-Max-Age', '86400')
+        self.send_header('Content-Length', '0')
         self.end_headers()
     
-    def handle_range_request(self, file_obj, file_size, range_header):
+    def handle_range_request(self, mapped, range_header):
         """Range 요청 처리"""
+        file_size = mapped.size
         ranges = self.parse_range_header(range_header, file_size)
         
         if not ranges:
             self.send_error(416, "Range Not Satisfiable")
             return
         
+        self.request_ranges = len(ranges)
+        if self.guess_type(self.path) == 'image/tiff':
+            self.request_pages = PAGE_LOCATOR.pages(mapped, ranges)
+
+        # 겹치거나 가까운 구간은 합쳐서 구간마다 한 번씩만 읽음
+        ranges = coalesce_ranges(ranges, self.range_gap)
+
         if len(ranges) == 1:
             # 단일 Range 처리
             start, end = ranges[0]
@@ -109,68 +447,495 @@ class CustomRangeHTTPRequestHandler(http.server.BaseHTTPRequestHandler):
             self.send_header('Content-Length', str(content_length))
             self.send_header('Content-Range', f'bytes {start}-{end}/{file_size}')
             self.send_header('Accept-Ranges', 'bytes')
+            self.add_validator_headers(mapped)
+            self.add_pyramid_header()
             self.add_cors_headers()
             self.end_headers()
             
             # 파일 데이터 전송
-            file_obj.seek(start)
-            remaining = content_length
-            while remaining > 0:
-                chunk_size = min(8192, remaining)
-                chunk = file_obj.read(chunk_size)
-                if not chunk:
-                    break
-                self.wfile.write(chunk)
-                remaining -= len(chunk)
+            self.send_file_range(mapped, start, content_length)
         else:
-            # 다중 Range 처리 (multipart)
-            boundary = "RANGE_BOUNDARY"
-            content_type = f'multipart/byteranges; boundary={boundary}'
-            
+            # 다중 Range 처리 (multipart) - 파트 헤더를 미리 만들어 Content-Length 계산
+            part_type = self.guess_type(self.path)
+            parts = [
+                (f'\r\n--{MULTIPART_BOUNDARY}\r\n'
+                 f'Content-Type: {part_type}\r\n'
+                 f'Content-Range: bytes {start}-{end}/{file_size}\r\n\r\n'.encode(),
+                 start, end - start + 1)
+                for start, end in ranges
+            ]
+            closing = f'\r\n--{MULTIPART_BOUNDARY}--\r\n'.encode()
+            content_length = sum(len(header) + length for header, _, length in parts) + len(closing)
+
             self.send_response(206, "Partial Content")
-            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Type', f'multipart/byteranges; boundary={MULTIPART_BOUNDARY}')
+            self.send_header('Content-Length', str(content_length))
+            self.send_header('Accept-Ranges', 'bytes')
+            self.add_validator_headers(mapped)
+            self.add_pyramid_header()
             self.add_cors_headers()
             self.end_headers()
             
-            for start, end in ranges:
-                content_length = end - start + 1
-                
-                # 경계 및 헤더 전송
-                boundary_data = f'\r\n--{boundary}\r\n'
-                boundary_data += f'Content-Type: {self.guess_type(self.path)}\r\n'
-                boundary_data += f'Content-Range: bytes {start}-{end}/{file_size}\r\n\r\n'
-                self.wfile.write(boundary_data.encode())
-                
-                # 파일 데이터 전송
-                file_obj.seek(start)
-                remaining = content_length
-                while remaining > 0:
-                    chunk_size = min(8192, remaining)
-                    chunk = file_obj.read(chunk_size)
-                    if not chunk:
-                        break
-                    self.wfile.write(chunk)
-                    remaining -= len(chunk)
+            for header, start, length in parts:
+                if self.legacy_copy or (self.use_sendfile and length >= SENDFILE_MIN_BYTES):
+                    self.wfile.write(header)
+                    self.send_file_range(mapped, start, length)
+                else:
+                    # 작은 파트는 헤더와 데이터를 한 번의 쓰기로 전송
+                    with mapped.slice(start, start + length) as view:
+                        self.wfile.write(header + view)
             
             # 마지막 경계
-            self.wfile.write(f'\r\n--{boundary}--\r\n'.encode())
+            self.wfile.write(closing)
     
-    def handle_normal_request(self, file_obj, file_size):
+    def handle_normal_request(self, mapped):
         """일반 요청 처리"""
         self.send_response(200)
         self.send_header('Content-Type', self.guess_type(self.path))
-        self.send_header('Content-Length', str(file_size))
+        self.send_header('Content-Length', str(mapped.size))
         self.send_header('Accept-Ranges', 'bytes')
+        self.add_validator_headers(mapped)
+        self.add_pyramid_header()
         self.add_cors_headers()
         self.end_headers()
         
         # 파일 데이터 전송
-        while True:
-            chunk = file_obj.read(8192)
-            if not chunk:
-                break
-            self.wfile.write(chunk)
-    
+        self.send_file_range(mapped, 0, mapped.size)
+
+    def add_validator_headers(self, mapped, etag=None):
+        """ETag/Last-Modified/Cache-Control 헤더 (etag를 주면 파일 ETag 대신 사용)"""
+        self.send_header('ETag', etag or mapped.etag)
+        self.send_header('Last-Modified', mapped.last_modified)
+        self.send_header('Cache-Control', self.cache_control())
+        if self.compression and self.guess_type(self.path) in compress_cache.COMPRESSIBLE_TYPES:
+            self.send_header('Vary', 'Accept-Encoding')
+
+    def cache_control(self):
+        """max-age가 0이면 no-cache (캐시에 두되 매번 재검증)"""
+        if self.cache_max_age > 0:
+            return f'public, max-age={self.cache_max_age}'
+        return 'no-cache'
+
+    def is_not_modified(self, mapped, etag=None):
+        """If-None-Match (우선) 또는 If-Modified-Since 기준으로 304 응답 가능 여부"""
+        etag = etag or mapped.etag
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match is not None:
+            # 약한 비교: W/ 접두사 무시
+            tags = [tag.strip() for tag in if_none_match.split(',')]
+            tags = [tag[2:] if tag.startswith('W/') else tag for tag in tags]
+            return '*' in tags or etag in tags
+
+        if_modified_since = self.headers.get('If-Modified-Since')
+        if if_modified_since is None:
+            return False
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError, IndexError, OverflowError):
+            return False
+        # Last-Modified는 초 단위이므로 같은 초 안의 변경은 같은 것으로 봄
+        return int(mapped.mtime) <= since
+
+    def if_range_matches(self, mapped, etag=None):
+        """If-Range가 없거나 현재 파일과 일치하면 True (강한 비교)"""
+        if_range = self.headers.get('If-Range')
+        if if_range is None:
+            return True
+        if_range = if_range.strip()
+        if if_range.startswith(('"', 'W/')):
+            return if_range == (etag or mapped.etag)
+        return if_range == mapped.last_modified
+
+    def send_not_modified(self, mapped, etag=None):
+        """304 Not Modified (본문 없음)"""
+        self.send_response(304)
+        self.add_validator_headers(mapped, etag)
+        self.add_pyramid_header()
+        self.add_cors_headers()
+        self.end_headers()
+
+    def handle_compressed_request(self, mapped, etag):
+        """압축된 전체 파일 응답 (압축 결과는 파일 버전별로 캐시)"""
+        body = COMPRESSED_CACHE.get(mapped, self.content_encoding)
+        self.send_response(200)
+        self.send_header('Content-Type', self.guess_type(self.path))
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Content-Encoding', self.content_encoding)
+        self.send_header('Accept-Ranges', 'bytes')
+        self.add_validator_headers(mapped, etag)
+        self.add_cors_headers()
+        self.end_headers()
+        self.wfile.write(body)
+
+    def negotiate_encoding(self, mapped):
+        """텍스트 타입이고 충분히 크면 Accept-Encoding에 맞는 인코딩 (TIFF 등은 None)"""
+        if (not self.compression or mapped.size < compress_cache.MIN_COMPRESS_BYTES
+                or self.guess_type(self.path) not in compress_cache.COMPRESSIBLE_TYPES):
+            return None
+        return compress_cache.choose_encoding(self.headers.get('Accept-Encoding'))
+
+    def representation_etag(self, mapped):
+        """압축 응답은 인코딩별로 다른 ETag (같은 ETag면 다른 바이트를 같은 것으로 오인)"""
+        if self.content_encoding:
+            return f'{mapped.etag[:-1]}-{self.content_encoding}"'
+        return mapped.etag
+
+    def send_file_range(self, mapped, start, length):
+        """파일 구간 전송 - 큰 구간은 sendfile 제로카피, 작은 구간과 fallback은 mmap 슬라이스"""
+        if length <= 0:
+            return
+        if self.use_sendfile and length >= SENDFILE_MIN_BYTES:
+            try:
+                # socket.sendfile은 os.sendfile을 사용하며 소켓 타임아웃도 처리
+                # (풀의 파일 객체를 공유하지만 오프셋을 직접 지정하므로 seek 위치와 무관)
+                self.wfile.add(self.connection.sendfile(mapped.file, start, length))
+                return
+            except (AttributeError, NotImplementedError, ValueError):
+                # 일반 파일/소켓이 아닌 경우 (예: 래핑된 소켓)
+                pass
+        self.write_mapped(mapped, start, length)
+
+    def write_mapped(self, mapped, start, length):
+        """mmap 구간을 memoryview로 복사 없이 전송"""
+        if self.legacy_copy:
+            self.copy_file_chunks(mapped.path, start, length)
+            return
+        with mapped.slice(start, start + length) as view:
+            self.wfile.write(view)
+
+    def copy_file_chunks(self, path, start, length):
+        """파일을 열어 청크 단위로 읽어서 전송 (--legacy-copy, 예전 fallback 경로)"""
+        with open(path, 'rb') as file_obj:
+            file_obj.seek(start)
+            remaining = length
+            while remaining > 0:
+                chunk = file_obj.read(min(COPY_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                self.wfile.write(chunk)
+                remaining -= len(chunk)
+
+    def handle_meta_request(self):
+        """TIFF IFD/타일 인덱스를 JSON으로 응답 (/meta/<file>.json?offsets=0)"""
+        url_path, _, query = self.path.partition('?')
+        relative = url_path[len(META_PREFIX):]
+        if not relative.endswith('.json'):
+            self.send_error(404, "File not found")
+            return
+
+        path = self.translate_path('/' + relative[:-len('.json')])
+        if not os.path.isfile(path):
+            self.send_error(404, "File not found")
+            return
+
+        params = parse_qs(query)
+        include_offsets = params.get('offsets', ['1'])[0] not in ('0', 'false')
+        source = self.resolve_pyramid_source(path)
+        try:
+            # 캐시 객체를 변경하지 않도록 얕은 복사 후 피라미드 정보 추가
+            index = dict(TIFF_INDEX_CACHE.get(source, include_offsets))
+        except TiffIndexError as e:
+            self.send_error(415, f"Unsupported TIFF: {e}")
+            return
+
+        index['pyramidFactor'] = self.pyramid_factor
+        index['overviews'] = [
+            {'factor': factor, 'file': os.path.basename(p), 'width': w, 'height': h}
+            for factor, p, w, h in OVERVIEW_CACHE.get(path)
+        ]
+
+        logger.debug("Meta request for %s (%d pages)", relative, index['pageCount'])
+        self.send_json(index)
+
+    def handle_tile_request(self):
+        """디코딩된 타일을 uint8 그레이스케일 바이트로 응답 (/tile/<file>/<page>/<level>/<tx>/<ty>)
+
+        level 0은 원본, level n은 1/2^n 오버뷰 사이드카 (없으면 404)
+        타일 TIFF는 파일의 타일 그리드, 스트립 TIFF는 512 가상 타일 그리드를 쓴다
+        """
+        if tile_cache is None:
+            self.send_error(501, "Tile decoding requires numpy and tifffile")
+            return
+
+        parts = unquote(self.path.partition('?')[0][len(TILE_PREFIX):]).rsplit('/', 4)
+        try:
+            relative = parts[0]
+            page_index, level, tx, ty = (int(value) for value in parts[1:])
+            if min(page_index, level, tx, ty) < 0:
+                raise ValueError
+        except ValueError:
+            self.send_error(400, "Expected /tile/<file>/<page>/<level>/<tx>/<ty>")
+            return
+
+        path = self.translate_path('/' + relative)
+        if level > 0 and os.path.isfile(path):
+            factor = 2 ** level
+            path = next((p for f, p, _, _ in OVERVIEW_CACHE.get(path)
+                         if f == factor), None)
+            if path is None:
+                self.send_error(404, f"No overview for level {level} (1/{factor})")
+                return
+
+        try:
+            mapped = MMAP_POOL.acquire(path)
+        except OSError:
+            self.send_error(404, "File not found")
+            return
+
+        try:
+            # 타일 ETag = 파일 ETag + 페이지/타일 위치 (캐시에 없어도 디코딩 없이 304 가능)
+            etag = f'{mapped.etag[:-1]}-{page_index}-{tx}-{ty}"'
+            if self.is_not_modified(mapped, etag):
+                self.send_not_modified(mapped, etag)
+                return
+
+            key = (mapped.path, mapped.fingerprint, page_index, tx, ty)
+            tile = TILE_CACHE.get(key)
+            cache_status = 'hit'
+            if tile is None:
+                cache_status = 'miss'
+                try:
+                    tif, page = TILE_PAGES.get(mapped.path, mapped.fingerprint, page_index)
+                    tile = tile_cache.decode_tile(tif, page, mapped, tx, ty)
+                except IndexError as e:
+                    self.send_error(404, f"Tile not found: {e}")
+                    return
+                except (ValueError, TypeError) as e:
+                    self.send_error(415, f"Unsupported TIFF: {e}")
+                    return
+                TILE_CACHE.put(key, tile)
+            last_modified = mapped.last_modified
+        finally:
+            MMAP_POOL.release(mapped)
+
+        body = memoryview(tile).cast('B')
+        self.request_pages = {page_index: len(body)}
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('X-Tile-Width', str(tile.shape[1]))
+        self.send_header('X-Tile-Height', str(tile.shape[0]))
+        self.send_header('X-Tile-Cache', cache_status)
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', last_modified)
+        self.send_header('Cache-Control', self.cache_control())
+        self.add_cors_headers()
+        self.end_headers()
+        self.wfile.write(body)
+
+    def handle_stats_request(self):
+        """요청 지연 백분위/처리량/파일·페이지별 통계와 캐시 통계 JSON"""
+        stats = REQUEST_STATS.snapshot()
+        stats['caches'] = {'files': MMAP_POOL.stats(), 'compressed': COMPRESSED_CACHE.stats()}
+        if TILE_CACHE is not None:
+            stats['caches']['tiles'] = TILE_CACHE.stats()
+        if ACCESS_LOG is not None:
+            stats['accessLog'] = {'path': ACCESS_LOG.path, 'dropped': ACCESS_LOG.dropped}
+        self.send_json(stats)
+
+    def handle_tile_stats_request(self):
+        """타일 캐시와 mmap 풀 통계 JSON"""
+        if tile_cache is None:
+            self.send_error(501, "Tile decoding requires numpy and tifffile")
+            return
+        self.send_json({'tiles': TILE_CACHE.stats(), 'files': MMAP_POOL.stats(),
+                        'compressed': COMPRESSED_CACHE.stats()})
+
+    def read_json_body(self):
+        """요청 본문을 JSON 객체로 읽기 (실패 시 에러 응답 후 None)
+
+        브라우저 폼 전송(application/x-www-form-urlencoded)이면 payload 필드의 JSON을 읽는다
+        """
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            length = -1
+        if length <= 0 or length > MAX_JSON_BODY:
+            self.send_error(400, "Invalid Content-Length")
+            return None
+        body = self.rfile.read(length)
+        try:
+            if self.headers.get('Content-Type', '').startswith('application/x-www-form-urlencoded'):
+                body = parse_qs(body.decode('utf-8')).get('payload', [''])[0]
+            payload = json.loads(body)
+        except ValueError:
+            self.send_error(400, "Invalid JSON body")
+            return None
+        if not isinstance(payload, dict):
+            self.send_error(400, "JSON body must be an object")
+            return None
+        return payload
+
+    def handle_patches_request(self):
+        """그리드 메타데이터 + 칩 좌표로 모든 레이어의 전체 해상도 패치를 잘라서 응답
+
+        요청 본문: {metadata: getGridMetadata(), coordinates: csvRows,
+                    layers: [1, 2, ...] (선택), outputSize: {width, height} (선택),
+                    enhance: {targetMean, targetStd, padPx, titleHeight} (선택)}
+        응답 본문: uint8 그레이스케일 패치를 [좌표][레이어] 순서로 이어붙인 바이트
+        """
+        if patch_extractor is None:
+            self.send_error(501, "Patch extraction requires numpy, tifffile and Pillow")
+            return
+
+        path = self.translate_path('/' + self.path[len(PATCHES_PREFIX):])
+        if not os.path.isfile(path):
+            self.send_error(404, "File not found")
+            return
+
+        payload = self.read_json_body()
+        if payload is None:
+            return
+
+        metadata = payload.get('metadata') or {}
+        coords = payload.get('coordinates') or []
+
+        try:
+            output_size = payload.get('outputSize')
+            out_size = (int(output_size['width']), int(output_size['height'])) if output_size else None
+            enhance = payload.get('enhance')
+            if enhance is not None:
+                enhance = enhance_settings(enhance)
+            patches, layers = patch_extractor.extract_patches(
+                path, metadata, coords, payload.get('layers'), out_size,
+                executor=get_patch_executor(), enhance=enhance,
+            )
+        except (KeyError, TypeError, ValueError, IndexError) as e:
+            self.send_error(400, f"Invalid patch request: {e}")
+            return
+
+        logger.info("Patch request for %s: %d chips x %d layers (%dx%d)", self.path,
+                    len(coords), len(layers), patches.shape[3], patches.shape[2])
+
+        body = memoryview(patches).cast('B')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('X-Patch-Width', str(patches.shape[3]))
+        self.send_header('X-Patch-Height', str(patches.shape[2]))
+        self.send_header('X-Patch-Count', str(patches.shape[0]))
+        self.send_header('X-Layers', ','.join(str(layer) for layer in layers))
+        self.send_header('X-Patch-Enhanced', '1' if enhance is not None else '0')
+        self.add_cors_headers()
+        self.end_headers()
+        self.wfile.write(body)
+
+    def handle_export_request(self):
+        """downloadZip 구조의 패치 ZIP을 만들면서 바로 응답으로 스트리밍 (HTTP/1.1은 chunked)
+
+        요청 본문 (JSON 또는 폼 필드 payload): {metadata, coordinates, voids (선택),
+            fileName (선택), layers (선택), enhance (기본 true), overlayVoids (선택)}
+        PNG는 ZIP_STORED로 저장하고, 진행 중인 워커 작업 수만큼만 메모리에 둔다
+        """
+        if patch_extractor is None:
+            self.send_error(501, "Patch export requires numpy, tifffile and Pillow")
+            return
+
+        path = self.translate_path('/' + self.path[len(EXPORT_PREFIX):])
+        if not os.path.isfile(path):
+            self.send_error(404, "File not found")
+            return
+
+        payload = self.read_json_body()
+        if payload is None:
+            return
+
+        metadata = payload.get('metadata') or {}
+        coords = payload.get('coordinates') or []
+        voids = payload.get('voids') or []
+        file_name = os.path.basename(payload.get('fileName') or 'patches.zip')
+        if not file_name.endswith('.zip'):
+            file_name += '.zip'
+
+        try:
+            # 잘못된 요청은 응답을 시작하기 전에 400으로 거절
+            tasks, layers = batch_extract.build_tasks(
+                path, coords, metadata, voids, layers=payload.get('layers'),
+                enhance=payload.get('enhance', True),
+                overlay_voids=payload.get('overlayVoids', False),
+            )
+        except (KeyError, TypeError, ValueError, IndexError) as e:
+            self.send_error(400, f"Invalid export request: {e}")
+            return
+
+        # HTTP/1.0 응답(--single-threaded/--no-keep-alive 또는 1.0 클라이언트)은 chunked를
+        # 쓸 수 없으므로 본문을 그대로 보내고 연결 종료로 끝을 알림
+        chunked = (self.protocol_version != 'HTTP/1.0'
+                   and self.request_version != 'HTTP/1.0')
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/zip')
+        self.send_header('Content-Disposition',
+                         f"attachment; filename*=UTF-8''{quote(file_name)}")
+        if chunked:
+            self.send_header('Transfer-Encoding', 'chunked')
+        else:
+            self.send_header('Connection', 'close')
+            self.close_connection = True
+        self.add_cors_headers()
+        self.end_headers()
+
+        writer = ChunkedWriter(self.wfile) if chunked else StreamWriter(self.wfile)
+        output = batch_extract.ZipOutput(writer)
+        workers = PATCH_WORKERS or os.cpu_count()
+        try:
+            written = batch_extract.write_export(
+                output, get_patch_executor(), tasks, layers, path, coords, metadata, voids,
+                workers * 2,
+            )
+            output.close()
+            writer.close()
+        except Exception as e:
+            # 이미 200을 보냈으므로 마지막 청크 없이 연결을 끊어서 불완전한 다운로드로 처리
+            logger.warning("Export of %s aborted: %s", self.path, e)
+            self.close_connection = True
+            return
+
+        logger.info("Streamed %s: %d with_voids, %d no_voids, %d merge images", file_name,
+                    written['with_voids'], written['no_voids'], written['merge'])
+
+    def resolve_pyramid_source(self, path):
+        """maxSize 쿼리가 있으면 압축 설정에 가장 잘 맞는 피라미드 레벨 파일로 교체"""
+        self.pyramid_factor = 1
+        query = self.path.partition('?')[2]
+        if not query or not path.lower().endswith(('.tif', '.tiff')):
+            return path
+
+        try:
+            max_size = int(parse_qs(query).get('maxSize', ['0'])[0])
+        except ValueError:
+            return path
+
+        source, self.pyramid_factor = select_source(path, max_size, OVERVIEW_CACHE)
+        if self.pyramid_factor > 1:
+            logger.debug("Pyramid level 1/%d selected for maxSize=%d: %s",
+                         self.pyramid_factor, max_size, os.path.basename(source))
+        return source
+
+    def add_pyramid_header(self):
+        """피라미드 레벨 응답이면 배율 헤더 추가"""
+        if self.pyramid_factor > 1:
+            self.send_header('X-Pyramid-Factor', str(self.pyramid_factor))
+
+    def send_json(self, data, status=200):
+        """JSON 응답 전송"""
+        body = json.dumps(data, separators=(',', ':')).encode()
+        encoding = None
+        if self.compression and len(body) >= compress_cache.MIN_COMPRESS_BYTES:
+            encoding = compress_cache.choose_encoding(self.headers.get('Accept-Encoding'))
+        if encoding:
+            body = compress_cache.compress(body, encoding, fast=True)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        if self.compression:
+            self.send_header('Vary', 'Accept-Encoding')
+        self.add_cors_headers()
+        self.end_headers()
+        self.wfile.write(body)
+
     def parse_range_header(self, range_header, file_size):
         """Range 헤더 파싱"""
         if not range_header.startswith('bytes='):
@@ -209,10 +974,10 @@ class CustomRangeHTTPRequestHandler(http.server.BaseHTTPRequestHandler):
                 if end >= file_size:
                     end = file_size - 1
                 if start > end:
-                    print(f"Invalid range: start={start} > end={end}, skipping")
+                    logger.debug("Invalid range: start=%d > end=%d, skipping", start, end)
                     continue
                 
-                print(f"Valid range: {start}-{end} (file_size: {file_size})")
+                logger.debug("Valid range: %d-%d (file_size: %d)", start, end, file_size)
                 ranges.append((start, end))
                 
             except ValueError:
@@ -233,6 +998,7 @@ class CustomRangeHTTPRequestHandler(http.server.BaseHTTPRequestHandler):
     
     def guess_type(self, path):
         """파일 타입 추정"""
+        path = path.split('?', 1)[0]
         if path.endswith('.tif') or path.endswith('.tiff'):
             return 'image/tiff'
         elif path.endswith('.html'):
@@ -243,14 +1009,24 @@ class CustomRangeHTTPRequestHandler(http.server.BaseHTTPRequestHandler):
             return 'text/css'
         elif path.endswith('.json'):
             return 'application/json'
+        elif path.endswith('.csv'):
+            return 'text/csv'
+        elif path.endswith('.txt'):
+            return 'text/plain'
         else:
             return 'application/octet-stream'
     
     def add_cors_headers(self):
         """CORS 헤더 추가"""
         self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'GET, HEAD, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Range, Content-Type')
+        self.send_header('Access-Control-Allow-Methods', 'GET, HEAD, POST, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers',
+                         'Range, Content-Type, If-None-Match, If-Modified-Since, If-Range')
+        self.send_header('Access-Control-Expose-Headers',
+                         'Content-Range, Content-Length, Accept-Ranges, X-Pyramid-Factor, '
+                         'X-Patch-Width, X-Patch-Height, X-Patch-Count, X-Patch-Enhanced, '
+                         'X-Layers, Content-Disposition, X-Tile-Width, X-Tile-Height, X-Tile-Cache, '
+                         'ETag, Last-Modified')
     
     def send_directory_listing(self, path):
         """디렉토리 목록 전송"""
@@ -290,25 +1066,157 @@ class CustomRangeHTTPRequestHandler(http.server.BaseHTTPRequestHandler):
         self.end_headers()
         self.wfile.write(html.encode())
 
-def run_server(port=8081, directory=None):
+class LoggingServerMixin:
+    """연결 처리 예외를 stderr 대신 로거로 기록 (클라이언트가 끊은 경우는 DEBUG)"""
+
+    def handle_error(self, request, client_address):
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            logger.debug("Client %s disconnected", client_address)
+        else:
+            logger.exception("Error while handling request from %s", client_address)
+
+
+class ThreadPoolHTTPServer(LoggingServerMixin, socketserver.TCPServer):
+    """고정 크기 스레드 풀로 연결을 동시에 처리하는 서버
+
+    GeoTIFF.fromUrl이 병렬로 보내는 Range 요청들이 하나의 느린 요청 뒤에
+    줄 서지 않도록 연결마다 워커 스레드를 배정한다.
+    """
+
+    allow_reuse_address = True
+    request_queue_size = 128
+
+    def __init__(self, server_address, handler_class, workers=DEFAULT_WORKERS):
+        self.workers = max(1, int(workers))
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="range-worker"
+        )
+        super().__init__(server_address, handler_class)
+
+    def process_request(self, request, client_address):
+        """연결 처리를 스레드 풀에 위임"""
+        self.executor.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        """워커 스레드에서 연결 하나를 끝까지 처리"""
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class SingleThreadHTTPServer(LoggingServerMixin, socketserver.TCPServer):
+    """기존 단일 스레드 서버 (벤치마크 비교용)"""
+
+    allow_reuse_address = True
+
+
+def create_server(port=8081, workers=DEFAULT_WORKERS, single_threaded=False,
+                  keep_alive=True, keep_alive_timeout=DEFAULT_KEEP_ALIVE_TIMEOUT,
+                  use_sendfile=True, patch_workers=None, mmap_files=DEFAULT_MAX_FILES,
+                  stat_ttl=DEFAULT_STAT_TTL, tile_cache_mb=DEFAULT_TILE_CACHE_MB,
+                  range_gap=DEFAULT_RANGE_GAP, cache_max_age=DEFAULT_CACHE_MAX_AGE,
+                  compression=True, compress_cache_mb=DEFAULT_COMPRESS_CACHE_MB,
+                  stats_window=DEFAULT_WINDOW, access_log=None, legacy_copy=False):
+    """서빙 모드에 맞는 서버 인스턴스 생성"""
+    global PATCH_WORKERS, REQUEST_STATS, ACCESS_LOG
+    PATCH_WORKERS = patch_workers
+    REQUEST_STATS = RequestStats(stats_window)
+    ACCESS_LOG = AccessLog(access_log) if access_log else None
+    MMAP_POOL.max_files = mmap_files
+    MMAP_POOL.stat_ttl = stat_ttl
+    if TILE_CACHE is not None:
+        TILE_CACHE.max_bytes = int(tile_cache_mb * 1024 * 1024)
+    CustomRangeHTTPRequestHandler.use_sendfile = use_sendfile and hasattr(os, 'sendfile')
+    CustomRangeHTTPRequestHandler.legacy_copy = legacy_copy
+    CustomRangeHTTPRequestHandler.range_gap = range_gap
+    CustomRangeHTTPRequestHandler.cache_max_age = cache_max_age
+    CustomRangeHTTPRequestHandler.compression = compression
+    COMPRESSED_CACHE.max_bytes = int(compress_cache_mb * 1024 * 1024)
+
+    # 단일 스레드 모드에서 keep-alive를 쓰면 한 연결이 서버 전체를 점유하므로 HTTP/1.0 유지
+    if single_threaded or not keep_alive:
+        CustomRangeHTTPRequestHandler.protocol_version = "HTTP/1.0"
+    else:
+        CustomRangeHTTPRequestHandler.protocol_version = "HTTP/1.1"
+    CustomRangeHTTPRequestHandler.timeout = keep_alive_timeout
+
+    if single_threaded:
+        return SingleThreadHTTPServer(("localhost", port), CustomRangeHTTPRequestHandler)
+    return ThreadPoolHTTPServer(("localhost", port), CustomRangeHTTPRequestHandler, workers)
+
+
+def run_server(port=8081, directory=None, workers=DEFAULT_WORKERS, single_threaded=False,
+               keep_alive=True, keep_alive_timeout=DEFAULT_KEEP_ALIVE_TIMEOUT,
+               use_sendfile=True, patch_workers=None, mmap_files=DEFAULT_MAX_FILES,
+               stat_ttl=DEFAULT_STAT_TTL, tile_cache_mb=DEFAULT_TILE_CACHE_MB,
+               range_gap=DEFAULT_RANGE_GAP, cache_max_age=DEFAULT_CACHE_MAX_AGE,
+               compression=True, compress_cache_mb=DEFAULT_COMPRESS_CACHE_MB,
+               stats_window=DEFAULT_WINDOW, access_log=None, log_level=DEFAULT_LOG_LEVEL,
+               log_sample=DEFAULT_LOG_SAMPLE, log_file=None, legacy_copy=False):
     """Range 지원 서버 실행"""
     if directory:
         os.chdir(directory)
+    log_listener = setup_logging(log_level, log_sample, log_file)
     
     print(f"Python version: {sys.version}")
     print(f"Serving directory: {os.getcwd()}")
     print(f"Server port: {port}")
     print("Custom Range support implemented")
     
-    with socketserver.TCPServer(("localhost", port), CustomRangeHTTPRequestHandler) as httpd:
+    with create_server(port, workers, single_threaded, keep_alive, keep_alive_timeout,
+                       use_sendfile, patch_workers, mmap_files, stat_ttl, tile_cache_mb,
+                       range_gap, cache_max_age, compression, compress_cache_mb,
+                       stats_window, access_log, legacy_copy) as httpd:
         print(f"Custom Range HTTP server running at http://localhost:{port}/")
         print("Range requests are fully supported")
+        if single_threaded:
+            print("Serving mode: single-threaded (HTTP/1.0)")
+        else:
+            print(f"Serving mode: thread pool ({httpd.workers} workers, "
+                  f"{CustomRangeHTTPRequestHandler.protocol_version}"
+                  f"{' keep-alive' if keep_alive else ''})")
+        fallback = '8 KB copy (legacy)' if legacy_copy else 'mmap'
+        print(f"File transfer: {'sendfile (zero-copy)' if CustomRangeHTTPRequestHandler.use_sendfile else fallback}")
+        print(f"Multipart ranges: merged when closer than {range_gap} bytes")
+        print(f"HTTP caching: ETag/Last-Modified validators"
+              f"{f', max-age={cache_max_age}s' if cache_max_age > 0 else ', always revalidate'}")
+        if compression:
+            print(f"Text compression: {', '.join(compress_cache.ENCODINGS)} "
+                  f"(cache {compress_cache_mb} MB)")
+        print(f"Logging: {log_level}"
+              f"{'' if log_level == 'debug' else f', 1 in {log_sample} successful requests'}"
+              f"{f', file {log_file}' if log_file else ''}")
+        print(f"Request stats: {STATS_PATH} (latency percentiles over last {stats_window} requests)"
+              f"{f', access log {access_log}' if access_log else ''}")
+        print(f"File pool: up to {mmap_files} memory-mapped files (stat TTL {stat_ttl}s)")
+        if patch_extractor is None:
+            print("Patch extraction API disabled (numpy/tifffile/Pillow not installed)")
+        else:
+            print(f"Tile cache: {tile_cache_mb} MB decoded tiles (stats at {TILE_STATS_PATH})")
         print("Press Ctrl+C to stop")
+        # SIGTERM도 Ctrl+C처럼 정리 경로(패치 워커 종료 등)를 거쳐서 끝내기
+        signal.signal(signal.SIGTERM, raise_keyboard_interrupt)
         
         try:
             httpd.serve_forever()
         except KeyboardInterrupt:
             print("\nServer stopped by user")
+        finally:
+            if _patch_executor is not None:
+                _patch_executor.shutdown(wait=False, cancel_futures=True)
+            if TILE_PAGES is not None:
+                TILE_PAGES.close()
+            MMAP_POOL.close()
+            if ACCESS_LOG is not None:
+                ACCESS_LOG.close()
+            log_listener.stop()
 
 if __name__ == "__main__":
     import argparse
@@ -316,7 +1224,50 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Custom Range HTTP Server')
     parser.add_argument('--port', '-p', type=int, default=8083, help='Port to serve on')
     parser.add_argument('--directory', '-d', default='.', help='Directory to serve')
+    parser.add_argument('--workers', '-w', type=int, default=DEFAULT_WORKERS,
+                        help='Worker thread count for concurrent serving')
+    parser.add_argument('--single-threaded', action='store_true',
+                        help='Use the legacy single-threaded server')
+    parser.add_argument('--no-keep-alive', action='store_true',
+                        help='Disable HTTP/1.1 keep-alive')
+    parser.add_argument('--keep-alive-timeout', type=float, default=DEFAULT_KEEP_ALIVE_TIMEOUT,
+                        help='Idle keep-alive connection timeout in seconds')
+    parser.add_argument('--no-sendfile', action='store_true',
+                        help='Disable the sendfile fast path (write from the mmap instead)')
+    parser.add_argument('--legacy-copy', action='store_true',
+                        help='Write non-sendfile responses with the old 8 KB read/copy loop '
+                             '(benchmark baseline)')
+    parser.add_argument('--patch-workers', type=int, default=None,
+                        help='Worker processes for the patch extraction API (default: CPU count)')
+    parser.add_argument('--mmap-files', type=int, default=DEFAULT_MAX_FILES,
+                        help='Maximum number of memory-mapped files kept open')
+    parser.add_argument('--stat-ttl', type=float, default=DEFAULT_STAT_TTL,
+                        help='Seconds between file change checks for mapped files')
+    parser.add_argument('--range-gap', type=int, default=DEFAULT_RANGE_GAP,
+                        help='Merge multipart ranges separated by at most this many bytes')
+    parser.add_argument('--cache-max-age', type=int, default=DEFAULT_CACHE_MAX_AGE,
+                        help='Cache-Control max-age in seconds for served files (0: always revalidate)')
+    parser.add_argument('--no-compression', action='store_true',
+                        help='Disable gzip/brotli compression of HTML/JS/CSS/JSON/CSV responses')
+    parser.add_argument('--compress-cache-mb', type=float, default=DEFAULT_COMPRESS_CACHE_MB,
+                        help='Memory budget in MB for compressed text files')
+    parser.add_argument('--stats-window', type=int, default=DEFAULT_WINDOW,
+                        help='Number of recent requests used for /stats latency percentiles')
+    parser.add_argument('--access-log', default=None,
+                        help='Append one JSON line per request to this file (written off-thread)')
+    parser.add_argument('--log-level', choices=LOG_LEVELS, default=DEFAULT_LOG_LEVEL,
+                        help='Log level (debug logs every request and parsed range)')
+    parser.add_argument('--log-sample', type=int, default=DEFAULT_LOG_SAMPLE,
+                        help='Log 1 in N successful requests (errors are always logged)')
+    parser.add_argument('--log-file', default=None, help='Also write logs to this file')
+    parser.add_argument('--tile-cache-mb', type=float, default=DEFAULT_TILE_CACHE_MB,
+                        help='Memory budget in MB for decoded tiles served at /tile/')
     
     args = parser.parse_args()
     
-    run_server(args.port, args.directory)
\ No newline at end of file
+    run_server(args.port, args.directory, args.workers, args.single_threaded,
+               not args.no_keep_alive, args.keep_alive_timeout, not args.no_sendfile,
+               args.patch_workers, args.mmap_files, args.stat_ttl, args.tile_cache_mb,
+               args.range_gap, args.cache_max_age, not args.no_compression,
+               args.compress_cache_mb, args.stats_window, args.access_log,
+               args.log_level, args.log_sample, args.log_file, args.legacy_copy)
\ No newline at end of file
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Range 서버 요청 단위 계측
+요청마다 (파일, 상태, 전송 바이트, 지연, Range 수, TIFF 페이지)를 기록해서
+최근 구간의 지연 백분위/처리량과 파일/페이지별 누적치를 /stats로 보여주고,
+선택적으로 NDJSON 접근 로그를 별도 스레드에서 기록한다
+"""
+import bisect
+import json
+import queue
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+
+# 백분위 계산에 쓰는 최근 요청 수
+DEFAULT_WINDOW = 4096
+PERCENTILES = (50, 90, 99)
+# 처리량(bytes/s, req/s) 계산 구간 (초)
+THROUGHPUT_SECONDS = 60
+# 접근 로그 큐가 가득 차면 요청 스레드를 막지 않고 버림
+ACCESS_LOG_QUEUE = 10000
+
+
+def percentiles(values, points=PERCENTILES):
+    """nearest-rank 백분위 {p50: ..., p90: ...}"""
+    if not values:
+        return {f'p{p}': None for p in points}
+    ordered = sorted(values)
+    last = len(ordered) - 1
+    return {f'p{p}': ordered[min(last, max(0, -(-p * len(ordered) // 100) - 1))]
+            for p in points}
+
+
+class CountingWriter:
+    """wfile 래퍼 - 소켓에 쓴 바이트 수 집계 (sendfile 전송은 호출 쪽에서 add)"""
+
+    def __init__(self, wfile):
+        self.wfile = wfile
+        self.count = 0
+
+    def write(self, data):
+        written = self.wfile.write(data)
+        self.count += written
+        return written
+
+    def add(self, length):
+        self.count += length
+
+    def __getattr__(self, name):
+        return getattr(self.wfile, name)
+
+
+class PageLocator:
+    """TIFF 바이트 오프셋 -> 페이지 번호 (페이지별 데이터 구간을 파일 버전별로 캐시)"""
+
+    def __init__(self, index_cache, max_files=32):
+        self.index_cache = index_cache
+        self.max_files = max_files
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def pages(self, mapped, ranges):
+        """(start, end) 구간들이 걸친 페이지별 바이트 {page: bytes} (IFD 등 데이터 밖은 'header')"""
+        starts, spans = self._spans(mapped)
+        result = Counter()
+        for start, end in ranges:
+            i = bisect.bisect_right(starts, start) - 1
+            if i >= 0 and start < spans[i][1]:
+                result[spans[i][2]] += end - start + 1
+            else:
+                result['header'] += end - start + 1
+        return dict(result)
+
+    def _spans(self, mapped):
+        key = (mapped.path, mapped.fingerprint)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+
+        try:
+            index = self.index_cache.get(mapped.path)
+        except (OSError, ValueError):
+            index = {'pages': []}
+        spans = []
+        for page in index['pages']:
+            segments = [(offset, offset + count)
+                        for offset, count in zip(page.get('offsets', []), page.get('byteCounts', []))
+                        if count]
+            if segments:
+                spans.append((min(s for s, _ in segments), max(e for _, e in segments),
+                              page['index']))
+        spans.sort()
+        entry = ([start for start, _, _ in spans], spans)
+
+        with self._lock:
+            self._entries[key] = entry
+            while len(self._entries) > self.max_files:
+                self._entries.popitem(last=False)
+        return entry
+
+
+class RequestStats:
+    """요청 기록 집계 (스레드 안전)"""
+
+    def __init__(self, window=DEFAULT_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.requests = 0
+        self.bytes = 0
+        self.status = Counter()
+        self._recent = deque(maxlen=window)  # (monotonic 시각, 지연 ms, 바이트)
+        self._kinds = {}
+        self._files = {}
+
+    def record(self, entry):
+        """entry: {file, kind, status, bytes, ms, ranges, pages: {page: bytes}}"""
+        now = time.monotonic()
+        with self._lock:
+            self.requests += 1
+            self.bytes += entry['bytes']
+            self.status[entry['status']] += 1
+            self._recent.append((now, entry['ms'], entry['bytes']))
+
+            kind = self._kinds.get(entry['kind'])
+            if kind is None:
+                kind = self._kinds[entry['kind']] = {
+                    'requests': 0, 'bytes': 0, 'latencies': deque(maxlen=self.window)}
+            kind['requests'] += 1
+            kind['bytes'] += entry['bytes']
+            kind['latencies'].append(entry['ms'])
+
+            # 404 등으로 파일 목록이 무한히 늘지 않도록 성공 응답만 파일별 집계
+            if entry['status'] >= 400 or not entry['file']:
+                return
+            stats = self._files.get(entry['file'])
+            if stats is None:
+                stats = self._files[entry['file']] = {
+                    'requests': 0, 'bytes': 0, 'ms': 0.0, 'ranges': 0, 'pages': {}}
+            stats['requests'] += 1
+            stats['bytes'] += entry['bytes']
+            stats['ms'] += entry['ms']
+            stats['ranges'] += entry['ranges']
+            for page, length in (entry.get('pages') or {}).items():
+                page_stats = stats['pages'].setdefault(str(page), {'requests': 0, 'bytes': 0})
+                page_stats['requests'] += 1
+                page_stats['bytes'] += length
+
+    def snapshot(self):
+        """/stats 응답용 요약"""
+        now = time.monotonic()
+        with self._lock:
+            recent = list(self._recent)
+            kinds = {name: {'requests': kind['requests'], 'bytes': kind['bytes'],
+                            'latencyMs': percentiles(kind['latencies'])}
+                     for name, kind in self._kinds.items()}
+            files = {name: {**stats, 'ms': round(stats['ms'], 3),
+                            'pages': {page: dict(value) for page, value in stats['pages'].items()}}
+                     for name, stats in self._files.items()}
+            status = {str(code): count for code, count in sorted(self.status.items())}
+            requests, total_bytes = self.requests, self.bytes
+
+        latencies = [ms for _, ms, _ in recent]
+        last = [(t, length) for t, _, length in recent if now - t <= THROUGHPUT_SECONDS]
+        span = max(now - last[0][0], 1.0) if last else 1.0
+        return {
+            'uptimeSeconds': round(time.time() - self.started, 1),
+            'requests': requests,
+            'bytes': total_bytes,
+            'status': status,
+            'latencyMs': {**percentiles(latencies),
+                          'mean': round(sum(latencies) / len(latencies), 3) if latencies else None,
+                          'window': len(latencies)},
+            'throughput': {
+                'seconds': THROUGHPUT_SECONDS,
+                'requestsPerSecond': round(len(last) / span, 2),
+                'bytesPerSecond': round(sum(length for _, length in last) / span),
+            },
+            'kinds': kinds,
+            'files': files,
+        }
+
+
+class AccessLog:
+    """NDJSON 접근 로그 - 요청 스레드는 큐에 넣기만 하고 별도 스레드가 파일에 기록"""
+
+    def __init__(self, path, max_queue=ACCESS_LOG_QUEUE):
+        self.path = path
+        self.dropped = 0
+        self._queue = queue.Queue(max_queue)
+        self._file = open(path, 'a', encoding='utf-8')
+        self._thread = threading.Thread(target=self._run, name='access-log', daemon=True)
+        self._thread.start()
+
+    def write(self, entry):
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            entry = self._queue.get()
+            if entry is None:
+                break
+            self._file.write(json.dumps(entry, separators=(',', ':')) + '\n')
+            # 쌓인 기록이 없을 때만 flush (몰릴 때는 버퍼링)
+            if self._queue.empty():
+                self._file.flush()
+        self._file.close()
+
+    def close(self):
+        """남은 기록을 쓰고 종료"""
+        self._queue.put(None)
+        self._thread.join(timeout=5)
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Range 서버 로깅 설정
+요청 스레드는 QueueHandler로 큐에 넣기만 하고 QueueListener 스레드가 콘솔/파일에 쓴다.
+요청마다 남는 접근 로그는 N개 중 1개만 기록(샘플링)하고, 4xx/5xx는 항상 기록한다
+"""
+import itertools
+import logging
+import logging.handlers
+import queue
+
+LOG_LEVELS = ('debug', 'info', 'warning', 'error')
+DEFAULT_LOG_LEVEL = 'info'
+# 성공 요청 접근 로그 샘플링 간격 (1이면 전부 기록)
+DEFAULT_LOG_SAMPLE = 100
+LOG_FORMAT = '%(asctime)s %(levelname)-7s %(message)s'
+
+logger = logging.getLogger('range_server')
+access_logger = logging.getLogger('range_server.access')
+
+
+class SamplingFilter(logging.Filter):
+    """INFO 이하 기록은 every개 중 1개만 통과 (WARNING 이상은 항상 통과)"""
+
+    def __init__(self, every=DEFAULT_LOG_SAMPLE):
+        super().__init__()
+        self.every = max(1, every)
+        self._counter = itertools.count()
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or self.every == 1:
+            return True
+        return next(self._counter) % self.every == 0
+
+
+def setup_logging(level=DEFAULT_LOG_LEVEL, sample=DEFAULT_LOG_SAMPLE, log_file=None):
+    """큐 기반 로깅 시작 - 반환된 QueueListener는 종료 시 stop() 호출"""
+    handlers = [logging.StreamHandler()]
+    if log_file:
+        handlers.append(logging.FileHandler(log_file, encoding='utf-8'))
+    formatter = logging.Formatter(LOG_FORMAT)
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    logger.handlers[:] = [logging.handlers.QueueHandler(log_queue)]
+    logger.setLevel(level.upper())
+    logger.propagate = False
+
+    # debug에서는 모든 요청을 보고 싶으므로 샘플링하지 않음
+    access_logger.filters[:] = []
+    if level != 'debug':
+        access_logger.addFilter(SamplingFilter(sample))
+
+    listener = logging.handlers.QueueListener(log_queue, *handlers)
+    listener.start()
+    return listener
@@ -0,0 +1,497 @@
+#!/usr/bin/env python3
+"""
+Range 서버 벤치마크
+range_server_custom.py를 서브프로세스로 띄우고 병렬 Range 요청 처리량,
+대용량 전송 속도(8 KB 청크 복사 vs mmap vs sendfile), GeoTIFF 클라이언트 접근 패턴
+(헤더 탐색, 페이지별 타일 스윕, 랜덤 칩 크롭, 레이어 병렬)별 성능 측정
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import shlex
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+try:
+    import resource  # Unix 전용 (서버 프로세스 CPU 시간 측정)
+except ImportError:
+    resource = None
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVER_SCRIPT = os.path.join(ROOT_DIR, "range_server_custom.py")
+sys.path.insert(0, ROOT_DIR)
+
+from tiff_index import parse_tiff_index  # noqa: E402
+
+# geotiff.js가 처음 읽는 헤더 블록 / IFD 읽기 크기
+HEADER_PROBE_BYTES = 64 * 1024
+IFD_PROBE_BYTES = 16 * 1024
+
+
+def create_fixture(directory, size_mb=256, filename="bench_fixture.bin"):
+    """벤치마크용 랜덤 바이트 파일 생성 (이미 있으면 재사용)"""
+    path = os.path.join(directory, filename)
+    size = size_mb * 1024 * 1024
+    if os.path.exists(path) and os.path.getsize(path) == size:
+        return path
+
+    print(f"Creating fixture {path} ({size_mb} MB)...")
+    chunk = os.urandom(1024 * 1024)
+    with open(path, "wb") as f:
+        for _ in range(size_mb):
+            f.write(chunk)
+    return path
+
+
+def wait_for_port(port, timeout=10.0):
+    """서버가 포트를 열 때까지 대기"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("localhost", port), timeout=0.5):
+                return True
+        except OSError:
+            time.sleep(0.05)
+    return False
+
+
+def start_server(port, directory, extra_args=()):
+    """range_server_custom.py 서브프로세스 시작"""
+    cmd = [sys.executable, SERVER_SCRIPT, "--port", str(port),
+           "--directory", directory, *extra_args]
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    if not wait_for_port(port):
+        proc.kill()
+        raise RuntimeError(f"Server did not start: {' '.join(cmd)}")
+    return proc
+
+
+def stop_server(proc):
+    """서버 서브프로세스 종료"""
+    proc.terminate()
+    try:
+        proc.wait(timeout=5)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+def child_cpu_seconds():
+    """종료된 자식 프로세스들의 누적 CPU 시간 (user + sys)"""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def process_cpu_seconds(pid):
+    """실행 중인 프로세스의 누적 CPU 시간 (Linux /proc, 그 외 None)"""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        # utime, stime (clock tick 단위) - 상태 필드 다음 12, 13번째
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    except (OSError, IndexError, ValueError, AttributeError):
+        return None
+
+
+def run_parallel_ranges(port, url_path, file_size, clients, requests_per_client,
+                        range_size, seed=0):
+    """여러 클라이언트 스레드에서 랜덤 Range 요청을 동시에 전송"""
+    total_bytes = [0] * clients
+    errors = [0] * clients
+
+    def client(idx):
+        rng = random.Random(seed + idx)
+        conn = http.client.HTTPConnection("localhost", port, timeout=30)
+        for _ in range(requests_per_client):
+            start = rng.randrange(0, max(1, file_size - range_size))
+            end = start + range_size - 1
+            try:
+                conn.request("GET", url_path, headers={"Range": f"bytes={start}-{end}"})
+                resp = conn.getresponse()
+                body = resp.read()
+                if resp.status != 206:
+                    errors[idx] += 1
+                total_bytes[idx] += len(body)
+            except (OSError, http.client.HTTPException):
+                errors[idx] += 1
+                conn.close()
+                conn = http.client.HTTPConnection("localhost", port, timeout=30)
+        conn.close()
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    requests = clients * requests_per_client
+    return {
+        "requests": requests,
+        "elapsed": elapsed,
+        "req_per_sec": requests / elapsed,
+        "mb_per_sec": sum(total_bytes) / (1024 * 1024) / elapsed,
+        "errors": sum(errors),
+    }
+
+
+def bench_parallel(args):
+    """단일 스레드 서버와 스레드 풀 서버의 병렬 Range 처리량 비교"""
+    directory = args.directory or tempfile.gettempdir()
+    fixture = create_fixture(directory, args.size_mb)
+    url_path = "/" + os.path.basename(fixture)
+    file_size = os.path.getsize(fixture)
+
+    modes = [
+        ("single-threaded", ["--single-threaded"]),
+        (f"thread pool ({args.workers} workers)", ["--workers", str(args.workers)]),
+    ]
+
+    print(f"Parallel Range benchmark: {args.clients} clients x {args.requests} requests, "
+          f"{args.range_kb} KB ranges")
+    results = []
+    for label, extra in modes:
+        proc = start_server(args.port, directory, extra)
+        try:
+            # 워밍업 (페이지 캐시 채우기)
+            run_parallel_ranges(args.port, url_path, file_size, 2, 10, args.range_kb * 1024)
+            result = run_parallel_ranges(args.port, url_path, file_size, args.clients,
+                                         args.requests, args.range_kb * 1024)
+        finally:
+            stop_server(proc)
+        results.append((label, result))
+        print(f"  {label:<28} {result['req_per_sec']:8.1f} req/s "
+              f"{result['mb_per_sec']:8.1f} MB/s  "
+              f"({result['elapsed']:.2f}s, errors: {result['errors']})")
+
+    baseline = results[0][1]["req_per_sec"]
+    for label, result in results[1:]:
+        print(f"Speedup ({label} vs single-threaded): "
+              f"{result['req_per_sec'] / baseline:.2f}x")
+
+
+def run_large_transfers(port, url_path, file_size, repeats, range_mb):
+    """전체 파일 GET과 대용량 단일 Range GET을 반복하며 전송 속도 측정"""
+    conn = http.client.HTTPConnection("localhost", port, timeout=60)
+    results = {}
+
+    def timed(headers, expected_status):
+        total = 0
+        started = time.perf_counter()
+        for _ in range(repeats):
+            conn.request("GET", url_path, headers=headers)
+            resp = conn.getresponse()
+            # 응답 본문은 버리면서 크기만 센다
+            while True:
+                chunk = resp.read(1024 * 1024)
+                if not chunk:
+                    break
+                total += len(chunk)
+            if resp.status != expected_status:
+                raise RuntimeError(f"Unexpected status {resp.status}")
+        elapsed = time.perf_counter() - started
+        return total / (1024 * 1024) / elapsed
+
+    results["full"] = timed({}, 200)
+    range_len = min(file_size, range_mb * 1024 * 1024)
+    results["range"] = timed({"Range": f"bytes=0-{range_len - 1}"}, 206)
+    conn.close()
+    return results
+
+
+def bench_throughput(args):
+    """예전 8 KB 복사 루프 대비 mmap memoryview 쓰기 / sendfile 경로의 MB/s 비교"""
+    directory = args.directory or tempfile.gettempdir()
+    fixture = create_fixture(directory, args.size_mb)
+    url_path = "/" + os.path.basename(fixture)
+    file_size = os.path.getsize(fixture)
+
+    modes = [
+        ("8 KB copy (legacy)", ["--no-sendfile", "--legacy-copy"]),
+        ("mmap write", ["--no-sendfile"]),
+        ("sendfile", []),
+    ]
+
+    print(f"Transfer benchmark: {args.size_mb} MB file, {args.repeats} repeats, "
+          f"{args.range_mb} MB single ranges")
+    results = []
+    for label, extra in modes:
+        cpu_before = child_cpu_seconds()
+        proc = start_server(args.port, directory, extra)
+        try:
+            run_large_transfers(args.port, url_path, file_size, 1, args.range_mb)  # 워밍업
+            result = run_large_transfers(args.port, url_path, file_size,
+                                         args.repeats, args.range_mb)
+        finally:
+            stop_server(proc)
+        cpu_after = child_cpu_seconds()
+        served_gb = (file_size + min(file_size, args.range_mb * 1024 * 1024)) \
+            * (args.repeats + 1) / (1024 ** 3)
+        cpu_text = ""
+        if cpu_before is not None:
+            cpu_text = f"  server CPU {(cpu_after - cpu_before) / served_gb:.2f} s/GB"
+        results.append((label, result))
+        print(f"  {label:<28} full file {result['full']:8.1f} MB/s   "
+              f"single range {result['range']:8.1f} MB/s{cpu_text}")
+
+    base = results[0][1]
+    for label, result in results[1:]:
+        print(f"Speedup ({label} vs {results[0][0]}): full {result['full'] / base['full']:.2f}x, "
+              f"range {result['range'] / base['range']:.2f}x")
+
+
+def create_wafer_fixture(directory, size, layers, tile_size, seed=0):
+    """test/generate_test_large.py로 벤치마크용 웨이퍼 TIFF 생성 (이미 있으면 재사용)"""
+    path = os.path.join(directory, f"bench_wafer_{size}_{layers}l_t{tile_size}_s{seed}.tif")
+    if os.path.exists(path):
+        return path
+
+    from generate_test_large import generate_test_wafer  # numpy/tifffile 필요
+    # 다른 프로세스가 반쯤 쓴 파일을 재사용하지 않도록 임시 이름으로 생성 후 교체
+    partial_path = path + ".partial.tif"
+    generate_test_wafer(size, layers, partial_path, seed, tile_size)
+    os.replace(partial_path, path)
+    return path
+
+
+def segment_ranges(page):
+    """페이지의 타일/스트립 (start, end) 목록 (행 우선)"""
+    return [(offset, offset + count - 1)
+            for offset, count in zip(page["offsets"], page["byteCounts"]) if count]
+
+
+def crop_ranges(page, x, y, width, height):
+    """(x, y, width, height) 영역을 덮는 타일/스트립 Range 목록"""
+    if page["tiled"]:
+        seg_w, seg_h, across = page["tileWidth"], page["tileHeight"], page["tilesAcross"]
+    else:
+        seg_w, seg_h, across = page["width"], page["rowsPerStrip"], 1
+    ranges = []
+    for row in range(y // seg_h, (min(y + height, page["height"]) - 1) // seg_h + 1):
+        for col in range(x // seg_w, (min(x + width, page["width"]) - 1) // seg_w + 1):
+            index = row * across + col
+            count = page["byteCounts"][index]
+            if count:
+                ranges.append((page["offsets"][index], page["offsets"][index] + count - 1))
+    return ranges
+
+
+class PatternClient:
+    """요청별 지연/바이트를 기록하는 keep-alive 클라이언트 연결"""
+
+    def __init__(self, port, url_path):
+        self.port = port
+        self.url_path = url_path
+        self.conn = http.client.HTTPConnection("localhost", port, timeout=60)
+        self.latencies = []
+        self.bytes = 0
+        self.errors = 0
+
+    def get(self, ranges):
+        header = "bytes=" + ",".join(f"{start}-{end}" for start, end in ranges)
+        started = time.perf_counter()
+        try:
+            self.conn.request("GET", self.url_path, headers={"Range": header})
+            resp = self.conn.getresponse()
+            body = resp.read()
+            if resp.status != 206:
+                self.errors += 1
+            self.bytes += len(body)
+        except (OSError, http.client.HTTPException):
+            self.errors += 1
+            self.conn.close()
+            self.conn = http.client.HTTPConnection("localhost", self.port, timeout=60)
+        self.latencies.append(time.perf_counter() - started)
+
+    def close(self):
+        self.conn.close()
+
+
+def run_pattern(port, url_path, jobs):
+    """jobs의 각 항목(요청 Range 목록의 리스트)을 별도 클라이언트 스레드에서 실행"""
+    clients = [PatternClient(port, url_path) for _ in jobs]
+
+    def worker(client, requests):
+        for ranges in requests:
+            client.get(ranges)
+
+    threads = [threading.Thread(target=worker, args=(client, requests))
+               for client, requests in zip(clients, jobs)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    for client in clients:
+        client.close()
+
+    latencies = sorted(latency for client in clients for latency in client.latencies)
+    total_bytes = sum(client.bytes for client in clients)
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, -(-p * len(latencies) // 100) - 1)] * 1000
+
+    return {
+        "requests": len(latencies),
+        "elapsed": elapsed,
+        "req_per_sec": len(latencies) / elapsed,
+        "mb_per_sec": total_bytes / (1024 * 1024) / elapsed,
+        "bytes": total_bytes,
+        "p50_ms": percentile(50),
+        "p99_ms": percentile(99),
+        "errors": sum(client.errors for client in clients),
+    }
+
+
+def split_jobs(requests, clients):
+    """요청 목록을 클라이언트 수만큼 라운드로빈 분배"""
+    return [requests[i::clients] for i in range(clients) if requests[i::clients]]
+
+
+def build_patterns(index, args):
+    """패턴 이름 -> 클라이언트별 요청 목록"""
+    pages = index["pages"]
+    rng = random.Random(args.seed)
+    patterns = {}
+
+    # 1) 헤더 탐색: 앱을 새로 열 때처럼 헤더 블록 + 페이지별 IFD 읽기
+    probe = [[(0, HEADER_PROBE_BYTES - 1)]] + [
+        [(page["ifdOffset"], page["ifdOffset"] + IFD_PROBE_BYTES - 1)] for page in pages]
+    patterns["header probe"] = split_jobs(probe * args.probe_repeats, args.clients)
+
+    # 2) 페이지별 타일 스윕: 레이어 전체를 타일 단위로 순서대로 읽기
+    sweep = [[segment] for page in pages for segment in segment_ranges(page)]
+    patterns["tile sweep"] = split_jobs(sweep, args.clients)
+
+    # 3) 랜덤 칩 크롭: 칩 영역을 덮는 타일들을 multipart 요청 하나로
+    crops = []
+    for _ in range(args.crops):
+        page = rng.choice(pages)
+        x = rng.randrange(0, max(1, page["width"] - args.chip_size))
+        y = rng.randrange(0, max(1, page["height"] - args.chip_size))
+        crops.append(crop_ranges(page, x, y, args.chip_size, args.chip_size))
+    patterns["random chip crops"] = split_jobs(crops, args.clients)
+
+    # 4) 레이어 병렬: 같은 칩 위치를 모든 레이어에서 동시에 (레이어당 연결 하나)
+    positions = [(rng.randrange(0, max(1, pages[0]["width"] - args.chip_size)),
+                  rng.randrange(0, max(1, pages[0]["height"] - args.chip_size)))
+                 for _ in range(max(1, args.crops // len(pages)))]
+    patterns["parallel layers"] = [
+        [crop_ranges(page, x, y, args.chip_size, args.chip_size) for x, y in positions]
+        for page in pages
+    ]
+    return patterns
+
+
+def bench_patterns(args):
+    """GeoTIFF 접근 패턴별 처리량/지연/서버 CPU 측정"""
+    directory = args.directory or tempfile.gettempdir()
+    fixture = args.fixture or create_wafer_fixture(directory, args.wafer_size, args.layers,
+                                                   args.tile_size, args.seed)
+    directory, name = os.path.split(os.path.abspath(fixture))
+    url_path = "/" + name
+    index = parse_tiff_index(fixture)
+    patterns = build_patterns(index, args)
+
+    extra = ["--log-level", "warning", *shlex.split(args.server_args)]
+    print(f"Access pattern benchmark: {name} ({len(index['pages'])} pages, "
+          f"{os.path.getsize(fixture) / (1024 ** 2):.1f} MB), {args.clients} clients")
+    if args.server_args:
+        print(f"Server args: {args.server_args}")
+
+    results = {}
+    cpu_before_all = child_cpu_seconds()
+    proc = start_server(args.port, directory, extra)
+    try:
+        # 워밍업 (페이지 캐시/mmap 풀 채우기)
+        run_pattern(args.port, url_path, patterns["header probe"])
+        print(f"  {'pattern':<20} {'req/s':>9} {'MB/s':>9} {'p50 ms':>8} {'p99 ms':>8} "
+              f"{'CPU s/GB':>9}  requests")
+        for label, jobs in patterns.items():
+            cpu_before = process_cpu_seconds(proc.pid)
+            result = run_pattern(args.port, url_path, jobs)
+            cpu_after = process_cpu_seconds(proc.pid)
+            gb = result["bytes"] / (1024 ** 3)
+            if cpu_before is not None and gb > 0:
+                result["cpu_s_per_gb"] = (cpu_after - cpu_before) / gb
+            results[label] = result
+            cpu_text = f"{result['cpu_s_per_gb']:9.2f}" if "cpu_s_per_gb" in result else f"{'n/a':>9}"
+            print(f"  {label:<20} {result['req_per_sec']:9.1f} {result['mb_per_sec']:9.1f} "
+                  f"{result['p50_ms']:8.2f} {result['p99_ms']:8.2f} {cpu_text}  "
+                  f"{result['requests']} (errors: {result['errors']})")
+    finally:
+        stop_server(proc)
+
+    # /proc이 없는 플랫폼은 서버 전체 수명(시작 포함)의 CPU만 알 수 있음
+    cpu_after_all = child_cpu_seconds()
+    if cpu_before_all is not None and not any("cpu_s_per_gb" in r for r in results.values()):
+        total_gb = sum(r["bytes"] for r in results.values()) / (1024 ** 3)
+        print(f"Server CPU (whole run incl. startup): "
+              f"{(cpu_after_all - cpu_before_all) / total_gb:.2f} s/GB")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"fixture": name, "serverArgs": args.server_args, "clients": args.clients,
+                       "results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Range server benchmark")
+    parser.add_argument("--port", "-p", type=int, default=8093, help="Port for the benchmark server")
+    parser.add_argument("--directory", "-d", default=None,
+                        help="Directory for fixture files (default: temp dir)")
+    parser.add_argument("--size-mb", type=int, default=256, help="Fixture file size in MB")
+
+    sub = parser.add_subparsers(dest="scenario")
+    sub.required = True
+
+    p_parallel = sub.add_parser("parallel", help="Parallel Range throughput: single-threaded vs thread pool")
+    p_parallel.add_argument("--clients", type=int, default=24, help="Concurrent client connections")
+    p_parallel.add_argument("--requests", type=int, default=200, help="Requests per client")
+    p_parallel.add_argument("--range-kb", type=int, default=64, help="Range size in KB")
+    p_parallel.add_argument("--workers", type=int, default=16, help="Server worker threads")
+    p_parallel.set_defaults(func=bench_parallel)
+
+    p_throughput = sub.add_parser("throughput", help="Large transfer MB/s: 8 KB copy vs mmap write vs sendfile")
+    p_throughput.add_argument("--repeats", type=int, default=5, help="Transfers per measurement")
+    p_throughput.add_argument("--range-mb", type=int, default=64, help="Single Range size in MB")
+    p_throughput.set_defaults(func=bench_throughput)
+
+    p_patterns = sub.add_parser("patterns",
+                                help="GeoTIFF access patterns on a generated wafer fixture")
+    p_patterns.add_argument("--fixture", default=None,
+                            help="Existing TIFF to use instead of generating one")
+    p_patterns.add_argument("--wafer-size", type=int, default=4096,
+                            help="Generated wafer width/height in pixels")
+    p_patterns.add_argument("--layers", type=int, default=4, help="Generated wafer layers")
+    p_patterns.add_argument("--tile-size", type=int, default=512,
+                            help="Generated TIFF tile size (0 writes strips)")
+    p_patterns.add_argument("--clients", type=int, default=8, help="Concurrent client connections")
+    p_patterns.add_argument("--probe-repeats", type=int, default=20,
+                            help="Header probe repetitions")
+    p_patterns.add_argument("--crops", type=int, default=400, help="Random chip crops")
+    p_patterns.add_argument("--chip-size", type=int, default=300, help="Chip crop size in pixels")
+    p_patterns.add_argument("--seed", type=int, default=0)
+    p_patterns.add_argument("--server-args", default="",
+                            help='Extra server arguments, e.g. "--no-sendfile --range-gap 0"')
+    p_patterns.add_argument("--output", "-o", default=None, help="Write results as JSON")
+    p_patterns.set_defaults(func=bench_patterns)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+enhance.py와 ImageProcessor.enhanceToTarget(JS) 결과 비교
+랜덤 패치 스택을 Node로 실제 js/imageProcessor.js에 통과시키고 (가짜 2D 컨텍스트 사용),
+웹앱 extractPatches처럼 패치 아래 titleH 빈 행이 통계에 포함되는 경우도 함께 확인한다
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from enhance import enhance_to_target  # noqa: E402
+
+# 패치 스택을 RGBA 캔버스(아래 titleH 행은 투명 0)로 만들어 enhanceToTarget 실행
+NODE_SCRIPT = r"""
+import { readFileSync, writeFileSync } from "fs";
+import { pathToFileURL } from "url";
+
+const [modulePath, inputPath, outputPath, n, h, w, titleH, tMean, tStd, pad] =
+  process.argv.slice(1);
+const { ImageProcessor } = await import(pathToFileURL(modulePath).href);
+const count = +n, height = +h, width = +w, title = +titleH;
+const canvasH = height + title;
+const input = readFileSync(inputPath);
+const output = Buffer.alloc(count * height * width);
+console.log = () => {};
+
+for (let p = 0; p < count; p++) {
+  const pixels = new Uint8ClampedArray(width * canvasH * 4);
+  for (let i = 0; i < height * width; i++) {
+    const v = input[p * height * width + i];
+    pixels[i * 4] = pixels[i * 4 + 1] = pixels[i * 4 + 2] = v;
+    pixels[i * 4 + 3] = 255;
+  }
+  const ctx = {
+    canvas: { width, height: canvasH },
+    getImageData(x, y, cw, ch) {
+      const data = new Uint8ClampedArray(cw * ch * 4);
+      for (let row = 0; row < ch; row++) {
+        const src = ((y + row) * width + x) * 4;
+        data.set(pixels.subarray(src, src + cw * 4), row * cw * 4);
+      }
+      return { data, width: cw, height: ch };
+    },
+    putImageData(imageData) {
+      pixels.set(imageData.data);
+    },
+  };
+  ImageProcessor.enhanceToTarget(ctx, +tMean, +tStd, +pad);
+  for (let i = 0; i < height * width; i++) {
+    output[p * height * width + i] = pixels[i * 4];
+  }
+}
+writeFileSync(outputPath, output);
+"""
+
+
+def make_patches(count, height, width, seed):
+    """대비/밝기가 다른 랜덤 패치와 상수/검정 패치 섞은 스택"""
+    rng = np.random.default_rng(seed)
+    means = rng.uniform(20, 230, size=(count, 1, 1))
+    stds = rng.uniform(1, 60, size=(count, 1, 1))
+    patches = np.clip(rng.normal(means, stds, size=(count, height, width)), 0, 255)
+    patches = patches.astype(np.uint8)
+    patches[0] = 0
+    if count > 1:
+        patches[1] = 0
+        patches[1, height // 3:, :] = 200
+    return patches
+
+
+def run_js(patches, title_height, target_mean, target_std, pad):
+    count, height, width = patches.shape
+    with tempfile.TemporaryDirectory() as tmp:
+        input_path = os.path.join(tmp, "input.raw")
+        output_path = os.path.join(tmp, "output.raw")
+        patches.tofile(input_path)
+        subprocess.run(
+            ["node", "--input-type=module", "-e", NODE_SCRIPT,
+             os.path.join(ROOT_DIR, "js", "imageProcessor.js"), input_path, output_path,
+             str(count), str(height), str(width), str(title_height),
+             str(target_mean), str(target_std), str(pad)],
+            check=True,
+        )
+        return np.fromfile(output_path, dtype=np.uint8).reshape(patches.shape)
+
+
+def compare(patches, title_height, target_mean, target_std, pad):
+    started = time.perf_counter()
+    expected = run_js(patches, title_height, target_mean, target_std, pad)
+    js_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    actual = enhance_to_target(patches, target_mean, target_std, pad, title_height)
+    numpy_time = time.perf_counter() - started
+
+    diff = np.abs(actual.astype(np.int16) - expected.astype(np.int16))
+    mismatched = np.count_nonzero(diff)
+    print(f"titleH={title_height:3d}: max diff {diff.max()}, "
+          f"{mismatched}/{diff.size} pixels differ "
+          f"(JS {js_time:.2f}s, NumPy {numpy_time:.3f}s)")
+    return diff.max()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare enhance.py with enhanceToTarget in JS")
+    parser.add_argument("--count", type=int, default=64, help="Number of patches")
+    parser.add_argument("--width", type=int, default=300)
+    parser.add_argument("--height", type=int, default=240)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tolerance", type=int, default=1,
+                        help="Allowed per-pixel difference (float summation order)")
+    args = parser.parse_args()
+
+    if shutil.which("node") is None:
+        print("node not found, cannot run the JS reference")
+        return 1
+
+    patches = make_patches(args.count, args.height, args.width, args.seed)
+    worst = max(compare(patches, title_height, 0.5, 0.2, 10) for title_height in (0, 40))
+    if worst > args.tolerance:
+        print(f"FAILED: difference {worst} exceeds tolerance {args.tolerance}")
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
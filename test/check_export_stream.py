@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+POST /export 스트리밍 ZIP 응답 형식 확인
+기본 모드(HTTP/1.1)는 chunked, --no-keep-alive/--single-threaded(HTTP/1.0)는
+Transfer-Encoding 없이 연결 종료로 끝나야 하고, 어느 쪽이든 받은 본문이 올바른 ZIP이어야 한다
+모든 모드를 같은 포트로 돌리고, 서버 종료(SIGTERM) 뒤 패치 워커가 포트를 물고 있지 않은지 확인
+"""
+
+import argparse
+import io
+import json
+import os
+import socket
+import sys
+import tempfile
+import time
+import zipfile
+
+import numpy as np
+import tifffile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_range_server import start_server, stop_server  # noqa: E402
+
+MODES = [
+    ("keep-alive (HTTP/1.1)", (), True),
+    ("no-keep-alive (HTTP/1.0)", ("--no-keep-alive",), False),
+    ("single-threaded (HTTP/1.0)", ("--single-threaded",), False),
+]
+
+
+def create_tiff(directory, size=512, layers=2):
+    path = os.path.join(directory, "export_fixture.tif")
+    rng = np.random.default_rng(0)
+    tifffile.imwrite(path, rng.integers(0, 256, (layers, size, size), dtype=np.uint8),
+                     tile=(256, 256))
+    return path
+
+
+def export_payload():
+    return {
+        "metadata": {
+            "gridSettings": {"cellW": 100, "cellH": 100},
+            "origin": {"x": 0, "y": 0},
+            "referenceGrid": {"x": 0, "y": 0},
+        },
+        "coordinates": [{"x": x, "y": y, "type": "A"} for x in range(2) for y in range(2)],
+        "fileName": "check.zip",
+    }
+
+
+def raw_post(port, url_path, payload):
+    """HTTP/1.1 요청을 보내고 연결이 닫힐 때까지 읽은 (헤더 dict, 원시 본문)"""
+    body = json.dumps(payload).encode()
+    request = (f"POST {url_path} HTTP/1.1\r\nHost: localhost\r\n"
+               f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+               f"Connection: close\r\n\r\n").encode() + body
+    with socket.create_connection(("localhost", port), timeout=60) as sock:
+        sock.sendall(request)
+        data = bytearray()
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            data += chunk
+
+    head, _, raw_body = bytes(data).partition(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    headers = {k.strip().lower(): v.strip()
+               for k, _, v in (line.partition(":") for line in lines[1:])}
+    return lines[0], headers, raw_body
+
+
+def dechunk(data):
+    out = bytearray()
+    while True:
+        size_line, _, data = data.partition(b"\r\n")
+        size = int(size_line, 16)
+        if size == 0:
+            return bytes(out)
+        out += data[:size]
+        data = data[size + 2:]
+
+
+def port_released(port, timeout=2.0):
+    """종료한 서버의 포트가 더 이상 연결을 받지 않는지 (남은 워커가 리슨 소켓을 들고 있으면 False)"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("localhost", port), timeout=0.5):
+                pass
+        except OSError:
+            return True
+        time.sleep(0.1)
+    return False
+
+
+def check_mode(port, directory, name, server_args, expect_chunked):
+    proc = start_server(port, directory, server_args)
+    try:
+        status, headers, raw_body = raw_post(port, "/export/export_fixture.tif", export_payload())
+    finally:
+        stop_server(proc)
+    released = port_released(port)
+
+    chunked = headers.get("transfer-encoding", "").lower() == "chunked"
+    body = dechunk(raw_body) if chunked else raw_body
+    try:
+        names = zipfile.ZipFile(io.BytesIO(body)).namelist()
+    except zipfile.BadZipFile:
+        names = None
+
+    ok = " 200 " in status + " " and chunked == expect_chunked and bool(names) and released
+    print(f"{name}: {status}, chunked={chunked}, "
+          f"{len(names) if names else 'invalid'} zip entries, "
+          f"port {'released' if released else 'still listening'} -> {'OK' if ok else 'FAILED'}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check /export response framing per server mode")
+    parser.add_argument("--port", "-p", type=int, default=8094, help="Port for the test server")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        create_tiff(directory)
+        results = []
+        for mode in MODES:
+            results.append(check_mode(args.port, directory, *mode))
+            if not results[-1]:
+                # 포트가 남아 있으면 다음 모드는 의미가 없음
+                break
+
+    if not all(results):
+        print("FAILED")
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
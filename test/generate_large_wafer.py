@@ -10,16 +10,27 @@ from PIL import Image
 import math
 import random
 import os
-import gc
-from tifffile import TiffWriter
+import shutil
+import tempfile
+import time
+from tifffile import TiffFile, TiffWriter
 import argparse
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 
-def create_chip_pattern(chip_size=500, chip_id=None):
+def chip_rng(seed, layer_idx, chip_x, chip_y):
+    """칩별 독립 난수 생성기 (타일 순서/크기와 관계없이 같은 칩은 같은 결과)"""
+    return np.random.default_rng([seed, layer_idx, chip_x, chip_y])
+
+
+def create_chip_pattern(chip_size=500, chip_id=None, rng=None):
     """단일 칩 패턴 생성 (500x500픽셀)"""
+    rng = rng if rng is not None else np.random.default_rng()
     chip = np.zeros((chip_size, chip_size), dtype=np.uint8)
     
     # 기본 회색 배경
-    base_level = random.randint(80, 120)
+    base_level = int(rng.integers(80, 121))
     chip.fill(base_level)
     
     # 경계선 (500x500에 맞게 스케일)
@@ -50,197 +61,271 @@ def create_chip_pattern(chip_size=500, chip_id=None):
         chip[margin:chip_size-margin, i:i+grid_width] = base_level - 20
     
     # 랜덤 노이즈
-    noise = np.random.normal(0, 5, (chip_size, chip_size))
-    chip = np.clip(chip.astype(float) + noise, 0, 255).astype(np.uint8)
+    noise = rng.normal(0, 5, (chip_size, chip_size))
+    chip = np.clip(chip + noise, 0, 255).astype(np.uint8)
     
     return chip
 
-def add_defects(chip, defect_prob=0.1, layer_idx=0):
+def add_defects(chip, defect_prob=0.1, layer_idx=0, rng=None):
     """칩에 결함 추가"""
+    rng = rng if rng is not None else np.random.default_rng()
     chip = chip.copy()
+    height, width = chip.shape
     
-    if random.random() < defect_prob:
-        defect_type = random.choice(['void', 'crack', 'particle'])
-        margin = int(chip.shape[1] * 0.1)  # 10% 마진
-        center_x = random.randint(margin, chip.shape[1] - margin)
-        center_y = random.randint(margin, chip.shape[0] - margin)
+    if rng.random() < defect_prob:
+        defect_type = rng.choice(['void', 'crack', 'particle'])
+        margin = int(width * 0.1)  # 10% 마진
+        center_x = int(rng.integers(margin, width - margin + 1))
+        center_y = int(rng.integers(margin, height - margin + 1))
+        y, x = np.ogrid[:height, :width]
         
         if defect_type == 'void':
             # 타원형 보이드 (스케일링)
-            min_radius = int(chip.shape[1] * 0.02)  # 2% 최소 반지름
-            max_radius = int(chip.shape[1] * 0.08)  # 8% 최대 반지름
-            radius_x = random.randint(min_radius, max_radius)
-            radius_y = random.randint(min_radius, max_radius)
-            y, x = np.ogrid[:chip.shape[0], :chip.shape[1]]
+            min_radius = int(width * 0.02)  # 2% 최소 반지름
+            max_radius = int(width * 0.08)  # 8% 최대 반지름
+            radius_x = int(rng.integers(min_radius, max_radius + 1))
+            radius_y = int(rng.integers(min_radius, max_radius + 1))
             mask = ((x - center_x) / radius_x) ** 2 + ((y - center_y) / radius_y) ** 2 <= 1
-            chip[mask] = random.randint(20, 60)  # 어두운 영역
+            chip[mask] = rng.integers(20, 61)  # 어두운 영역
             
         elif defect_type == 'crack':
-            # 선형 크랙 (스케일링)
-            angle = random.uniform(0, 2 * math.pi)
-            min_length = int(chip.shape[1] * 0.1)  # 10% 최소 길이
-            max_length = int(chip.shape[1] * 0.25) # 25% 최대 길이
-            length = random.randint(min_length, max_length)
-            crack_width = int(chip.shape[1] * 0.01)  # 1% 두께
+            # 선형 크랙 (스케일링) - 선 위 점들을 중심으로 한 정사각형 영역을 한 번에 칠함
+            angle = rng.uniform(0, 2 * math.pi)
+            min_length = int(width * 0.1)  # 10% 최소 길이
+            max_length = int(width * 0.25) # 25% 최대 길이
+            length = int(rng.integers(min_length, max_length + 1))
+            crack_width = int(width * 0.01)  # 1% 두께
+            
+            steps = np.arange(length)
+            px = center_x + (steps * math.cos(angle)).astype(int)
+            py = center_y + (steps * math.sin(angle)).astype(int)
+            on_chip = (px >= 0) & (px < width) & (py >= 0) & (py < height)
             
-            for i in range(length):
-                dx = int(i * math.cos(angle))
-                dy = int(i * math.sin(angle))
-                px, py = center_x + dx, center_y + dy
-                if 0 <= px < chip.shape[1] and 0 <= py < chip.shape[0]:
-                    # 크랙 주변 영역
-                    for ox in range(-crack_width, crack_width + 1):
-                        for oy in range(-crack_width, crack_width + 1):
-                            if 0 <= px+ox < chip.shape[1] and 0 <= py+oy < chip.shape[0]:
-                                chip[py+oy, px+ox] = random.randint(10, 40)
+            mask = np.zeros(chip.shape, dtype=bool)
+            for ox in range(-crack_width, crack_width + 1):
+                for oy in range(-crack_width, crack_width + 1):
+                    cx, cy = px[on_chip] + ox, py[on_chip] + oy
+                    valid = (cx >= 0) & (cx < width) & (cy >= 0) & (cy < height)
+                    mask[cy[valid], cx[valid]] = True
+            chip[mask] = rng.integers(10, 41, size=int(mask.sum()))
                                 
         elif defect_type == 'particle':
             # 원형 파티클 (스케일링)
-            min_radius = int(chip.shape[1] * 0.02)  # 2% 최소 반지름
-            max_radius = int(chip.shape[1] * 0.06)  # 6% 최대 반지름
-            radius = random.randint(min_radius, max_radius)
-            y, x = np.ogrid[:chip.shape[0], :chip.shape[1]]
+            min_radius = int(width * 0.02)  # 2% 최소 반지름
+            max_radius = int(width * 0.06)  # 6% 최대 반지름
+            radius = int(rng.integers(min_radius, max_radius + 1))
             mask = (x - center_x) ** 2 + (y - center_y) ** 2 <= radius ** 2
-            chip[mask] = random.randint(180, 220)  # 밝은 영역
+            chip[mask] = rng.integers(180, 221)  # 밝은 영역
     
     # 레이어별 특성 변화
     layer_variation = layer_idx * 5
-    chip = np.clip(chip.astype(float) + layer_variation, 0, 255).astype(np.uint8)
+    chip = np.clip(chip.astype(np.int16) + layer_variation, 0, 255).astype(np.uint8)
     
     return chip
 
-def generate_wafer_tile(tile_x, tile_y, tile_size, wafer_size, chip_size, layer_idx, grid_size):
-    """웨이퍼의 특정 타일 영역 생성"""
-    print(f"  Generating tile ({tile_x//tile_size}, {tile_y//tile_size}) for layer {layer_idx}")
+class ChipCache(OrderedDict):
+    """최근 사용한 칩 이미지 LRU 캐시"""
+    
+    def __init__(self, max_entries=64):
+        super().__init__()
+        self.max_entries = max_entries
+
+def get_chip(chip_x, chip_y, chip_size, layer_idx, seed, chip_cache=None):
+    """결함까지 적용된 칩 이미지 (chip_cache가 있으면 재사용)"""
+    key = (chip_x, chip_y, layer_idx)
+    if chip_cache is not None and key in chip_cache:
+        chip_cache.move_to_end(key)
+        return chip_cache[key]
     
-    # 타일 이미지 초기화
+    rng = chip_rng(seed, layer_idx, chip_x, chip_y)
+    chip = add_defects(create_chip_pattern(chip_size, (chip_x, chip_y), rng),
+                       defect_prob=0.15, layer_idx=layer_idx, rng=rng)
+    
+    if chip_cache is not None:
+        chip_cache[key] = chip
+        # 캐시 크기 제한 (타일 한 줄이 걸치는 칩 행 2개 정도면 충분)
+        while len(chip_cache) > chip_cache.max_entries:
+            chip_cache.popitem(last=False)
+    return chip
+
+def generate_wafer_tile(tile_x, tile_y, tile_size, wafer_size, chip_size, layer_idx, grid_size,
+                        seed=0, chip_cache=None, tile_height=None):
+    """웨이퍼의 특정 타일 영역 생성 (NumPy 브로드캐스팅, 칩 단위 블릿)
+
+    tile_height를 주면 tile_size x tile_height 직사각형 영역 (스트립 생성용)
+    """
     actual_w = min(tile_size, wafer_size - tile_x)
-    actual_h = min(tile_size, wafer_size - tile_y)
-    tile = np.zeros((actual_h, actual_w), dtype=np.uint8)
+    actual_h = min(tile_height or tile_size, wafer_size - tile_y)
+    # 배경/가장자리 노이즈는 타일 위치로 시드를 정해서 재현 가능하게 함
+    rng = np.random.default_rng([seed, layer_idx, tile_y, tile_x, wafer_size])
     
-    # 배경 (웨이퍼 외부는 검은색)
+    # 웨이퍼 외부는 어두운 노이즈
+    tile = rng.integers(0, 21, size=(actual_h, actual_w), dtype=np.uint8)
+    
+    # 웨이퍼 경계 (원) 마스크
     center = wafer_size // 2
     radius = wafer_size // 2 - 100
+    ys = np.arange(tile_y, tile_y + actual_h)[:, None]
+    xs = np.arange(tile_x, tile_x + actual_w)[None, :]
+    inside = (xs - center) ** 2 + (ys - center) ** 2 <= radius ** 2
+    
+    # 칩 그리드 밖의 웨이퍼 가장자리
+    edge = inside & ((xs // chip_size >= grid_size) | (ys // chip_size >= grid_size))
+    tile[edge] = rng.integers(60, 101, size=int(edge.sum()), dtype=np.uint8)
     
-    # 타일 내의 각 픽셀에 대해
-    for py in range(actual_h):
-        for px in range(actual_w):
-            global_x = tile_x + px
-            global_y = tile_y + py
+    # 타일과 겹치는 칩을 슬라이스 단위로 복사
+    last_chip_x = min(grid_size, -(-(tile_x + actual_w) // chip_size))
+    last_chip_y = min(grid_size, -(-(tile_y + actual_h) // chip_size))
+    for chip_y in range(tile_y // chip_size, last_chip_y):
+        y0 = max(chip_y * chip_size, tile_y)
+        y1 = min((chip_y + 1) * chip_size, tile_y + actual_h)
+        for chip_x in range(tile_x // chip_size, last_chip_x):
+            x0 = max(chip_x * chip_size, tile_x)
+            x1 = min((chip_x + 1) * chip_size, tile_x + actual_w)
             
-            # 웨이퍼 경계 확인
-            dist_from_center = math.sqrt((global_x - center)**2 + (global_y - center)**2)
+            region = (slice(y0 - tile_y, y1 - tile_y), slice(x0 - tile_x, x1 - tile_x))
+            region_inside = inside[region]
+            if not region_inside.any():
+                continue
             
-            if dist_from_center <= radius:
-                # 웨이퍼 내부 - 칩 패턴
-                chip_x = global_x // chip_size
-                chip_y = global_y // chip_size
-                
-                if chip_x < grid_size and chip_y < grid_size:
-                    # 칩 내부 좌표
-                    local_x = global_x % chip_size
-                    local_y = global_y % chip_size
-                    
-                    # 칩 캐시 키
-                    chip_key = f"{chip_x}_{chip_y}_{layer_idx}"
-                    
-                    # 칩이 없으면 생성
-                    if not hasattr(generate_wafer_tile, 'chip_cache'):
-                        generate_wafer_tile.chip_cache = {}
-                    
-                    if chip_key not in generate_wafer_tile.chip_cache:
-                        base_chip = create_chip_pattern(chip_size, (chip_x, chip_y))
-                        generate_wafer_tile.chip_cache[chip_key] = add_defects(
-                            base_chip, defect_prob=0.15, layer_idx=layer_idx
-                        )
-                        
-                        # 캐시 크기 제한
-                        if len(generate_wafer_tile.chip_cache) > 50:
-                            # 오래된 캐시 삭제
-                            old_key = next(iter(generate_wafer_tile.chip_cache))
-                            del generate_wafer_tile.chip_cache[old_key]
-                    
-                    tile[py, px] = generate_wafer_tile.chip_cache[chip_key][local_y, local_x]
-                else:
-                    # 웨이퍼 가장자리
-                    tile[py, px] = random.randint(60, 100)
-            else:
-                # 웨이퍼 외부
-                tile[py, px] = random.randint(0, 20)
+            chip = get_chip(chip_x, chip_y, chip_size, layer_idx, seed, chip_cache)
+            chip_part = chip[y0 - chip_y * chip_size:y1 - chip_y * chip_size,
+                             x0 - chip_x * chip_size:x1 - chip_x * chip_size]
+            np.copyto(tile[region], chip_part, where=region_inside)
     
     return tile
 
-def generate_large_wafer_tiff(filename="large_wafer_14900x14900_11layers.tif"):
-    """메모리 효율적인 고해상도 웨이퍼 TIFF 생성"""
+COMPRESSION_CHOICES = {
+    'none': None,
+    'deflate': 'zlib',
+    'lzw': 'lzw',
+    'zstd': 'zstd',
+}
+# 타일 없이(스트립) 저장할 때 스트립당 행 수
+STRIP_ROWS = 256
+
+# 워커 프로세스별 칩 캐시 (wafer_region에서 사용)
+_chip_cache = None
+
+def wafer_region(layer_idx, x0, y0, width, height, wafer_size, chip_size, grid_size, seed):
+    """레이어의 (x0, y0, width, height) 영역 생성 - write_layers_parallel용 영역 함수"""
+    global _chip_cache
+    if _chip_cache is None:
+        _chip_cache = ChipCache(max_entries=grid_size * 4)
+    return generate_wafer_tile(x0, y0, width, wafer_size, chip_size, layer_idx, grid_size,
+                               seed, _chip_cache, tile_height=height)
+
+def segment_options(tile_size, compression):
+    """TiffWriter.write 타일/스트립 + 압축 옵션"""
+    codec = COMPRESSION_CHOICES[compression]
+    options = {'compression': codec, 'predictor': codec is not None}
+    if tile_size:
+        options['tile'] = (tile_size, tile_size)
+    else:
+        options['rowsperstrip'] = STRIP_ROWS
+    return options
+
+def write_layer_file(path, region_fn, layer_idx, shape, tile_size, compression):
+    """레이어 하나를 단일 페이지 TIFF로 저장 (워커 프로세스에서 실행)
+
+    타일 모드는 타일 단위로 생성해서 바로 인코딩하므로 레이어 전체를 메모리에 두지 않는다
+    """
+    height, width = shape
+    options = segment_options(tile_size, compression)
+
+    if tile_size:
+        def tiles():
+            for y in range(0, height, tile_size):
+                for x in range(0, width, tile_size):
+                    tile = region_fn(layer_idx, x, y, min(tile_size, width - x),
+                                     min(tile_size, height - y))
+                    if tile.shape != (tile_size, tile_size):
+                        padded = np.zeros((tile_size, tile_size), dtype=np.uint8)
+                        padded[:tile.shape[0], :tile.shape[1]] = tile
+                        tile = padded
+                    yield tile
+        data = tiles()
+    else:
+        data = np.empty(shape, dtype=np.uint8)
+        for y in range(0, height, STRIP_ROWS * 4):
+            band = min(STRIP_ROWS * 4, height - y)
+            data[y:y + band] = region_fn(layer_idx, 0, y, width, band)
+
+    with TiffWriter(path) as tiff:
+        tiff.write(data, shape=shape, dtype=np.uint8, photometric='minisblack', metadata=None,
+                   **options)
+    return path
+
+def iter_encoded_segments(path):
+    """단일 페이지 TIFF의 인코딩된 타일/스트립 바이트를 그대로 읽기"""
+    with TiffFile(path) as tif:
+        page = tif.pages[0]
+        fh = tif.filehandle
+        for offset, count in zip(page.dataoffsets, page.databytecounts):
+            fh.seek(offset)
+            yield fh.read(count)
+
+def write_layers_parallel(filename, region_fn, num_layers, shape, tile_size=512,
+                          compression='deflate', bigtiff=False, workers=None):
+    """레이어를 프로세스 풀에서 병렬 생성하고 레이어 순서대로 멀티페이지 TIFF에 합침
+
+    각 워커가 임시 단일 페이지 TIFF를 만들고, 메인 프로세스는 인코딩된 타일을
+    다시 압축하지 않고 그대로 복사한다. 난수는 (seed, 레이어, 칩/타일)로 정해지므로
+    워커 수와 관계없이 같은 파일이 나온다
+    """
+    options = segment_options(tile_size, compression)
+    temp_dir = tempfile.mkdtemp(prefix='wafer_layers_',
+                                dir=os.path.dirname(os.path.abspath(filename)))
+    try:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool, \
+                TiffWriter(filename, bigtiff=bigtiff) as tiff:
+            futures = [
+                pool.submit(write_layer_file, os.path.join(temp_dir, f'layer_{i:03d}.tif'),
+                            region_fn, i, shape, tile_size, compression)
+                for i in range(num_layers)
+            ]
+            for layer_idx, future in enumerate(futures):
+                layer_path = future.result()
+                tiff.write(iter_encoded_segments(layer_path), shape=shape, dtype=np.uint8,
+                           photometric='minisblack', metadata=None, **options)
+                os.remove(layer_path)
+                print(f"Layer {layer_idx + 1}/{num_layers} saved")
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+def generate_large_wafer_tiff(filename="large_wafer_14900x14900_11layers.tif", seed=0,
+                              tile_size=512, compression='deflate', bigtiff=False, workers=None,
+                              num_layers=11, wafer_size=14900):
+    """메모리 효율적인 고해상도 웨이퍼 TIFF 생성 (seed가 같으면 같은 이미지)"""
     print(f"Generating {filename}...")
     
     # 파라미터
-    wafer_size = 14900
     chip_size = 500  # 30x30 그리드 (14900/500 ≈ 29.8)
     grid_size = wafer_size // chip_size  # 29x29 칩
-    num_layers = 11
-    tile_size = 1024  # 1K 타일로 메모리 절약
     
     print(f"Wafer size: {wafer_size}x{wafer_size}")
     print(f"Chip grid: {grid_size}x{grid_size} chips")
     print(f"Chip size: {chip_size}x{chip_size} pixels")
     print(f"Total layers: {num_layers}")
-    print(f"Processing tile size: {tile_size}x{tile_size}")
+    print(f"Layout: {f'{tile_size}x{tile_size} tiles' if tile_size else 'strips'}, "
+          f"compression {compression}{', BigTIFF' if bigtiff else ''}")
     
-    # TIFF 파일 생성
-    with TiffWriter(filename) as tiff:
-        for layer_idx in range(num_layers):
-            print(f"\nProcessing layer {layer_idx + 1}/{num_layers}...")
-            
-            # 전체 레이어 이미지 초기화
-            layer_image = np.zeros((wafer_size, wafer_size), dtype=np.uint8)
-            
-            # 타일별로 생성
-            tiles_x = math.ceil(wafer_size / tile_size)
-            tiles_y = math.ceil(wafer_size / tile_size)
-            
-            for tile_row in range(tiles_y):
-                for tile_col in range(tiles_x):
-                    tile_x = tile_col * tile_size
-                    tile_y = tile_row * tile_size
-                    
-                    # 타일 생성
-                    tile = generate_wafer_tile(
-                        tile_x, tile_y, tile_size, wafer_size, 
-                        chip_size, layer_idx, grid_size
-                    )
-                    
-                    # 메인 이미지에 타일 복사
-                    end_x = min(tile_x + tile_size, wafer_size)
-                    end_y = min(tile_y + tile_size, wafer_size)
-                    layer_image[tile_y:end_y, tile_x:end_x] = tile
-                    
-                    # 메모리 정리
-                    del tile
-                    if (tile_row * tiles_x + tile_col) % 10 == 0:
-                        gc.collect()
-            
-            # TIFF 레이어로 저장
-            tiff.write(layer_image, photometric='minisblack')
-            print(f"Layer {layer_idx + 1} saved")
-            
-            # 메모리 정리
-            del layer_image
-            gc.collect()
-            
-            # 칩 캐시 초기화
-            if hasattr(generate_wafer_tile, 'chip_cache'):
-                generate_wafer_tile.chip_cache.clear()
+    started = time.time()
+    region_fn = partial(wafer_region, wafer_size=wafer_size, chip_size=chip_size,
+                        grid_size=grid_size, seed=seed)
+    write_layers_parallel(filename, region_fn, num_layers, (wafer_size, wafer_size),
+                          tile_size, compression, bigtiff, workers)
     
-    print(f"\nSuccessfully generated {filename}")
+    print(f"\nSuccessfully generated {filename} in {time.time() - started:.1f}s")
     
     # 파일 크기 확인
     file_size = os.path.getsize(filename)
     print(f"File size: {file_size / (1024**3):.2f} GB")
 
-def generate_test_coordinates_csv():
+def generate_test_coordinates_csv(seed=0):
     """대용량 웨이퍼용 테스트 좌표 CSV 생성 (29x29 그리드)"""
     print("Generating test coordinates CSV...")
+    rng = random.Random(seed)
     
     coords = []
     center = 14  # 29x29 그리드의 중심 (14)
@@ -255,7 +340,7 @@ def generate_test_coordinates_csv():
                     chip_type = 'normal'
                     if dist > 8:
                         chip_type = 'edge'
-                    elif random.random() < 0.1:
+                    elif rng.random() < 0.1:
                         chip_type = 'defect'
                     
                     coords.append(f"{x},{y},{chip_type}")
@@ -274,15 +359,27 @@ if __name__ == "__main__":
                         help='Output filename')
     parser.add_argument('--coords-only', action='store_true',
                         help='Generate only coordinates CSV')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Random seed (same seed gives the same wafer)')
+    parser.add_argument('--size', type=int, default=14900, help='Wafer width/height in pixels')
+    parser.add_argument('--layers', type=int, default=11, help='Number of layers')
+    parser.add_argument('--tile-size', type=int, default=512,
+                        help='TIFF tile size (0 writes strips)')
+    parser.add_argument('--compression', choices=sorted(COMPRESSION_CHOICES), default='deflate',
+                        help='Tile compression (lzw/zstd need imagecodecs)')
+    parser.add_argument('--bigtiff', action='store_true', help='Write BigTIFF (files over 4 GB)')
+    parser.add_argument('--workers', '-w', type=int, default=None,
+                        help='Layer worker processes (default: CPU count)')
     
     args = parser.parse_args()
     
     try:
         if args.coords_only:
-            generate_test_coordinates_csv()
+            generate_test_coordinates_csv(args.seed)
         else:
-            generate_large_wafer_tiff(args.filename)
-            generate_test_coordinates_csv()
+            generate_large_wafer_tiff(args.filename, args.seed, args.tile_size, args.compression,
+                                      args.bigtiff, args.workers, args.layers, args.size)
+            generate_test_coordinates_csv(args.seed)
         
         print("\nGeneration complete!")
         
@@ -3,83 +3,84 @@
 테스트용 중간 크기 웨이퍼 생성 (빠른 검증용)
 """
 
+import argparse
+import os
+from functools import partial
+
 import numpy as np
-from PIL import Image
-import math
-import random
-from tifffile import TiffWriter
-import gc
-
-def create_fast_wafer_layer(size, layer_idx, chip_grid=30):
-    """빠른 웨이퍼 레이어 생성"""
-    print(f"  Generating layer {layer_idx + 1} ({size}x{size})")
-    
-    # 전체 이미지
-    img = np.zeros((size, size), dtype=np.uint8)
-    
+
+from generate_large_wafer import COMPRESSION_CHOICES, write_layers_parallel
+
+def fast_wafer_region(layer_idx, x0, y0, width, height, size, chip_grid=30, seed=0):
+    """빠른 웨이퍼 레이어의 (x0, y0, width, height) 영역 생성"""
+    # 영역 위치로 시드를 정해서 워커 수와 관계없이 같은 결과
+    rng = np.random.default_rng([seed, layer_idx, y0, x0, size])
+
     center = size // 2
     radius = size // 2 - 50
     chip_size = size // chip_grid
-    
-    # 웨이퍼 배경
-    for y in range(size):
-        for x in range(size):
-            dist = math.sqrt((x - center)**2 + (y - center)**2)
-            
-            if dist <= radius:
-                # 웨이퍼 내부
-                chip_x = x // chip_size
-                chip_y = y // chip_size
-                local_x = x % chip_size
-                local_y = y % chip_size
-                
-                # 칩 경계
-                if local_x < 2 or local_x >= chip_size-2 or local_y < 2 or local_y >= chip_size-2:
-                    img[y, x] = 40
-                else:
-                    # 칩 내부 패턴
-                    base = 100 + layer_idx * 10
-                    pattern = int(base + 20 * math.sin(local_x * 0.3) * math.cos(local_y * 0.3))
-                    
-                    # 결함 추가
-                    if random.random() < 0.05:  # 5% 결함률
-                        if random.random() < 0.5:
-                            pattern = 30  # 보이드
-                        else:
-                            pattern = 200  # 파티클
-                    
-                    img[y, x] = np.clip(pattern + random.randint(-10, 10), 0, 255)
-            else:
-                # 웨이퍼 외부
-                img[y, x] = random.randint(0, 20)
-    
-    return img
-
-def generate_test_wafer(size=6000, layers=11, filename=None):
-    """테스트용 웨이퍼 생성"""
+
+    ys = np.arange(y0, y0 + height)[:, None]
+    xs = np.arange(x0, x0 + width)[None, :]
+    inside = (xs - center) ** 2 + (ys - center) ** 2 <= radius ** 2
+    local_x = xs % chip_size
+    local_y = ys % chip_size
+
+    # 칩 내부 패턴
+    base = 100 + layer_idx * 10
+    pattern = (base + 20 * np.sin(local_x * 0.3) * np.cos(local_y * 0.3)).astype(np.int16)
+
+    # 결함 추가 (5% 결함률, 보이드/파티클 반반)
+    defect = rng.random((height, width)) < 0.05
+    particle = rng.random((height, width)) < 0.5
+    pattern[defect & ~particle] = 30  # 보이드
+    pattern[defect & particle] = 200  # 파티클
+    pattern = np.clip(pattern + rng.integers(-10, 11, size=(height, width)), 0, 255)
+
+    # 칩 경계
+    border = (local_x < 2) | (local_x >= chip_size - 2) | (local_y < 2) | (local_y >= chip_size - 2)
+    pattern = np.where(border, 40, pattern)
+
+    # 웨이퍼 외부
+    outside = rng.integers(0, 21, size=(height, width))
+    return np.where(inside, pattern, outside).astype(np.uint8)
+
+def generate_test_wafer(size=6000, layers=11, filename=None, seed=0, tile_size=512,
+                        compression='deflate', bigtiff=False, workers=None):
+    """테스트용 웨이퍼 생성 (레이어 병렬)"""
     if filename is None:
         filename = f"test_wafer_{size}x{size}_{layers}layers.tif"
-    
+
     print(f"Generating {filename}")
     print(f"Size: {size}x{size}, Layers: {layers}")
-    
-    with TiffWriter(filename) as tiff:
-        for layer_idx in range(layers):
-            layer_img = create_fast_wafer_layer(size, layer_idx)
-            tiff.write(layer_img, photometric='minisblack')
-            
-            del layer_img
-            gc.collect()
-    
+
+    region_fn = partial(fast_wafer_region, size=size, seed=seed)
+    write_layers_parallel(filename, region_fn, layers, (size, size), tile_size, compression,
+                          bigtiff, workers)
+
     print(f"✅ Generated {filename}")
-    
+
     # 파일 크기 출력
-    import os
     file_size = os.path.getsize(filename)
     print(f"File size: {file_size / (1024**2):.2f} MB")
 
 if __name__ == "__main__":
-    # 6000x6000, 11레이어 (약 400MB)
-    generate_test_wafer(14900, 1, "test_wafer_14900x14900_11layers.tif")
-    
-    print("\n🎉 Test wafer generation complete!")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Generate a quick test wafer TIFF')
+    parser.add_argument('--filename', '-f', default="test_wafer_14900x14900_11layers.tif",
+                        help='Output filename')
+    parser.add_argument('--size', type=int, default=14900, help='Wafer width/height in pixels')
+    parser.add_argument('--layers', type=int, default=1, help='Number of layers')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed')
+    parser.add_argument('--tile-size', type=int, default=512,
+                        help='TIFF tile size (0 writes strips)')
+    parser.add_argument('--compression', choices=sorted(COMPRESSION_CHOICES), default='deflate',
+                        help='Tile compression (lzw/zstd need imagecodecs)')
+    parser.add_argument('--bigtiff', action='store_true', help='Write BigTIFF (files over 4 GB)')
+    parser.add_argument('--workers', '-w', type=int, default=None,
+                        help='Layer worker processes (default: CPU count)')
+    args = parser.parse_args()
+
+    generate_test_wafer(args.size, args.layers, args.filename, args.seed, args.tile_size,
+                        args.compression, args.bigtiff, args.workers)
+
+    print("\n🎉 Test wafer generation complete!")
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+TIFF IFD/타일 인덱스 파서 (표준 라이브러리만 사용)
+페이지 크기, 타일/스트립 오프셋과 바이트 수, 압축 방식을 한 번에 읽어서
+mtime/size 기준으로 캐시한다
+"""
+import os
+import struct
+import threading
+from collections import OrderedDict
+
+# TIFF 필드 타입별 (struct 포맷, 바이트 크기)
+FIELD_TYPES = {
+    1: ('B', 1),    # BYTE
+    2: ('s', 1),    # ASCII
+    3: ('H', 2),    # SHORT
+    4: ('I', 4),    # LONG
+    5: ('II', 8),   # RATIONAL
+    6: ('b', 1),    # SBYTE
+    7: ('B', 1),    # UNDEFINED
+    8: ('h', 2),    # SSHORT
+    9: ('i', 4),    # SLONG
+    10: ('ii', 8),  # SRATIONAL
+    11: ('f', 4),   # FLOAT
+    12: ('d', 8),   # DOUBLE
+    13: ('I', 4),   # IFD
+    16: ('Q', 8),   # LONG8
+    17: ('q', 8),   # SLONG8
+    18: ('Q', 8),   # IFD8
+}
+
+# 인덱스에 필요한 태그만 파싱
+TAGS = {
+    254: 'newSubfileType',
+    256: 'width',
+    257: 'height',
+    258: 'bitsPerSample',
+    259: 'compression',
+    262: 'photometric',
+    273: 'stripOffsets',
+    277: 'samplesPerPixel',
+    278: 'rowsPerStrip',
+    279: 'stripByteCounts',
+    284: 'planarConfig',
+    317: 'predictor',
+    322: 'tileWidth',
+    323: 'tileHeight',
+    324: 'tileOffsets',
+    325: 'tileByteCounts',
+    339: 'sampleFormat',
+}
+
+COMPRESSION_NAMES = {
+    1: 'none',
+    5: 'lzw',
+    7: 'jpeg',
+    8: 'deflate',
+    32773: 'packbits',
+    32946: 'deflate',
+    34887: 'lerc',
+    50000: 'zstd',
+    50001: 'webp',
+}
+
+# 비정상 파일에서 무한 루프를 막기 위한 최대 페이지 수
+MAX_PAGES = 100000
+
+
+class TiffIndexError(ValueError):
+    """TIFF 구조를 해석할 수 없을 때 발생"""
+
+
+def _read_exact(f, offset, size):
+    f.seek(offset)
+    data = f.read(size)
+    if len(data) != size:
+        raise TiffIndexError(f"Unexpected end of file at offset {offset}")
+    return data
+
+
+def _read_header(f):
+    """바이트 순서, BigTIFF 여부, 첫 IFD 오프셋 반환"""
+    f.seek(0)
+    header = f.read(16)
+    if len(header) < 8:
+        raise TiffIndexError("Not a TIFF file")
+    order = header[:2]
+    if order == b'II':
+        endian = '<'
+    elif order == b'MM':
+        endian = '>'
+    else:
+        raise TiffIndexError("Not a TIFF file")
+
+    magic = struct.unpack(endian + 'H', header[2:4])[0]
+    if magic == 42:
+        first_ifd = struct.unpack(endian + 'I', header[4:8])[0]
+        return endian, False, first_ifd
+    if magic == 43 and len(header) >= 16:
+        first_ifd = struct.unpack(endian + 'Q', header[8:16])[0]
+        return endian, True, first_ifd
+    raise TiffIndexError(f"Unsupported TIFF magic number {magic}")
+
+
+def _parse_ifd(f, offset, endian, big_tiff):
+    """IFD 하나를 파싱해서 (태그 값 dict, 다음 IFD 오프셋, IFD 구조가 끝나는 위치) 반환"""
+    count_fmt, count_size = ('Q', 8) if big_tiff else ('H', 2)
+    entry_size = 20 if big_tiff else 12
+    value_fmt, value_size = ('Q', 8) if big_tiff else ('I', 4)
+
+    entry_count = struct.unpack(endian + count_fmt, _read_exact(f, offset, count_size))[0]
+    table_size = entry_count * entry_size + value_size
+    table = _read_exact(f, offset + count_size, table_size)
+    structure_end = offset + count_size + table_size
+
+    values = {}
+    for i in range(entry_count):
+        entry = table[i * entry_size:(i + 1) * entry_size]
+        tag, field_type = struct.unpack(endian + 'HH', entry[:4])
+        if tag not in TAGS or field_type not in FIELD_TYPES:
+            continue
+
+        count = struct.unpack(endian + value_fmt, entry[4:4 + value_size])[0]
+        fmt, item_size = FIELD_TYPES[field_type]
+        data_size = count * item_size
+        inline = entry[4 + value_size:]
+        if data_size <= value_size:
+            data = inline[:data_size]
+        else:
+            # 값이 IFD 밖에 있으면 오프셋 위치에서 읽음
+            value_offset = struct.unpack(endian + value_fmt, inline)[0]
+            data = _read_exact(f, value_offset, data_size)
+            structure_end = max(structure_end, value_offset + data_size)
+
+        if field_type == 2:
+            values[TAGS[tag]] = data.rstrip(b'\0').decode('latin-1')
+            continue
+        items = struct.unpack(endian + fmt * count, data)
+        if field_type in (5, 10):
+            items = tuple(items[j] / items[j + 1] if items[j + 1] else 0.0
+                          for j in range(0, len(items), 2))
+        values[TAGS[tag]] = list(items)
+
+    next_offset = struct.unpack(endian + value_fmt, table[-value_size:])[0]
+    return values, next_offset, structure_end
+
+
+def _first(values, key, default):
+    items = values.get(key)
+    return items[0] if items else default
+
+
+def _page_info(index, ifd_offset, values, include_offsets):
+    """IFD 태그 값으로 페이지 요약 정보 구성"""
+    width = _first(values, 'width', 0)
+    height = _first(values, 'height', 0)
+    compression = _first(values, 'compression', 1)
+    tiled = 'tileOffsets' in values
+
+    page = {
+        'index': index,
+        'ifdOffset': ifd_offset,
+        'width': width,
+        'height': height,
+        'bitsPerSample': values.get('bitsPerSample', [1]),
+        'samplesPerPixel': _first(values, 'samplesPerPixel', 1),
+        'sampleFormat': _first(values, 'sampleFormat', 1),
+        'compression': compression,
+        'compressionName': COMPRESSION_NAMES.get(compression, str(compression)),
+        'photometric': _first(values, 'photometric', None),
+        'planarConfig': _first(values, 'planarConfig', 1),
+        'predictor': _first(values, 'predictor', 1),
+        'newSubfileType': _first(values, 'newSubfileType', 0),
+        'tiled': tiled,
+    }
+
+    if tiled:
+        offsets = values.get('tileOffsets', [])
+        byte_counts = values.get('tileByteCounts', [])
+        tile_w = _first(values, 'tileWidth', width)
+        tile_h = _first(values, 'tileHeight', height)
+        page['tileWidth'] = tile_w
+        page['tileHeight'] = tile_h
+        page['tilesAcross'] = -(-width // tile_w) if tile_w else 0
+        page['tilesDown'] = -(-height // tile_h) if tile_h else 0
+    else:
+        offsets = values.get('stripOffsets', [])
+        byte_counts = values.get('stripByteCounts', [])
+        page['rowsPerStrip'] = min(_first(values, 'rowsPerStrip', height), height)
+
+    page['segmentCount'] = len(offsets)
+    page['dataBytes'] = sum(byte_counts)
+    if include_offsets:
+        page['offsets'] = offsets
+        page['byteCounts'] = byte_counts
+    return page
+
+
+def parse_tiff_index(path, include_offsets=True):
+    """TIFF 파일의 IFD 체인을 따라가며 전체 페이지 인덱스 생성"""
+    stat = os.stat(path)
+    with open(path, 'rb') as f:
+        endian, big_tiff, offset = _read_header(f)
+
+        pages = []
+        header_bytes = 16 if big_tiff else 8
+        visited = set()
+        while offset and len(pages) < MAX_PAGES:
+            if offset in visited or offset >= stat.st_size:
+                raise TiffIndexError(f"Invalid IFD offset {offset}")
+            visited.add(offset)
+
+            values, next_offset, structure_end = _parse_ifd(f, offset, endian, big_tiff)
+            pages.append(_page_info(len(pages), offset, values, include_offsets))
+            header_bytes = max(header_bytes, structure_end)
+            offset = next_offset
+
+    return {
+        'file': os.path.basename(path),
+        'size': stat.st_size,
+        'mtime': stat.st_mtime,
+        'byteOrder': 'II' if endian == '<' else 'MM',
+        'bigTiff': big_tiff,
+        # IFD 구조(태그 배열 포함)가 차지하는 가장 끝 위치
+        'headerBytes': header_bytes,
+        'pageCount': len(pages),
+        'pages': pages,
+    }
+
+
+class TiffIndexCache:
+    """파일 경로별 TIFF 인덱스 캐시 (mtime/size가 바뀌면 다시 파싱)"""
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path, include_offsets=True):
+        """캐시된 인덱스 반환, 없거나 파일이 바뀌었으면 새로 파싱"""
+        stat = os.stat(path)
+        key = (os.path.abspath(path), include_offsets)
+        fingerprint = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == fingerprint:
+                self._entries.move_to_end(key)
+                return entry[1]
+
+        index = parse_tiff_index(path, include_offsets)
+
+        with self._lock:
+            self._entries[key] = (fingerprint, index)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return index
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description='Print TIFF IFD/tile index as JSON')
+    parser.add_argument('path', help='TIFF file')
+    parser.add_argument('--no-offsets', action='store_true', help='Omit tile/strip offset arrays')
+    args = parser.parse_args()
+
+    print(json.dumps(parse_tiff_index(args.path, not args.no_offsets), indent=2))
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+디코딩된 TIFF 타일 캐시 (Range 서버 /tile 엔드포인트용)
+타일 TIFF는 파일의 타일 그리드를 그대로 쓰고, 스트립 TIFF는 VIRTUAL_TILE_SIZE 크기의
+가상 타일로 잘라서 디코딩한다. 결과 uint8 배열을 바이트 예산 기준 LRU로 보관한다
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from tifffile import TiffFile
+
+from patch_extractor import _to_uint8, read_region
+
+DEFAULT_CACHE_BYTES = 512 * 1024 * 1024
+# 스트립(비타일) 페이지를 나누는 가상 타일 크기
+VIRTUAL_TILE_SIZE = 512
+# 열어둘 TiffFile(IFD 파싱 결과) 개수
+MAX_OPEN_TIFFS = 16
+
+
+class TileCache:
+    """(파일, 버전, 페이지, tx, ty) -> 디코딩된 타일 LRU (바이트 예산, 스레드 안전)"""
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            tile = self._entries.get(key)
+            if tile is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return tile
+
+    def put(self, key, tile):
+        if tile.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old.nbytes
+            self._entries[key] = tile
+            self.bytes += tile.nbytes
+            while self.bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes -= evicted.nbytes
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.bytes,
+                'maxBytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hitRate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+class TiffPages:
+    """파일 버전별 TiffFile을 열어두고 페이지 객체 제공 (IFD 재파싱 방지)"""
+
+    def __init__(self, max_files=MAX_OPEN_TIFFS):
+        self.max_files = max_files
+        self._files = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path, fingerprint, page_index):
+        key = (path, fingerprint)
+        # 페이지 로딩은 TiffFile 파일 핸들을 쓰므로 잠금 안에서 처리
+        with self._lock:
+            tif = self._files.get(key)
+            if tif is None:
+                tif = TiffFile(path)
+                self._files[key] = tif
+                while len(self._files) > self.max_files:
+                    self._files.popitem(last=False)[1].close()
+            self._files.move_to_end(key)
+            return tif, tif.pages[page_index]
+
+    def close(self):
+        with self._lock:
+            for tif in self._files.values():
+                tif.close()
+            self._files.clear()
+
+
+def tile_grid(page):
+    """페이지의 (타일 너비, 타일 높이, 가로 개수, 세로 개수)"""
+    if page.is_tiled:
+        tile_w, tile_h = page.tilewidth, page.tilelength
+    else:
+        tile_w = tile_h = VIRTUAL_TILE_SIZE
+    return (tile_w, tile_h,
+            -(-page.imagewidth // tile_w), -(-page.imagelength // tile_h))
+
+
+def decode_tile(tif, page, mapped, tx, ty):
+    """(tx, ty) 타일을 uint8 2차원 배열로 디코딩 (이미지 경계에서 잘림)
+
+    mapped는 mmap_pool.MappedFile - 압축 세그먼트를 매핑에서 바로 읽는다
+    """
+    tile_w, tile_h, across, down = tile_grid(page)
+    if not (0 <= tx < across and 0 <= ty < down):
+        raise IndexError(f"Tile ({tx}, {ty}) outside {across}x{down} grid")
+
+    x0, y0 = tx * tile_w, ty * tile_h
+    width = min(tile_w, page.imagewidth - x0)
+    height = min(tile_h, page.imagelength - y0)
+
+    if not page.is_tiled:
+        return read_region(tif, page, x0, y0, width, height, source=mapped)
+
+    index = ty * across + tx
+    offset, count = page.dataoffsets[index], page.databytecounts[index]
+    if not count:
+        return np.zeros((height, width), dtype=np.uint8)
+    segment, _, _ = page.decode(mapped.mmap[offset:offset + count], index,
+                                jpegtables=page.jpegtables)
+    # segment shape: (depth, length, width, samples)
+    return np.ascontiguousarray(_to_uint8(segment[0, :height, :width, 0]))